@@ -3,52 +3,81 @@ import pygame
 import math
 import threading
 import time
-from scipy.io import wavfile
 import sys
-import sounddevice as sd
-from scipy.fftpack import fft
 import os
 from pydub import AudioSegment
+from analysis import ChannelLayout, block_rms, derive_bin_constants, smooth_bins
+from pipeline import MIC_BEAT_THRESHOLD, FileAnalysis, MicAnalysis, create_analyzer, create_envelope, input_channels
+from config import ConfigWatcher, LIVE_KEYS
+from display import Display, RenderAssets
+from recorder import Recorder
+from fanout import FrameBus
+from stream_server import SpectrumServer
+from playback import MUSIC_END, Playlist, format_time, load_track
+from sources import LatencyMeter, MicSource, SyntheticSource
+from analysis_process import AnalysisProcess
+from worker import AnalysisWorker
+from particles import ParticleSystem
+from library import LibraryIndex
+from mood import MoodTracker, mood_palette, mood_shape
+from bloom import Bloom
+import kernels
+from shapes import SHAPES, Shape, load_plugins, register, shape_names
+try:
+    from pygame._sdl2.video import Window, Renderer, Texture
+except ImportError:
+    Window = Renderer = Texture = None
 
 
-# === Initialize Pygame ===
-pygame.init()
+script_dir = os.path.dirname(os.path.abspath(__file__))
 
-WIDTH, HEIGHT = 800, 600
-background_filepath = 'data/img/blck.png'
+# Read Config (see config.py for every key, its default and its valid range)
+config_watcher = ConfigWatcher(os.path.join(script_dir, 'data', 'config.txt'))
+config = config_watcher.config
+
+WIDTH, HEIGHT = config.width, config.height
+background_filepath = config.background_image_path
 
 # Higher increases bass-stretching, lower leaves more room for high frequencies
-log_scale = 63 # Best if set to a factor of 22050 (any mult of [ 2, 3, 3, 5, 5, 7, 7 ])
+log_scale = config.log_scale # Best if set to a factor of 22050 (any mult of [ 2, 3, 3, 5, 5, 7, 7 ])
 
-palette = []
+palette = config.palette
+fps = config.fps
 
-# Read Config
-try:
-    with open( 'data/config.txt' ) as conf:
-        while text := conf.readline():
-            raw_data = text.split( ' ' )
-            if( raw_data[ 0 ] == 'width:' ): WIDTH = int( raw_data[ 1 ].strip( '\n' ) )
-            elif( raw_data[ 0 ] == 'height:' ): HEIGHT = int( raw_data[ 1 ].strip( '\n' ) )
-            elif( raw_data[ 0 ] == 'background_image_path:' ): background_filepath = raw_data[ 1 ].strip( '\n' )
-            elif( raw_data[ 0 ] == 'log_scale:' ): log_scale = int( raw_data[ 1 ].strip( '\n' ) )
-            elif( raw_data[ 0 ][ 0 ] == '(' ):
-                rgb = raw_data[ 0 ].strip( '( )\n' ).split( ',' )
-                palette.append( ( int( rgb[ 0 ] ), int( rgb[ 1 ] ), int( rgb[ 2 ] ) ) )
-except:
-        WIDTH = 800
-        HEIGHT = 600
-        background_filepath = ''
-        log_scale = 63
-        palette = [ ( 255, 0, 0 ), ( 255, 69, 0 ), ( 255, 255, 0 ), ( 0, 0, 255 ), ( 138, 43, 226 ) ]
-
-CENTER = (WIDTH // 2, HEIGHT // 2)
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Audio Visualizer")
-clock = pygame.time.Clock()
-
-# === Font Setup ===
-menu_font = pygame.font.SysFont("segoeui", 32)
-control_font = pygame.font.SysFont("segoeui", 20)
+# FFT analysis settings, refreshed from the config whenever a stream starts
+fft_size = config.fft_size            # Samples per FFT (frequency resolution = sample_rate / fft_size)
+hop_size = config.hop_size            # Samples between analysis frames (also the mic blocksize)
+display_bins = config.display_bins    # Points in the spectrum handed to the renderer
+multi_resolution = config.multi_resolution  # Use a longer FFT for the bass below crossover_hz
+bass_fft_size = config.bass_fft_size
+crossover_hz = config.crossover_hz
+
+# === Initialize Pygame ===
+# Done on startup rather than at import, so analysis code can be imported
+# (e.g. by headless.py) without opening a window
+def init_display():
+    global display, clock, menu_font, control_font
+    pygame.init()
+    pygame.display.set_caption("Audio Visualizer")
+    display = Display((WIDTH, HEIGHT), fullscreen=config.fullscreen, resizable=config.resizable,
+                      render_height=config.render_height, render_scale=config.render_scale,
+                      smooth=config.render_smooth, fade_alpha=config.fade_alpha)
+    clock = pygame.time.Clock()
+
+    # === Font Setup ===
+    menu_font = pygame.font.SysFont("segoeui", 32)
+    control_font = pygame.font.SysFont("segoeui", 20)
+    update_geometry()
+    if kernels_on():
+        # Compiles the kernels, or loads them from Numba's cache, now
+        # instead of during the first frame
+        pixels = pygame.surfarray.pixels3d(pygame.Surface((8, 8)))
+        kernels.warm_up(pixels)
+        del pixels
+
+def kernels_on():
+    # Numba kernels (kernels.py) instead of the pygame/NumPy drawing paths
+    return config.jit_kernels and kernels.available
 
 # === Available Audio Files ===
 
@@ -56,8 +85,6 @@ control_font = pygame.font.SysFont("segoeui", 20)
 
 AUDIO_FILES = []
 
-script_dir = os.path.dirname(os.path.abspath(__file__))
-
 for filename in os.scandir(script_dir + '/music'): # scandir() works like OOP, take .name
     if filename.name.lower().endswith('wav'):
         AUDIO_FILES.append(filename.path)
@@ -83,25 +110,115 @@ for filename in os.scandir(script_dir + '/music'): # scandir() works like OOP, t
 
 
 # === Constants ===
-BUFFER_SIZE = 1024
-fade_surface = pygame.Surface((WIDTH, HEIGHT))
-fade_surface.set_alpha(80)  # Faster fade
-fade_surface.fill((5, 5, 10))  # Darker fade to prevent ghosting
-flash_surface = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-triangle = [(CENTER[0], CENTER[1] + 100), (CENTER[0] - 100, CENTER[1] - 80), (CENTER[0] + 100, CENTER[1] - 80)]
+# Bin constants are defined on the display grid so they keep pointing at the
+# same frequencies whatever FFT size is configured
+FADE_BINS, BASS_BIN, BASS_ENERGY_BINS = derive_bin_constants(display_bins)
+
+# === Display Geometry ===
+# Render-resolution globals, refreshed from the display's cached assets
+# whenever the window is resized or toggled to fullscreen
+def update_geometry():
+    global screen, render_assets, WIDTH, HEIGHT, CENTER
+    render_assets = display.assets()
+    screen = display.surface
+    WIDTH, HEIGHT = render_assets.width, render_assets.height
+    CENTER = render_assets.center
+
+def handle_display_event(event):
+    # Returns True when the event was a window/fullscreen event
+    if event.type == pygame.VIDEORESIZE:
+        display.resize(event.w, event.h)
+    elif event.type == pygame.KEYDOWN and event.key in (pygame.K_F11, pygame.K_f):
+        display.toggle_fullscreen()
+    else:
+        return False
+    update_geometry()
+    return True
 
 # === FFT Globals ===
-fft_values = np.zeros(BUFFER_SIZE // 2)
+fft_values = np.zeros(display_bins)
 fft_lock = threading.Lock()
-current_pos = [0]
+frame_bus = FrameBus()  # Every analysis frame is published here once for all renderers
+outputs = []            # Extra renderers fed from frame_bus (preview window, frame sinks)
+mood_tracker = MoodTracker()  # Timbre and key of the music, updated as each frame is published (mood.py)
+frame_bus.subscribe('mood', listener=mood_tracker.on_frame)
+transport = None  # Playback position and controls while a file is playing
+playlist = None   # Current and prefetched tracks while files are playing
 running = True
-shape_mode = 0  # 0=circle, 1=heart, 2=triangle, 3=line, 4=donut
-stream = None
-prev_fft = np.zeros(BUFFER_SIZE // 2)
+shape_mode = 0  # Index into shapes.SHAPES; SHAPE_NAMES and SHAPE_COUNT are set once plugins are loaded (end of file)
+shape_changed = 0.0  # perf_counter() time shape_mode last changed, for auto_shape
+stream = None  # Live input source (microphone or test signal, see sources.py)
+analysis_process = None  # Set instead of stream when live analysis runs in a child process
+analysis_worker = AnalysisWorker('fft')  # Runs file analysis; one thread for every track and session
+library = LibraryIndex(os.path.join(script_dir, config.library_index))  # Track features for "play similar"
+library_scan = None  # (thread, cancel event) while the library is being indexed
+mic_analysis = None
+latency_meter = LatencyMeter()
+mic_sample_rate = config.mic_sample_rate
+recorder = None
 beat_pulse = 0
-background_flash = True
+last_sound = 0.0       # perf_counter() time the input was last above config.idle_rms
+power_saving = False   # Set while the render loop runs at idle_fps
+SOUND_RESUMED = pygame.USEREVENT + 2  # Wakes the render loop from power saving (MUSIC_END is +1)
+LIBRARY_READY = pygame.USEREVENT + 3  # Library indexing finished; the menu redraws
+background_flash = config.background_flash
+particles_on = config.particles
 logarithmic = False
 
+# === Config Reload ===
+def apply_analysis_config():
+    # FFT settings change buffer sizes, so they only apply when a stream starts
+    global config, fft_size, hop_size, display_bins, multi_resolution, bass_fft_size, crossover_hz
+    global FADE_BINS, BASS_BIN, BASS_ENERGY_BINS, fft_values
+    apply_live_config(config_watcher.poll())
+    fft_size = config.fft_size
+    hop_size = config.hop_size
+    display_bins = config.display_bins
+    multi_resolution = config.multi_resolution
+    bass_fft_size = config.bass_fft_size
+    crossover_hz = config.crossover_hz
+    FADE_BINS, BASS_BIN, BASS_ENERGY_BINS = derive_bin_constants(display_bins)
+    if len(fft_values) != display_bins:
+        fft_values = np.zeros(display_bins)
+
+def apply_live_config(changed):
+    # Only touch what changed, so a key toggle (e.g. B for flash) survives
+    # reloads that did not edit that key
+    global config, log_scale, palette, background_flash, background_filepath, fps, particles_on
+    config = config_watcher.config
+    if 'log_scale' in changed: log_scale = config.log_scale
+    if changed & {'palette', 'mood_colors'}: palette = config.palette
+    if 'background_flash' in changed: background_flash = config.background_flash
+    if 'particles' in changed: particles_on = config.particles
+    if 'background_image_path' in changed: background_filepath = config.background_image_path
+    if 'fps' in changed: fps = config.fps
+    if 'fade_alpha' in changed: display.set_fade_alpha(config.fade_alpha)
+    if 'render_height' in changed: display.set_render_height(config.render_height)
+    if changed & {'render_scale', 'render_smooth'}: display.set_render_scale(config.render_scale, config.render_smooth)
+    if changed & {'fade_alpha', 'render_height', 'render_scale', 'render_smooth'}: update_geometry()
+
+# === Derived Caches ===
+# Values that are expensive to rebuild every frame. Each entry remembers the
+# inputs it was built from and is only rebuilt when those change.
+_derived_cache = {}
+
+def cached(name, key, build):
+    entry = _derived_cache.get(name)
+    if entry is None or entry[0] != key:
+        entry = (key, build())
+        _derived_cache[name] = entry
+    return entry[1]
+
+def compute_bands(num_points):
+    # Position of each point along the shape, 0 to 1, warped in log mode
+    bands = []
+    for i in range(num_points):
+        band = i / num_points
+        if( logarithmic ):
+            band = math.log( ( log_scale - 1 ) * band + 1, log_scale )
+        bands.append(band)
+    return bands
+
 # === Color Functions ===
 def lerp_color(c1, c2, t):
     return tuple(int(c1[i] + (c2[i] - c1[i]) * t) for i in range(3))
@@ -117,318 +234,839 @@ def clamp_color(color):
     return tuple(min(255, max(0, c)) for c in color)
 
 # === Audio Stream Functions ===
-def audio_callback(indata, frames, time, status):
-    global fft_values, prev_fft, beat_pulse
+def audio_callback(indata, frames, time_info, status):
+    global fft_values, beat_pulse
 
     if status:
         print(status)
 
-    audio_data = np.mean(indata, axis=1)
-    audio_data -= np.mean(audio_data)
-
-
-
-    fft_result = np.abs(fft(audio_data))[:BUFFER_SIZE // 2]
-    fft_result = np.log1p(fft_result)           # Compress peaks
-    fft_result[0] = 0                           # Suppress DC/low freq
-    fft_result = fft_result / np.max(fft_result + 1e-6)
-
+    if recorder is not None:
+        recorder.add_audio(indata)
+    note_level(block_rms(indata))
 
-    fft_result = np.convolve(fft_result, np.ones(3)/3, mode='same')
-
-    alpha = 0.9 # Higher = smoother & slower
-    fft_smoothed = alpha * prev_fft + (1 - alpha) * fft_result
-    bass_energy = np.mean(fft_smoothed[:20])  # First 20 bins = low frequencies
-    if bass_energy > 0.65 and beat_pulse < 0.2:
+    # Same processing as the headless daemon (pipeline.py); the beat pulse is
+    # decayed by the render loop here
+    fft_smoothed, channels, bass_energy = mic_analysis.process(indata)
+    if bass_energy > MIC_BEAT_THRESHOLD and beat_pulse < 0.2:
         beat_pulse = 1.0
-    prev_fft[:] = fft_smoothed
 
     with fft_lock:
         fft_values[:] = fft_smoothed
-
-def start_microphone_stream():
-    global stream
+    frame_bus.publish(fft_smoothed, beat_pulse, channels=channels,
+                      sample_time=time_info.inputBufferAdcTime + frames / mic_sample_rate)
+
+def start_microphone_stream(test_signal=None):
+    # Live input from the microphone, or from a generated test signal
+    # (clicks, impulse, chirp, noise) that needs no audio device
+    global stream, mic_analysis, mic_sample_rate
+    apply_analysis_config()
+    if config.analysis_process:
+        return start_analysis_process(test_signal)
     try:
-        stream = sd.InputStream(samplerate=44100, channels=1, callback=audio_callback, blocksize=BUFFER_SIZE)
-        stream.start()
+        if test_signal:
+            source = SyntheticSource(test_signal, config.mic_sample_rate, input_channels(config), hop_size, bpm=config.test_bpm)
+        else:
+            source = MicSource(config.mic_sample_rate, input_channels(config), hop_size)
+        mic_sample_rate = source.sample_rate  # Analysis follows the source rate; bands are in Hz
+        layout = ChannelLayout(config.channel_mode, source.channels)
+        envelope = create_envelope(config, display_bins, layout.rows, hop_size / mic_sample_rate)
+        mic_analysis = MicAnalysis(create_analyzer(config, mic_sample_rate, layout.rows), BASS_ENERGY_BINS, layout,
+                                   envelope=envelope)
+        stream = source
+        stream.start(audio_callback)
         return True
     except Exception as e:
         print(f"Microphone error: {e}")
         return False
 
 def stop_microphone_stream():
-    global stream
+    global stream, analysis_process
     if stream:
         stream.stop()
-        stream.close()
         stream = None
+    if analysis_process:
+        analysis_worker.cancel()  # Stops reading before the ring goes away
+        analysis_process.stop()
+        analysis_process = None
+
+def start_analysis_process(test_signal=None):
+    # The same capture and analysis as audio_callback, in a child process
+    # (see analysis_process.py); frames arrive through read_analysis_process()
+    # on analysis_worker, which is free while there is no file to analyze
+    global analysis_process, mic_sample_rate
+    try:
+        process = AnalysisProcess(config, test_signal)
+        process.start()
+    except Exception as e:
+        print(f"Microphone error: {e}")
+        return False
+    mic_sample_rate = process.sample_rate
+    analysis_process = process
+    poll_seconds = config.hop_size / process.sample_rate / 2
+    analysis_worker.submit(lambda: read_analysis_process() or poll_seconds)
+    return True
+
+def read_analysis_process():
+    # Publishes every frame the analysis process wrote since the last call.
+    # Polled every half block off the render loop, like audio_callback, so
+    # sound wakes the loop from power saving straight away and the ring never
+    # overflows at a low idle_fps. Beats follow audio_callback, against the
+    # pulse the render loop decays.
+    global beat_pulse
+    spectrum = None
+    for spectrum, channels, frame_beat, timestamp, sample_time, audio in analysis_process.ring.read():
+        if audio is not None:
+            if recorder is not None:
+                recorder.add_audio(audio)
+            note_level(block_rms(audio))
+        if frame_beat == 1.0 and beat_pulse < 0.2:
+            beat_pulse = 1.0
+        frame_bus.publish(spectrum, beat_pulse, timestamp=timestamp, channels=channels, sample_time=sample_time)
+    if spectrum is not None:
+        with fft_lock:
+            fft_values[:] = spectrum
+
+# === Music Library ===
+# Track features for "play similar" (library.py). The index is brought up to
+# date on a background thread when the menu opens; only new and changed
+# files are analyzed, so after the first run this is quick.
+def start_library_scan():
+    global library_scan
+    if library_scanning():
+        return
+    cancel = threading.Event()
+
+    def scan():
+        try:
+            library.update(AUDIO_FILES, workers=config.library_workers or None, cancel=cancel)
+        except Exception as e:
+            print(f"Library indexing failed: {e}")
+        if not cancel.is_set():
+            pygame.event.post(pygame.event.Event(LIBRARY_READY))
+
+    thread = threading.Thread(target=scan, name='library', daemon=True)
+    library_scan = (thread, cancel)
+    thread.start()
+
+def stop_library_scan():
+    # Stops after the files being analyzed; what is done so far is saved
+    if library_scan is not None:
+        library_scan[1].set()
+        library_scan[0].join()
+
+def library_scanning():
+    return library_scan is not None and library_scan[0].is_alive()
+
+def play_similar(selected):
+    # The selected track, then the indexed tracks most like it
+    if selected >= len(AUDIO_FILES):
+        return
+    filename = AUDIO_FILES[selected]
+    if library.features(filename) is None:
+        print("Track not indexed yet, playing it on its own")
+    visualize_playlist([filename] + library.similar(filename, config.similar_count))
 
 # === Menu UI ===
+PLAY_ALL = "-- Play All --"
+TEST_SIGNAL = "-- Test Signal --"
+
+def start_selected(option, selected):
+    if selected < len(AUDIO_FILES):
+        visualize_track(AUDIO_FILES[selected])
+    elif option == PLAY_ALL:
+        if AUDIO_FILES:
+            visualize_playlist(AUDIO_FILES)
+    elif option == TEST_SIGNAL:
+        if start_microphone_stream(test_signal=config.test_signal):
+            visualize_realtime()
+    elif start_microphone_stream():
+        visualize_realtime()
+
+MENU_TIMEOUT_MS = 500  # The menu sleeps in event.wait() between inputs; this bounds each wait
+
+def menu_option_rect(i):
+    menu_w = display.window.get_width()
+    return pygame.Rect(menu_w // 2 - 200, 160 + i * 40, 400, 36)
+
+def draw_menu(options, selected):
+    # The menu is drawn straight to the window so text stays sharp at any render scale
+    menu_screen = display.window
+    menu_w, menu_h = menu_screen.get_size()
+    menu_screen.fill((0, 0, 30))
+    title = menu_font.render("Select an Audio Track:", True, (255, 255, 255))
+    menu_screen.blit(title, (menu_w // 2 - title.get_width() // 2, 80))
+
+    for i, option in enumerate(options):
+        color = (255, 255, 0) if i == selected else (180, 180, 180)
+        label = menu_font.render(option, True, color)
+        menu_screen.blit(label, (menu_w // 2 - label.get_width() // 2, 160 + i * 40))
+
+    # Import instructions
+    controls = "IMPORT: add .wav files to music folder"
+    if library_scanning():
+        controls += f"   Indexing library ({library.pending} left)"
+    elif len(library):
+        controls += "   S: play similar tracks"
+    control_text = control_font.render(controls, True, (150, 150, 150))
+    menu_screen.blit(control_text, (menu_w // 2 - control_text.get_width() // 2, menu_h - 40))
+
+    pygame.display.flip()
+
 def main_menu():
+    # Event driven: the menu is only redrawn after input that changes it, and
+    # sleeps in pygame.event.wait() in between instead of spinning
     global running, shape_mode
 
     # Returns name of song - .wav
     display_names = [os.path.splitext(os.path.basename(path))[0] for path in AUDIO_FILES] 
     
-    options = display_names + ["", "-- Use Microphone --"]
+    options = display_names + ["", PLAY_ALL, "-- Use Microphone --", TEST_SIGNAL]
     selected = 0
+    dirty = True
+    start_library_scan()
 
     while running:
-        screen.fill((0, 0, 30))
-        title = menu_font.render("Select an Audio Track:", True, (255, 255, 255))
-        screen.blit(title, (WIDTH // 2 - title.get_width() // 2, 80))
-
-        mouse_x, mouse_y = pygame.mouse.get_pos()
-
-        for i, option in enumerate(options):
-            option_rect = pygame.Rect(WIDTH // 2 - 200, 160 + i * 40, 400, 36)
-            hovered = option_rect.collidepoint(mouse_x, mouse_y)
-            if hovered:
-                selected = i
-            color = (255, 255, 0) if i == selected else (180, 180, 180)
-            label = menu_font.render(option, True, color)
-            screen.blit(label, (WIDTH // 2 - label.get_width() // 2, 160 + i * 40))
-
-        # Import instructions
-        controls = "IMPORT: add .wav files to music folder"
-        control_text = control_font.render(controls, True, (150, 150, 150))
-        screen.blit(control_text, (WIDTH // 2 - control_text.get_width() // 2, HEIGHT - 40))
-
-        pygame.display.flip()
-
-        for event in pygame.event.get():
+        if dirty:
+            draw_menu(options, selected)
+            dirty = False
+
+        event = pygame.event.wait(MENU_TIMEOUT_MS)
+        if event.type == pygame.NOEVENT:
+            dirty = library_scanning()  # Indexing progress
+            continue
+        for event in [event] + pygame.event.get():
+            if handle_display_event(event):
+                dirty = True
+                continue
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type in (pygame.WINDOWEXPOSED, pygame.WINDOWSIZECHANGED, pygame.WINDOWRESTORED, LIBRARY_READY):
+                dirty = True
+            elif event.type == pygame.MOUSEMOTION:
+                for i in range(len(options)):
+                    if i != selected and menu_option_rect(i).collidepoint(event.pos):
+                        selected, dirty = i, True
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_UP:
                     selected = (selected - 1) % len(options)
+                    dirty = True
                 elif event.key == pygame.K_DOWN:
                     selected = (selected + 1) % len(options)
+                    dirty = True
                 elif event.key == pygame.K_RETURN:
-                    if selected < len(AUDIO_FILES):
-                        visualize_track(AUDIO_FILES[selected])
-                    else:
-                        if start_microphone_stream():
-                            visualize_realtime()
+                    start_selected(options[selected], selected)
+                    dirty = True
+                elif event.key == pygame.K_s:
+                    play_similar(selected)
+                    dirty = True
                 elif event.key == pygame.K_ESCAPE:
                     running = False
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:
-                    if selected < len(AUDIO_FILES):
-                        visualize_track(AUDIO_FILES[selected])
-                    else:
-                        if start_microphone_stream():
-                            visualize_realtime()
+                    start_selected(options[selected], selected)
+                    dirty = True
 
 # === Visualization Logic ===
 def visualize_track(filename):
-    global fft_values, current_pos, running
-    try:
-        sample_rate, data = wavfile.read(filename)
-    except Exception as e:
-        print(f"Failed to load audio: {e}")
+    visualize_playlist([filename])
+
+def visualize_playlist(filenames):
+    global transport, playlist
+    apply_analysis_config()
+    fft_values[:] = 0
+
+    # Tracks are loaded through the playlist, which prefetches the next one
+    # in the background and queues it in the mixer for a gapless change
+    playlist = Playlist(filenames, lambda filename: load_track(filename, config))
+    if not playlist.start():
+        playlist = None
         return
+    transport = playlist.current[1]
+    last = [None, -1]  # (track, hop index) of the last analyzed frame
 
-    if data.ndim > 1:
-        data = data.mean(axis=1)
-    data = data / np.max(np.abs(data))
-    total_samples = len(data)
-
-    current_pos = [0]
-    fft_values = np.zeros(BUFFER_SIZE // 2)
-
-    pygame.mixer.init(frequency=sample_rate)
-    pygame.mixer.music.load(filename)
-    pygame.mixer.music.play()
-
-    def fft_thread():
+    def analyze_step():
+        # One step of file analysis on analysis_worker; returns the seconds to
+        # wait before the next step, or None to finish
         global beat_pulse
-        prev_bass = [0]
-        while pygame.mixer.music.get_busy() and running:
-            with fft_lock:
-                start = current_pos[0]
-                end = start + BUFFER_SIZE
-                if end > total_samples:
-                    break
-                window = data[start:end] * np.hanning(BUFFER_SIZE)
-                window -= np.mean(window)
-
-                spectrum = np.abs(np.fft.fft(window))[:BUFFER_SIZE // 2]
-                fade_bins = 25  # First 10 bins will be scaled from 0 to 1
-                fade = np.ones_like(spectrum)
-                fade[:fade_bins] = np.power(np.linspace(0.0, 1.0, fade_bins), 3)
-                spectrum *= fade
-
-                spectrum = np.log1p(spectrum)              # Compress dynamic range
-                spectrum /= np.max(spectrum + 1e-6)
-                spectrum *= 0.3
-
-
-                spectrum = np.convolve(spectrum, np.ones(2) / 2, mode='same')
-
-                #print(" | ".join(f"{i}:{spectrum[i]:.2f}" for i in range(1, 15)))
-
-
-                bass_band = spectrum[10]  # focus on 60–300 Hz, actual kick & bass
-
-                bass_energy = (np.max(bass_band))
-                prev_bass[0] = bass_energy
+        if not running:
+            return None
+        track, player = playlist.current
+        # Analysis follows the mixer clock, so after a seek or while
+        # scrubbing only the frame at the new position is computed
+        index, end = player.frame_end(hop_size, fft_size)
+        if (track, index) == (last[0], last[1]) or player.finished():  # Paused, same hop, or waiting for the next track
+            return hop_size / track.sample_rate / 2
+        layout = track.layout
+        analysis = file_analysis_state(layout, track.sample_rate)
+        if track is not last[0]:
+            analysis.reset()  # Buffers are kept across tracks while the layout and rate match; the smoothing starts over
+        last[:] = track, index
+        mono = track.data[layout.mono_row] if layout.rows > 1 else track.data
+        note_level(block_rms(mono[max(0, end - hop_size):end]))  # The newest hop, for power saving
+        with fft_lock:
+            shaped, channels, bass_energy = analysis.process(track.analyzer, track.data, end)
 
-                if bass_energy >= 0.08 and beat_pulse < 0.2:
-                    beat_pulse = min(1.0, bass_energy * 30)  # flash stronger on harder hits
-                
-                # Reset beat pulse 
-                beat_pulse = max(0.0, beat_pulse - 0.05)
+            if bass_energy >= 0.08 and beat_pulse < 0.2:
+                beat_pulse = min(1.0, bass_energy * 30)  # flash stronger on harder hits
+            
+            # Reset beat pulse 
+            beat_pulse = max(0.0, beat_pulse - 0.05)
 
 
-                fft_values[:] = spectrum
-                current_pos[0] += BUFFER_SIZE
-            time.sleep(BUFFER_SIZE / sample_rate)
+            fft_values[:] = shaped
+            # When the newest analyzed sample is played, by the mixer clock
+            sample_time = time.perf_counter() + end / track.sample_rate - player.position()
+            frame_bus.publish(shaped, beat_pulse, channels=channels, sample_time=sample_time)
+        return hop_size / track.sample_rate / 2
 
-    threading.Thread(target=fft_thread, daemon=True).start()
+    analysis_worker.submit(analyze_step)
     run_visualizer()
-    pygame.mixer.music.stop()
+    analysis_worker.cancel()  # Returns once the last step is done, before the playlist goes away
+    playlist.stop()
+    transport = playlist = None
+    stop_recording()
+
+def file_analysis_state(layout, sample_rate):
+    # FileAnalysis (pipeline.py) for the track's layout and rate
+    key = (layout.mode, layout.rows, sample_rate, display_bins, hop_size, config.attack_ms, config.release_ms,
+           config.peak_hold_ms, config.peak_falloff, config.smooth_width)
+    return cached('file_analysis', key, lambda: FileAnalysis(
+        display_bins, FADE_BINS, BASS_BIN, layout,
+        create_envelope(config, display_bins, layout.rows, hop_size / sample_rate)))
 
 def visualize_realtime():
     run_visualizer()
+    stop_recording()
     stop_microphone_stream()
 
+# === Extra Outputs ===
+# Renderers that read frames from frame_bus instead of running their own FFT.
+# Each has its own surface, resolution and shape, and only redraws when the
+# analysis publishes a new frame.
+class OffscreenOutput:
+    def __init__(self, name, size, shape, on_frame=None):
+        self.name = name
+        self.shape = shape
+        self.on_frame = on_frame  # Called with (surface, frame) after each draw
+        self.surface = pygame.Surface(size).convert()
+        # Same layout as the main window at its configured height
+        self.assets = RenderAssets(size[0], size[1], config.fade_alpha, size[1] / config.height)
+        self.subscription = frame_bus.subscribe(name)
+        self.frames = 0
+
+    def render(self):
+        frame = self.subscription.poll()
+        if frame is None:
+            return False
+        draw_frame(self.surface, self.assets, frame.spectrum, frame.beat_pulse, self.shape, frame.channels)
+        self.frames += 1
+        if self.on_frame is not None:
+            self.on_frame(self.surface, frame)
+        return True
+
+    def close(self):
+        self.subscription.close()
+
+class PreviewWindow(OffscreenOutput):
+    # A second OS window, using pygame's SDL2 window API
+    def __init__(self, name, size, shape):
+        super().__init__(name, size, shape)
+        self.window = Window(f"Audio Visualizer - {name}", size=size)
+        self.renderer = Renderer(self.window)
+        self.texture = Texture.from_surface(self.renderer, self.surface)
+
+    def render(self):
+        if not super().render():
+            return False
+        self.texture.update(self.surface)
+        self.renderer.clear()
+        self.renderer.blit(self.texture)
+        self.renderer.present()
+        return True
+
+    def close(self):
+        super().close()
+        self.window.destroy()
+
+def save_every(directory, every):
+    # on_frame callback for frame sinks: saves every Nth frame as a PNG
+    os.makedirs(directory, exist_ok=True)
+    def save(surface, frame):
+        if frame.seq % every == 0:
+            pygame.image.save(surface, os.path.join(directory, f"frame_{frame.seq:08d}.png"))
+    return save
+
+def start_outputs():
+    if config.preview_window:
+        size = (config.preview_width, config.preview_height)
+        if Window is not None:
+            outputs.append(PreviewWindow('preview', size, config.preview_shape % SHAPE_COUNT))
+        else:
+            print("Preview window needs pygame 2 with SDL2 window support")
+    if config.frame_sink:
+        size = (config.frame_sink_width, config.frame_sink_height)
+        sink_dir = os.path.join(script_dir, config.frame_sink_dir)
+        outputs.append(OffscreenOutput('frame_sink', size, config.frame_sink_shape % SHAPE_COUNT,
+                                       on_frame=save_every(sink_dir, config.frame_sink_every)))
+
+def stop_outputs():
+    while outputs:
+        outputs.pop().close()
+
+# === Recording ===
+def start_recording():
+    global recorder
+    # Mic audio is recorded alongside the frames; file playback is video only
+    recorder = Recorder(os.path.join(script_dir, config.record_dir), display.size, fps,
+                        pool_frames=config.record_pool_frames, sample_rate=mic_sample_rate)
+    print(f"Recording to {recorder.video_path}")
+
+def stop_recording():
+    global recorder
+    if recorder is None:
+        return
+    finished, recorder = recorder, None
+    stats = finished.stop()
+    outcome = f"failed ({stats['error']})" if stats['error'] else "saved"
+    print(f"Recording {outcome}: {stats['frames_written']} frames written, {stats['frames_dropped']} dropped, "
+          f"writer {stats['writer_fps']:.1f} fps / {stats['writer_mb_per_s']:.1f} MB/s")
+
+# === Transport Controls ===
+# Seek, pause and the scrub bar for file playback, drawn at window resolution
+def scrub_bar_rect():
+    window_w, window_h = display.window.get_size()
+    return pygame.Rect(40, window_h - 70, window_w - 80, 8)
+
+def render_scrub_bar():
+    rect = scrub_bar_rect()
+    position = transport.position()
+    bar = pygame.Surface(rect.size)
+    bar.fill((60, 60, 60))
+    bar.fill((200, 200, 200), (0, 0, int(rect.width * position / max(transport.duration, 1e-6)), rect.height))
+    label = f"{format_time(position)} / {format_time(transport.duration)}"
+    if len(playlist.filenames) > 1:
+        label = f"{playlist.current[0].name}  ({playlist.index + 1}/{len(playlist.filenames)})   {label}"
+    if transport.paused:
+        label += "  (paused)"
+    text = control_font.render(label, True, (180, 180, 180))
+    return [(bar, rect.topleft), (text, (rect.x, rect.y - text.get_height() - 4))]
+
+def handle_transport_event(event):
+    # Returns True when the event was a playback control
+    global transport
+    if transport is None:
+        return False
+    if event.type == MUSIC_END:
+        playlist.on_music_end()
+        transport = playlist.current[1]
+        return True
+    if event.type == pygame.KEYDOWN:
+        if event.key == pygame.K_LEFT:
+            transport.skip(-config.seek_seconds)
+        elif event.key == pygame.K_RIGHT:
+            transport.skip(config.seek_seconds)
+        elif event.key == pygame.K_p:
+            transport.toggle_pause()
+        else:
+            return False
+        return True
+
+    rect = scrub_bar_rect()
+    grab = rect.inflate(0, 16)  # Easier to hit than the 8 pixel bar
+    if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and grab.collidepoint(event.pos):
+        transport.scrub((event.pos[0] - rect.x) / rect.width)
+    elif event.type == pygame.MOUSEMOTION and transport.scrub_position is not None:
+        transport.scrub((event.pos[0] - rect.x) / rect.width)
+    elif event.type == pygame.MOUSEBUTTONUP and event.button == 1 and transport.scrub_position is not None:
+        transport.release()
+    else:
+        return False
+    return True
+
 def run_visualizer():
-    global running, shape_mode, beat_pulse, background_flash, logarithmic, log_scale
+    global latency_meter
+    latency_meter = LatencyMeter()
+    note_level(1.0)  # Start at full rate
+    mood_tracker.reset()
+    if frame_bus.latest is not None:
+        latency_meter.last_seq = frame_bus.latest.seq  # Left over from the last track or stream
+    start_outputs()
+    try:
+        run_visualizer_loop()
+    finally:
+        stop_outputs()
+    summary = latency_meter.summary()
+    if config.show_latency and summary is not None:
+        print(f"Sample-to-display latency over {summary['frames']} frames: mean {summary['mean']:.1f} ms, "
+              f"p50 {summary['p50']:.1f} ms, p95 {summary['p95']:.1f} ms, max {summary['max']:.1f} ms")
+    if config.show_stats:
+        print("Analysis: " + ", ".join(f"{key} {value:.1f}" if isinstance(value, float) else f"{key} {value}"
+                                       for key, value in analysis_stats().items()))
+
+def analysis_stats():
+    # Health of whatever is producing frames: the file analysis worker, the
+    # analysis process, and the frame bus
+    stats = {f"worker_{key}": value for key, value in analysis_worker.stats().items()}
+    if analysis_process is not None:
+        stats['process_alive'] = analysis_process.alive()
+        stats['ring_skipped'] = analysis_process.ring.skipped
+    stats['power_saving'] = power_saving
+    stats['bus_subscribers'] = len(frame_bus.subscriptions)
+    stats['bus_skipped'] = sum(s.skipped for s in frame_bus.subscriptions)
+    return stats
+
+def run_visualizer_loop():
+    global running, shape_mode, shape_changed, beat_pulse, background_flash, logarithmic, log_scale, particles_on, palette
 
-    background = ''
-    if not( background_filepath == '' ): pygame.transform.scale( pygame.image.load( os.path.join( script_dir, background_filepath ) ).convert(), ( WIDTH, HEIGHT ) )
     while running:
-        if not( background == '' ): screen.blit( background, ( 0, 0 ) ) # Background Image load
-        else: screen.fill( ( 0, 0, 0 ) ) #Ensures that config file is not necessary
+        changed = config_watcher.poll()
+        if changed:
+            apply_live_config(changed)
+            deferred = sorted(changed - LIVE_KEYS)
+            if deferred:
+                print(f"Config: {', '.join(deferred)} will apply on the next track or restart")
+
         if beat_pulse > 0:
             beat_pulse *= 0.92  # decay
         else:
             beat_pulse = 0
-        bg_intensity = int(beat_pulse * 50)
-
-        # fade
 
-        screen.blit(fade_surface, (0, 0))  # Draw the trail first
-
-        # Then draw the purple flash on top so it's visible
-        if background_flash and beat_pulse > 0:
-            intensity = int(beat_pulse * 100)
-            flash_surface.fill((intensity, 0, intensity, 60))  # strong alpha for visibility
-            screen.blit(flash_surface, (0, 0))
-            
-         # print(f"beat_pulse: {beat_pulse:.2f}") disabled for now
+        if playlist is not None:
+            playlist.update()
 
-        num_points = 512
-        base_radius = 100
-        points = []
-        fade_bins = 25
+        # The palette and, with auto_shape, the shape follow the mood
+        if config.mood_colors:
+            palette = mood_palette(config.palette, mood_tracker.mood)
+        if config.auto_shape > 0 and time.perf_counter() - shape_changed >= config.auto_shape:
+            mode = mood_shape(SHAPES, mood_tracker.mood, shape_mode)
+            if mode != shape_mode:
+                shape_mode, shape_changed = mode, time.perf_counter()
 
-        with fft_lock:
-            smoothed_fft = np.convolve(fft_values, np.ones(3)/3, mode='same')
-            active_fft = smoothed_fft[fade_bins:]
-            num_points = len(active_fft)
-
-            # Resample to match num_points around the shape
-            resampled_fft = np.interp(
-                np.linspace(0, len(smoothed_fft) - 1, num_points),
-                np.arange(len(smoothed_fft)),
-                smoothed_fft
-            )
-
-            for i in range(num_points):
-                band = i / num_points
-                if( logarithmic ):
-                    band = math.log( ( log_scale - 1 ) * band + 1, log_scale )
-                angle = 2 * math.pi * band
-                amplitude = active_fft[i] ** 0.7 * (1 + beat_pulse * 1.5) # DISPERSED IT MORE
-                amplitude *= 0.42
-
-                if shape_mode == 0:  # Circle
-                    radius = base_radius + amplitude * 300
-                    x = CENTER[0] + radius * math.cos(angle)
-                    y = CENTER[1] + radius * math.sin(angle)
-
-                elif shape_mode == 1:  # Heart shape
-                    heart_x = 16 * math.sin(angle) ** 3
-                    heart_y = 13 * math.cos(angle) - 5 * math.cos(2 * angle) - 2 * math.cos(3 * angle) - math.cos(4 * angle)
-
-                    scale = 10 * (1 + amplitude * 2)  # Size and amplitude response
-                    x = CENTER[0] + heart_x * scale
-                    y = CENTER[1] - heart_y * scale  # Invert y for screen coordinates
-
-                elif shape_mode == 2:  # Triangle
-                    if band < 1/3:
-                        t = band * 3
-                        x = triangle[0][0] + (triangle[1][0] - triangle[0][0]) * t
-                        y = triangle[0][1] + (triangle[1][1] - triangle[0][1]) * t
-                    elif band < 2/3:
-                        t = (band - 1/3) * 3
-                        x = triangle[1][0] + (triangle[2][0] - triangle[1][0]) * t
-                        y = triangle[1][1] + (triangle[2][1] - triangle[1][1]) * t
-                    else:
-                        t = (band - 2/3) * 3
-                        x = triangle[2][0] + (triangle[0][0] - triangle[2][0]) * t
-                        y = triangle[2][1] + (triangle[0][1] - triangle[2][1]) * t
-                    dx, dy = x - CENTER[0], y - CENTER[1]
-                    scale = 1 + amplitude * 2
-                    x = CENTER[0] + dx * scale
-                    y = CENTER[1] + dy * scale
-                elif shape_mode == 3: # Line
-                    x = band * CENTER[ 0 ] * 2
-                    y = -CENTER[ 1 ] * amplitude + CENTER[ 1 ]
-                    # Both 'If's are meant to hide the continuity line from the beginning to the end of the spectrum
-                    if( i == 0 ):
-                        x = -10000
-                        y = HEIGHT
-                    elif( i == num_points - 1 ):
-                        x = 10000
-                        y = -10000
-                elif shape_mode == 4:  # Donut
-                    radius = base_radius + amplitude * 300
-                    x = CENTER[ 0 ] + radius * ( math.cos( 2 * angle ) * int( angle > math.pi ) + math.cos( 2 * angle ) ) / 2
-                    y = CENTER[ 1 ] + radius * ( math.sin( 2 * angle ) * int( angle > math.pi ) + math.sin( 2 * angle ) ) / 2 
-                color = get_blended_color( band ) # Change this check Marc commit 1 if like old >
-                points.append((x, y, color, amplitude))
-
-        if len(points) > 1:
-            points.append(points[0])
-
-        for i in range(1, len(points)):
-            x1, y1, c1, a1 = points[i - 1]
-            x2, y2, c2, a2 = points[i]
-            glow = clamp_color(tuple(min(255, c + int(a2 * 350)) for c in c2))
-            core = clamp_color(c2)
-            pygame.draw.line(screen, glow, (x1, y1), (x2, y2), 6)
-            pygame.draw.line(screen, core, (x1, y1), (x2, y2), max(1, int(a2 * 10)))
-
-        # Control instructions inside visualizer
-        controls = " |  Space: Change Shape  |  B: Background Flash  |  L: Log/Linear Scale  |  ESC: Back/Quit  |"
+        frame = frame_bus.latest
+        if frame is not None:
+            draw_frame(screen, render_assets, frame.spectrum, beat_pulse, shape_mode, frame.channels)
+        else:
+            draw_frame(screen, render_assets, fft_values, beat_pulse, shape_mode)
+        for output in outputs:
+            output.render()
+        if recorder is not None:
+            recorder.capture(screen)
+
+        # Control instructions inside visualizer, drawn at window resolution
+        controls = " |  Space: Change Shape  |  B: Background Flash  |  K: Particles  |  L: Log/Linear Scale  |  F: Fullscreen  |  R: Record  |  ESC: Back/Quit  |"
+        if transport is not None:
+            controls = " |  Left/Right: Seek  |  P: Pause" + controls
         control_text = control_font.render(controls, True, (180, 180, 180))
-        screen.blit(control_text, (WIDTH // 2 - control_text.get_width() // 2, HEIGHT - 40))
-
-        pygame.display.flip()
+        window_w, window_h = display.window.get_size()
+        overlays = [(control_text, (window_w // 2 - control_text.get_width() // 2, window_h - 40))]
+        if transport is not None:
+            overlays += render_scrub_bar()
+        if recorder is not None:
+            stats = recorder.stats()
+            status = f"REC  {stats['frames_written']} written  {stats['frames_dropped']} dropped  writer {stats['writer_fps']:.0f} fps"
+            if stats['error']:
+                status = f"REC FAILED  {stats['frames_written']} written  {stats['error']}"
+            overlays.append((control_font.render(status, True, (255, 60, 60)), (20, 20)))
+        if config.show_latency:
+            summary = latency_meter.summary()
+            if summary is not None:
+                text = control_font.render(f"latency {summary['p50']:.0f} ms  p95 {summary['p95']:.0f} ms", True, (180, 180, 180))
+                overlays.append((text, (window_w - text.get_width() - 20, 20)))
+        if config.show_stats:
+            stats = analysis_stats()
+            if analysis_process is not None:
+                status = f"process {'up' if stats['process_alive'] else 'DOWN'}  ring skipped {stats['ring_skipped']}"
+            else:
+                status = (f"worker {'up' if stats['worker_alive'] else 'DOWN'}  {'busy' if stats['worker_busy'] else 'idle'}  "
+                          f"queue {stats['worker_queued']}  step {stats['worker_last_step_ms']:.1f} ms  "
+                          f"max {stats['worker_max_step_ms']:.1f} ms  errors {stats['worker_errors']}")
+            text = control_font.render(status, True, (180, 180, 180))
+            overlays.append((text, (window_w - text.get_width() - 20, 44)))
+        display.present(overlays)
+        latency_meter.observe(frame, time.perf_counter())
 
         for event in pygame.event.get():
+            if handle_display_event(event) or handle_transport_event(event):
+                continue
             if event.type == pygame.QUIT:
                 running = False
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
-                    shape_mode = (shape_mode + 1) % 5
+                    shape_mode = (shape_mode + 1) % SHAPE_COUNT
+                    shape_changed = time.perf_counter()  # auto_shape keeps a chosen shape for a while too
                 elif event.key == pygame.K_ESCAPE:
                     return
                 elif event.key == pygame.K_b:
                     background_flash = not background_flash
+                elif event.key == pygame.K_k:
+                    particles_on = not particles_on
                 elif event.key == pygame.K_l:
                     logarithmic = not( logarithmic )
-
-        clock.tick(60)
+                elif event.key == pygame.K_r:
+                    if recorder is None:
+                        start_recording()
+                    else:
+                        stop_recording()
+
+        pace_frame()
+
+# === Power Saving ===
+# The render loop runs at fps while there is sound or a recording is running.
+# After idle_after seconds of input below idle_rms it drops to idle_fps,
+# sleeping in event.wait() so that input, or SOUND_RESUMED from the analysis,
+# wakes it straight away.
+def note_level(rms):
+    # Called by the analysis with the RMS of each new block
+    global last_sound, power_saving
+    mood_tracker.level = rms
+    if rms >= config.idle_rms:
+        last_sound = time.perf_counter()
+        if power_saving:
+            power_saving = False
+            pygame.event.post(pygame.event.Event(SOUND_RESUMED))
+
+def pace_frame():
+    global power_saving
+    silent = time.perf_counter() - last_sound > config.idle_after
+    # Recordings are encoded at a constant fps, so they keep the full rate
+    if recorder is not None or not (silent and 0 < config.idle_fps < fps):
+        power_saving = False
+        clock.tick(fps)
+        return
+    power_saving = True
+    remaining = 1000 / config.idle_fps - clock.tick()
+    if remaining >= 1:
+        event = pygame.event.wait(int(remaining))
+        if event.type not in (pygame.NOEVENT, SOUND_RESUMED):
+            pygame.event.post(event)  # Handled by the loop on the next frame
+    clock.tick()  # The next frame's time counts from here
+
+def draw_frame(surface, assets, spectrum, beat_pulse, shape_mode, channels=None):
+    # Draws one frame of a shape onto a render surface. Every renderer (main
+    # window, preview, frame sinks) goes through here with its own surface and
+    # per-resolution assets. Sizes are multiplied by the assets' scale so a
+    # reduced render resolution looks the same once it is upscaled.
+    # channels is the (2, bins) per-channel spectrum used by the stereo shape.
+    shape = shape_for(assets, shape_mode, len(spectrum) - FADE_BINS)
+    if shape.backdrop:
+        draw_backdrop(surface, assets, beat_pulse)
+
+    # Outlines are drawn on the bloom layer, which bloom.finish() puts on
+    # the surface together with its glow
+    bloom = assets_bloom(assets) if config.bloom and shape.bloom else None
+    target = bloom.begin() if bloom is not None else surface
+    if shape.draw is not None:
+        points = shape.draw(target, assets, spectrum, channels, beat_pulse)
+        drawn = points_rect(points, assets.scale) if points else target.get_rect()
+    else:
+        if shape.channels:  # Both channels, or the mono spectrum twice
+            spectrum = channels if channels is not None else np.broadcast_to(spectrum, (2, len(spectrum)))
+        amplitudes = shape_amplitudes(spectrum, beat_pulse)
+        num_points = amplitudes.shape[-1]
+        bands = cached('bands', (num_points, logarithmic, log_scale), lambda: compute_bands(num_points))
+        colors = cached('colors', (num_points, logarithmic, log_scale, tuple(palette)), lambda: [get_blended_color(band) for band in bands])
+        x, y = shape.place(amplitudes)
+        points, rects = [], []
+        for xs, ys, amps in zip(np.atleast_2d(x), np.atleast_2d(y), np.atleast_2d(amplitudes)):  # One outline per row
+            outline = list(zip(xs.tolist(), ys.tolist(), colors, amps.tolist()))
+            if shape.closed and len(outline) > 1:
+                outline.append(outline[0])
+            rects.append(draw_segments(target, outline, assets.scale))
+            points += outline
+        drawn = rects[0].unionall(rects)
+    if bloom is not None:
+        bloom.finish(surface, drawn, config.bloom_radius * assets.scale, config.bloom_strength, kernels_on())
+    draw_particles(surface, assets, beat_pulse, points)
+
+def shape_for(assets, shape_mode, num_points):
+    # The assets keep one instance of each shape, rebuilt when the point
+    # count or band warping changes
+    key = (num_points, logarithmic, log_scale)
+    entry = assets.shapes.get(shape_mode)
+    if entry is None or entry[0] != key:
+        bands = cached('bands', key, lambda: compute_bands(num_points))
+        entry = assets.shapes[shape_mode] = (key, SHAPES[shape_mode](bands, assets))
+    return entry[1]
+
+def points_rect(points, render_scale):
+    # Area covered by segments through points, as drawn by draw_segments
+    xs, ys = [p[0] for p in points], [p[1] for p in points]
+    pad = int(max(p[3] for p in points) * 10 * render_scale) + 1
+    left, top = int(min(xs)) - pad, int(min(ys)) - pad
+    return pygame.Rect(left, top, int(max(xs)) + pad - left + 1, int(max(ys)) + pad - top + 1)
+
+def assets_bloom(assets):
+    if assets.bloom is None:
+        assets.bloom = Bloom((assets.width, assets.height))
+    return assets.bloom
+
+def draw_backdrop(surface, assets, beat_pulse):
+    background = assets.background(background_filepath and os.path.join(script_dir, background_filepath))
+    if background is not None: surface.blit( background, ( 0, 0 ) ) # Background Image load
+    else: surface.fill( ( 0, 0, 0 ) ) #Ensures that config file is not necessary
+
+    # fade
+
+    surface.blit(assets.fade_surface, (0, 0))  # Draw the trail first
+
+    # Then draw the purple flash on top so it's visible
+    if background_flash and beat_pulse > 0:
+        intensity = int(beat_pulse * 100)
+        assets.flash_surface.fill((intensity, 0, intensity, 60))  # strong alpha for visibility
+        surface.blit(assets.flash_surface, (0, 0))
+
+# === Particles ===
+# Bursts from the center on each beat and sparks off the loud points of the
+# shape (particles.py). Each render surface has its own system in its assets,
+# stepped by the time since that surface was last drawn.
+def draw_particles(surface, assets, beat_pulse, points=None):
+    if not particles_on:
+        return
+    system = assets.particles
+    now = time.perf_counter()
+    if system is None or system.capacity != config.particle_capacity:
+        system = assets.particles = ParticleSystem(config.particle_capacity)
+        assets.particle_clock = (now, beat_pulse)
+    last_time, last_pulse = assets.particle_clock
+    assets.particle_clock = (now, beat_pulse)
+    dt = min(0.1, now - last_time)
+    scale = assets.scale
+
+    system.update(dt, assets.width, assets.height, scale)
+    if beat_pulse > last_pulse + 0.3:  # A new beat
+        system.burst(assets.center[0], assets.center[1], int(config.particle_burst * beat_pulse), 400 * scale, palette)
+    if points and config.particle_sparks > 0:
+        coords = np.array([(p[0], p[1], p[3]) for p in points])
+        colors = np.array([p[2] for p in points], dtype=np.float32)
+        system.sparks(coords[:, 0], coords[:, 1], coords[:, 2], colors, assets.center[0], assets.center[1],
+                      config.particle_sparks * dt * 60, 0.25, 150 * scale)
+
+    pixels = pygame.surfarray.pixels3d(surface)
+    system.splat(pixels, max(1, round(2 * scale)), kernels_on())
+    del pixels  # Unlocks the surface
+
+# === Waterfall ===
+# Time runs right to left, low frequencies at the bottom. The history lives
+# on its own surface in the render assets (the render surface gets trails and
+# flashes every frame). Each frame scrolls it one column and writes only the
+# new column through a palette LUT, so the cost does not depend on how much
+# history is on screen.
+def waterfall_rows(height, bins):
+    # Spectrum bin shown on each row, top to bottom, with the same band
+    # warping as the shapes in log mode; the faded lowest bins are skipped
+    bands = np.array(compute_bands(bins - FADE_BINS))
+    heights = (height - 1 - np.arange(height)) / height
+    return FADE_BINS + np.minimum(np.searchsorted(bands, heights), bins - FADE_BINS - 1)
+
+def waterfall_lut():
+    # 256 colors from black through the palette; brightness follows the level
+    n = len(palette)
+    levels = np.arange(256) / 255
+    colors = np.array([get_blended_color(t * (n - 1) / n) for t in levels], dtype=float)
+    return (colors * levels[:, None]).astype(np.uint8)
+
+def draw_waterfall(surface, assets, spectrum, beat_pulse):
+    width, height = assets.width, assets.height
+    history = assets.waterfall
+    if history is None:
+        history = assets.waterfall = pygame.Surface((width, height)).convert()
+        history.fill((0, 0, 0))
+    rows = cached('waterfall_rows', (height, len(spectrum), FADE_BINS, logarithmic, log_scale),
+                  lambda: waterfall_rows(height, len(spectrum)))
+    lut = cached('waterfall_lut', tuple(palette), waterfall_lut)
+    levels, index, column = cached('waterfall_column', (height, spectrum.dtype), lambda: (
+        np.empty(height, dtype=spectrum.dtype), np.empty(height, dtype=np.intp), np.empty((height, 3), dtype=np.uint8)))
+
+    # Level of each row: normalized to the loudest bin, gamma for the quiet
+    # ones, and lifted on beats
+    np.take(spectrum, rows, out=levels)
+    levels /= np.max(levels) + 1e-6
+    np.power(levels, 0.7, out=levels)
+    levels *= 255 * (1 + beat_pulse * 0.5)
+    np.clip(levels, 0, 255, out=levels)
+    np.copyto(index, levels, casting='unsafe')
+    np.take(lut, index, axis=0, out=column)
+
+    history.scroll(-1, 0)
+    pixels = pygame.surfarray.pixels3d(history)
+    pixels[-1] = column
+    del pixels  # Unlocks the surface
+    surface.blit(history, (0, 0))
+
+def shape_amplitudes(spectrum, beat_pulse):
+    # Per-point amplitudes: smoothed across 3 bins, faded low bins dropped,
+    # compressed with ** 0.7 and boosted on beats. Written into cached
+    # buffers, so nothing is allocated per frame. spectrum may have one row
+    # per channel (see Shape.channels).
+    shape = spectrum.shape
+    bins = shape[-1]
+    smoothed, amplitudes = cached(f'amplitudes{len(shape)}', (shape, FADE_BINS),
+                                  lambda: (np.empty(shape), np.empty(shape[:-1] + (bins - FADE_BINS,))))
+    smooth_bins(spectrum, 3, smoothed)
+    np.power(smoothed[..., FADE_BINS:], 0.7, out=amplitudes)
+    amplitudes *= 1 + beat_pulse * 1.5  # DISPERSED IT MORE
+    amplitudes *= 0.42
+    return amplitudes
+
+def draw_segments(surface, points, render_scale):
+    # Core line whose width follows the amplitude; the glow comes from the
+    # bloom pass (bloom.py). Returns the area drawn in.
+    if kernels_on():
+        return draw_segments_jit(surface, points, render_scale)
+    rects = []
+    for i in range(1, len(points)):
+        x1, y1, c1, a1 = points[i - 1]
+        x2, y2, c2, a2 = points[i]
+        rects.append(pygame.draw.line(surface, clamp_color(c2), (x1, y1), (x2, y2), max(1, int(a2 * 10 * render_scale))))
+    return rects[0].unionall(rects) if rects else pygame.Rect(0, 0, 0, 0)
+
+def draw_segments_jit(surface, points, render_scale):
+    # The same segments, anti-aliased, in one kernels.polyline call
+    x, y, amplitudes = np.array([(p[0], p[1], p[3]) for p in points]).T.copy()
+    widths = np.maximum(1, (amplitudes * 10 * render_scale).astype(int)).astype(float)
+    colors = np.array([clamp_color(p[2]) for p in points], dtype=float)
+    pixels = pygame.surfarray.pixels3d(surface)
+    left, top, right, bottom = kernels.polyline(pixels, x, y, widths, colors)
+    del pixels  # Unlocks the surface
+    return pygame.Rect(left, top, max(0, right - left), max(0, bottom - top))
+
+# === Shape Registry ===
+# The built-in outlines are registered by shapes.py (modes 0-5); the mode
+# below draws itself and comes next, then any plugins in plugins/.
+@register
+class Waterfall(Shape):
+    name = 'waterfall'  # Scrolling spectrogram with its own history surface
+    backdrop = False
+    bloom = False
+
+    def draw(self, surface, assets, spectrum, channels, beat_pulse):
+        draw_waterfall(surface, assets, spectrum, beat_pulse)
+
+load_plugins(os.path.join(script_dir, 'plugins'))
+SHAPE_NAMES = shape_names()
+SHAPE_COUNT = len(SHAPE_NAMES)
 
 # === Start Program ===
 if __name__ == "__main__":
+    spectrum_server = None
+    init_display()
     try:
+        if config.stream_server:
+            spectrum_server = SpectrumServer(frame_bus, config.stream_host, config.stream_port,
+                                             band_count=config.stream_bands, skip_bins=FADE_BINS)
+            try:
+                spectrum_server.start_in_thread()
+                print(f"Streaming spectrum frames on {config.stream_host}:{spectrum_server.port}")
+            except OSError as e:  # Port in use or bad host: run without streaming
+                print(f"Stream server error: {e}")
+                spectrum_server = None
         main_menu()
     finally:
+        if spectrum_server is not None:
+            spectrum_server.stop_thread()
+        stop_recording()
         stop_microphone_stream()
+        stop_library_scan()
+        analysis_worker.stop()
         pygame.mixer.quit()
         pygame.quit()
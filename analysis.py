@@ -0,0 +1,315 @@
+import math
+
+import numpy as np
+
+
+# === Reference Resolution ===
+# The original visualizer was tuned around a 1024-point FFT at 44.1 kHz
+# (~43 Hz per bin, 512 display bins). Magnitudes are scaled back to this
+# reference so other FFT sizes look the same on screen.
+REFERENCE_SAMPLE_RATE = 44100
+REFERENCE_FFT_SIZE = 1024
+REFERENCE_DISPLAY_BINS = REFERENCE_FFT_SIZE // 2
+
+# The display grid always spans 0 Hz to DISPLAY_MAX_HZ, whatever the sample
+# rate, so a display bin means the same frequency for every source. Above
+# the source's Nyquist frequency the grid is empty; content above
+# DISPLAY_MAX_HZ is not shown.
+DISPLAY_MAX_HZ = REFERENCE_SAMPLE_RATE / 2
+
+# Bands in Hz (the original bin constants at the reference resolution)
+FADE_HZ = 1076.66        # Lowest frequencies faded in from 0 to 1 (25 bins)
+BASS_HZ = 430.66         # Display bin used for file-mode beat detection (bin 10)
+BASS_ENERGY_HZ = 861.33  # Range averaged for mic-mode beat detection (20 bins)
+
+
+def derive_bin_constants(display_bins):
+    # Returns (fade_bins, bass_bin, bass_energy_bins) for a display grid size
+    bin_hz = DISPLAY_MAX_HZ / display_bins
+    fade_bins = max(1, int(round(FADE_HZ / bin_hz)))
+    bass_bin = min(display_bins - 1, max(1, int(round(BASS_HZ / bin_hz))))
+    bass_energy_bins = max(1, int(round(BASS_ENERGY_HZ / bin_hz)))
+    return fade_bins, bass_bin, bass_energy_bins
+
+
+def resample(data, sample_rate, target_rate):
+    # Polyphase resampling along the last axis to target_rate, only ever
+    # downwards: anything above DISPLAY_MAX_HZ is not drawn, so a 96 kHz
+    # file analyzed at 44.1 kHz costs the same as a 44.1 kHz one.
+    # Returns (data, sample_rate).
+    if not target_rate or sample_rate <= target_rate:
+        return data, sample_rate
+    from scipy.signal import resample_poly  # Slow to import, and only files above target_rate need it
+    g = math.gcd(int(sample_rate), int(target_rate))
+    return resample_poly(data, target_rate // g, sample_rate // g, axis=-1), target_rate
+
+
+def smooth_bins(spectrum, width, out=None):
+    # Moving average across bins (last axis); matches
+    # np.convolve(spectrum, np.ones(width) / width, mode='same') for each row,
+    # as a sum of shifted slices. With out nothing is allocated.
+    if out is None:
+        out = np.empty(spectrum.shape)
+    np.copyto(out, spectrum)
+    above = (width - 1) // 2  # Neighbours averaged in from above; the rest come from below
+    for k in range(1, width - above):
+        out[..., k:] += spectrum[..., :-k]
+    for k in range(1, above + 1):
+        out[..., :-k] += spectrum[..., k:]
+    out *= 1 / width
+    return out
+
+
+def block_rms(samples):
+    # RMS level of a block of samples, any shape, without a squared copy
+    flat = samples.reshape(-1)
+    return math.sqrt(np.vdot(flat, flat) / max(1, flat.size))
+
+
+def envelope_coefficient(ms, frame_seconds):
+    # Per-frame step of a one-pole envelope with time constant ms; 0 ms = instant
+    if ms <= 0:
+        return 1.0
+    return 1.0 - math.exp(-frame_seconds * 1000 / ms)
+
+
+# === Smoothing Stage ===
+# Spatial smoothing across bins, then an attack/release envelope over time
+# (attack while the input rises, release while it falls), then an optional
+# peak hold: each bin's peak is held for hold_frames and then falls by
+# falloff per frame. Coefficients are per-frame steps (see
+# envelope_coefficient). Every step writes into buffers allocated here, so
+# process() allocates nothing per frame.
+class SmoothingStage:
+    def __init__(self, bins, rows=1, width=1, attack=1.0, release=1.0, hold_frames=0, falloff=0.0):
+        lead = (rows,) if rows > 1 else ()
+        shape = lead + (bins,)
+        self.width = width
+        self.attack = attack
+        self.release = release
+        self.hold_frames = hold_frames
+        self.falloff = falloff
+        self.peak_hold = hold_frames > 0 or falloff > 0
+
+        self.level = np.zeros(shape)
+        self.peak = np.zeros(shape)
+        self._spatial = np.zeros(shape)
+        self._step = np.zeros(shape)
+        self._coef = np.zeros(shape)
+        self._hold = np.zeros(shape)
+        self._rising = np.zeros(shape, dtype=bool)
+
+    def reset(self):
+        for buffer in (self.level, self.peak, self._hold):
+            buffer.fill(0)
+
+    def process(self, spectrum):
+        # Returns the held peaks when peak hold is on, else the envelope level;
+        # the result is a buffer owned by the stage
+        if self.width > 1:
+            spectrum = smooth_bins(spectrum, self.width, self._spatial)
+
+        if self.attack == self.release:
+            np.subtract(spectrum, self.level, out=self._step)
+            self._step *= self.attack
+        else:
+            np.greater(spectrum, self.level, out=self._rising)
+            self._coef.fill(self.release)
+            np.copyto(self._coef, self.attack, where=self._rising)
+            np.subtract(spectrum, self.level, out=self._step)
+            self._step *= self._coef
+        self.level += self._step
+
+        if not self.peak_hold:
+            return self.level
+        np.greater_equal(self.level, self.peak, out=self._rising)
+        self._hold -= 1
+        np.copyto(self._hold, self.hold_frames, where=self._rising)
+        np.less_equal(self._hold, 0, out=self._rising)
+        np.subtract(self.peak, self.falloff, out=self.peak, where=self._rising)
+        np.maximum(self.peak, self.level, out=self.peak)
+        return self.peak
+
+
+# === Channel Layouts ===
+# Audio is mixed into analysis rows before the FFT, so every row of every
+# channel goes through one batched rfft. The mono row is always analyzed
+# exactly as before; the other rows are what channel-aware shapes draw.
+#   mono:    [mono]
+#   stereo:  [left, right, mono]
+#   midside: [mid, side]            (mid is the mono row)
+CHANNEL_MODES = ('mono', 'stereo', 'midside')
+
+class ChannelLayout:
+    def __init__(self, mode, input_channels):
+        if mode not in CHANNEL_MODES:
+            raise ValueError(f"unknown channel mode '{mode}'")
+        self.mode = mode
+        self.input_channels = input_channels
+
+        mono = np.full(input_channels, 1.0 / input_channels)
+        if mode == 'mono':
+            rows = [mono]
+        elif input_channels == 1:
+            # Nothing to separate; keep the row layout so shapes still work
+            rows = [mono, mono, mono] if mode == 'stereo' else [mono, np.zeros(1)]
+        elif mode == 'stereo':
+            left, right = np.zeros(input_channels), np.zeros(input_channels)
+            left[0], right[1] = 1.0, 1.0
+            rows = [left, right, mono]
+        else:
+            side = np.zeros(input_channels)
+            side[0], side[1] = 0.5, -0.5
+            rows = [mono, side]
+
+        self.matrix = np.array(rows)
+        self.rows = len(rows)
+        self.mono_row = 2 if mode == 'stereo' else 0
+        self.channel_rows = (0, 1) if mode != 'mono' else (0,)
+        self.channel_slice = slice(0, len(self.channel_rows))  # Same rows, as a view
+
+    def mix(self, samples, out=None):
+        # samples: (frames, input_channels) or (frames,) -> (rows, frames), or
+        # (frames,) for the mono layout
+        if samples.ndim == 1:
+            samples = samples[:, None]
+        mixed = np.dot(self.matrix, samples.T, out=out)
+        return mixed[0] if self.rows == 1 and out is None else mixed
+
+
+# === Filterbank ===
+# Maps FFT bins onto the fixed display grid by integrating the spectrum as a
+# piecewise-constant function. Coarser grids average, finer grids repeat, and
+# equal sizes are an exact copy. Indices and weights are computed once.
+# Works on the last axis, so several rows are mapped in one call.
+# span is how many source bins the grid covers (default all of them); it can
+# be fractional and larger than src_bins, in which case the top is zero.
+class Filterbank:
+    def __init__(self, src_bins, dst_bins, rows=1, span=None):
+        self.src_bins = src_bins
+        self.dst_bins = dst_bins
+        self.width = (span or src_bins) / dst_bins
+
+        edges = np.minimum(np.arange(dst_bins + 1) * self.width, src_bins)
+        self.edge_idx = np.minimum(edges.astype(np.intp), src_bins - 1)
+        self.edge_frac = edges - self.edge_idx
+
+        lead = (rows,) if rows > 1 else ()
+        self._cumsum = np.zeros(src_bins + 1)
+        self._area = np.empty(dst_bins + 1)
+        self._gathered = np.empty(dst_bins + 1)
+        self._out_shape = lead + (dst_bins,)
+
+    def apply(self, spectrum, out=None):
+        # Row by row: NumPy buffers whole-array operations on 2-D slices,
+        # which would allocate a temporary every frame
+        if out is None:
+            out = np.empty(self._out_shape)
+        src_rows, dst_rows = spectrum.reshape(-1, self.src_bins), out.reshape(-1, self.dst_bins)
+        cumsum, area, gathered = self._cumsum, self._area, self._gathered
+        for source, target in zip(src_rows, dst_rows):
+            np.add.accumulate(source, out=cumsum[1:])  # np.cumsum keeps small objects in a cache
+            source.take(self.edge_idx, out=gathered, mode='clip')  # 'raise' would buffer out
+            np.multiply(self.edge_frac, gathered, out=area)
+            cumsum.take(self.edge_idx, out=gathered, mode='clip')
+            area += gathered
+            np.subtract(area[1:], area[:-1], out=target)
+            target /= self.width
+        return out
+
+
+# === FFT Plan ===
+# Everything needed to analyze one FFT size: the window, the gain that matches
+# magnitudes to the reference size, scratch buffers and the display mapping.
+# With rows > 1 all rows are transformed by a single batched rfft.
+class FFTPlan:
+    def __init__(self, size, display_bins, rows=1, sample_rate=REFERENCE_SAMPLE_RATE):
+        self.size = size
+        self.gain = np.sum(np.hanning(REFERENCE_FFT_SIZE)) / np.sum(np.hanning(size))
+        # FFT bins between 0 Hz and DISPLAY_MAX_HZ at this sample rate
+        span = DISPLAY_MAX_HZ * size / sample_rate
+        self.filterbank = Filterbank(size // 2, display_bins, rows, span)
+        lead = (rows,) if rows > 1 else ()
+        self.window = np.hanning(size)
+        self._frame = np.empty(lead + (size,))
+        self._frame_rows = self._frame.reshape(-1, size)
+        self._spectrum = np.empty(lead + (size // 2 + 1,), dtype=complex)
+        self._spectrum_rows = self._spectrum.reshape(-1, size // 2 + 1)
+        self._magnitude = np.empty(lead + (size // 2,))
+        self._magnitude_rows = self._magnitude.reshape(-1, size // 2)
+
+    def analyze(self, samples, out=None):
+        # samples must hold exactly self.size values (per row). Row by row,
+        # like the rest: samples is often a slice of a longer buffer, and
+        # NumPy copies such 2-D operands into a temporary
+        for source, row in zip(samples.reshape(-1, self.size), self._frame_rows):
+            np.multiply(source, self.window, out=row)
+            row -= row.mean()
+        np.fft.rfft(self._frame, axis=-1, out=self._spectrum)
+        for row, magnitude in zip(self._spectrum_rows, self._magnitude_rows):  # Row by row: see Filterbank
+            np.abs(row[:-1], out=magnitude)
+        self._magnitude *= self.gain
+        return self.filterbank.apply(self._magnitude, out)
+
+
+# === Spectrum Analyzer ===
+# Single resolution: one plan covers the whole display grid.
+# Multi-resolution: a long FFT supplies the bins below the crossover (better
+# bass resolution) and the main FFT supplies the rest (better time resolution).
+#
+# Samples and spectra are 1-D for a single row, or (rows, n) for a channel
+# layout with several rows (see ChannelLayout).
+class SpectrumAnalyzer:
+    def __init__(self, sample_rate, fft_size=1024, display_bins=REFERENCE_DISPLAY_BINS,
+                 bass_fft_size=None, crossover_hz=250, rows=1):
+        self.sample_rate = sample_rate
+        self.display_bins = display_bins
+        self.rows = rows
+        self.main_plan = FFTPlan(fft_size, display_bins, rows, sample_rate)
+        self.bass_plan = None
+        self.crossover_bin = 0
+
+        if bass_fft_size and bass_fft_size > fft_size:
+            bin_hz = DISPLAY_MAX_HZ / display_bins
+            self.crossover_bin = min(display_bins, max(1, int(round(crossover_hz / bin_hz))))
+            self.bass_plan = FFTPlan(bass_fft_size, display_bins, rows, sample_rate)
+
+        # Number of most recent samples each analyze() call needs
+        self.size = self.bass_plan.size if self.bass_plan else fft_size
+
+        lead = (rows,) if rows > 1 else ()
+        self._spectrum = np.zeros(lead + (display_bins,))
+        self._bass = np.zeros(lead + (display_bins,))
+        self._history = np.zeros(lead + (self.size,))
+        self._history_rows = self._history.reshape(-1, self.size)
+
+    def analyze(self, samples):
+        # samples holds the latest self.size values; returns the display spectrum
+        main = self.main_plan
+        main.analyze(samples[..., -main.size:], self._spectrum)
+        if self.bass_plan is not None:
+            self.bass_plan.analyze(samples, self._bass)
+            self._spectrum[..., :self.crossover_bin] = self._bass[..., :self.crossover_bin]
+        return self._spectrum
+
+    def analyze_at(self, data, end):
+        # Analyzes the self.size samples of data ending at index end,
+        # zero-padding on the left near the start of a track
+        start = end - self.size
+        if start >= 0:
+            return self.analyze(data[..., start:end])
+        self._history[..., :-start] = 0
+        self._history[..., -start:] = data[..., :end]
+        return self.analyze(self._history)
+
+    def push(self, block):
+        # Appends a block of new samples to the rolling history (mic input)
+        frames = block.shape[-1]
+        if frames >= self.size:
+            self._history[:] = block[..., -self.size:]
+        else:
+            # Row by row: shifting overlapping 2-D slices goes through a temporary
+            for history, row in zip(self._history_rows, block.reshape(-1, frames)):
+                history[:-frames] = history[frames:]
+                history[-frames:] = row
+        return self.analyze(self._history)
@@ -0,0 +1,187 @@
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from pipeline import MicPipeline, input_channels
+from sources import SyntheticSource
+
+
+# === Frame Ring ===
+# Analysis frames in a multiprocessing.shared_memory block, written by the
+# analysis process and read by the visualizer without pickling. Each slot holds
+# one frame: spectrum, per-channel spectra, beat pulse, times and the raw
+# input block (for recording). Slots are written round-robin; the header
+# holds the newest sequence number.
+#
+# A slot's sequence number is cleared while it is written and set once it is
+# complete, and the reader checks it before and after copying, so a frame
+# overwritten mid-read is dropped instead of torn. The reader gets every
+# frame still in the ring since its last read, so audio stays continuous as
+# long as the reader is less than `slots` blocks behind.
+SEQ = 0  # Header field
+TIMESTAMP, SAMPLE_TIME, BEAT_PULSE, FRAMES, AUDIO_CHANNELS, HAS_CHANNELS = range(6)  # Per-slot values
+
+class FrameRing:
+    def __init__(self, bins, block_frames, audio_channels, slots=16, name=None):
+        self.bins = bins
+        self.block_frames = block_frames
+        self.audio_channels = audio_channels
+        self.slots = slots
+        layout = [
+            ('header', np.int64, (1,)),
+            ('slot_seq', np.int64, (slots,)),
+            ('meta', np.float64, (slots, 6)),
+            ('spectrum', np.float32, (slots, bins)),
+            ('channels', np.float32, (slots, 2, bins)),
+            ('audio', np.float32, (slots, block_frames, audio_channels)),
+        ]
+        size = sum(np.dtype(dtype).itemsize * int(np.prod(shape)) for _, dtype, shape in layout)
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.name = self.memory.name
+        offset = 0
+        for field, dtype, shape in layout:
+            view = np.ndarray(shape, dtype=dtype, buffer=self.memory.buf, offset=offset)
+            setattr(self, field, view)
+            offset += view.nbytes
+        if self.owner:
+            self.header[:] = 0
+            self.slot_seq[:] = 0
+
+        # Reader side
+        self.last_seq = 0
+        self.skipped = 0  # Frames overwritten before the reader got to them
+        self._spectrum = np.zeros(bins, dtype=np.float32)
+        self._channels = np.zeros((2, bins), dtype=np.float32)
+        self._audio = np.zeros((block_frames, audio_channels), dtype=np.float32)
+        self._meta = np.zeros(6)
+
+    def spec(self):
+        # Arguments to attach to this ring from another process
+        return (self.bins, self.block_frames, self.audio_channels, self.slots, self.name)
+
+    # --- Writer ---
+    def write(self, frame, audio=None):
+        seq = int(self.header[SEQ]) + 1
+        slot = seq % self.slots
+        self.slot_seq[slot] = 0
+        self.spectrum[slot] = frame.spectrum
+        if frame.channels is not None:
+            self.channels[slot] = frame.channels
+        frames = channels = 0
+        if audio is not None:
+            frames, channels = min(len(audio), self.block_frames), min(audio.shape[1], self.audio_channels)
+            self.audio[slot, :frames, :channels] = audio[:frames, :channels]
+        self.meta[slot] = (frame.timestamp, frame.sample_time if frame.sample_time is not None else np.nan,
+                           frame.beat_pulse, frames, channels, frame.channels is not None)
+        self.slot_seq[slot] = seq
+        self.header[SEQ] = seq
+
+    # --- Reader ---
+    def read(self):
+        # Yields (spectrum, channels or None, beat_pulse, timestamp,
+        # sample_time or None, audio block or None) for each new frame. The
+        # arrays are reused reader buffers, valid until the next frame.
+        newest = int(self.header[SEQ])
+        first = max(self.last_seq + 1, newest - self.slots + 1)
+        self.skipped += first - self.last_seq - 1 if self.last_seq else 0
+        for seq in range(first, newest + 1):
+            slot = seq % self.slots
+            if self.slot_seq[slot] != seq:
+                self.skipped += 1
+                continue
+            self._spectrum[:] = self.spectrum[slot]
+            self._channels[:] = self.channels[slot]
+            self._meta[:] = self.meta[slot]
+            frames, channels = int(self._meta[FRAMES]), int(self._meta[AUDIO_CHANNELS])
+            self._audio[:frames] = self.audio[slot, :frames]
+            if self.slot_seq[slot] != seq:  # Overwritten while copying
+                self.skipped += 1
+                continue
+            timestamp, sample_time, beat_pulse, _, _, has_channels = self._meta
+            yield (self._spectrum, self._channels if has_channels else None, float(beat_pulse), float(timestamp),
+                   None if np.isnan(sample_time) else float(sample_time), self._audio[:frames, :channels] if frames else None)
+        self.last_seq = max(self.last_seq, newest)
+
+    def close(self):
+        # Views have to go before the buffer can be released
+        for field in ('header', 'slot_seq', 'meta', 'spectrum', 'channels', 'audio'):
+            setattr(self, field, None)
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+# === Analysis Process ===
+# Runs live capture and analysis (pipeline.MicPipeline) in a child process,
+# so the renderer's per-point Python loop and the analysis never wait on the
+# same GIL. Frames come back through a FrameRing. The child is started with
+# 'spawn' rather than fork, so it never inherits the parent's SDL state.
+# perf_counter() is system-wide on the platforms pygame supports, so frame
+# times from the child compare directly with the renderer's.
+class AnalysisProcess:
+    def __init__(self, config, test_signal=None, slots=16):
+        self.config = config
+        self.test_signal = test_signal
+        self.ring = FrameRing(config.display_bins, config.hop_size, input_channels(config), slots)
+        self.sample_rate = None
+        self.channels = None
+        self.start_time = None  # Sample 0 of a test signal, in the child's perf_counter()
+        context = multiprocessing.get_context('spawn')
+        self._stop = context.Event()
+        self._status, child_status = context.Pipe(duplex=False)
+        self.process = context.Process(target=_run_analysis, daemon=True,
+                                       args=(config, test_signal, self.ring.spec(), self._stop, child_status))
+
+    def start(self, timeout=30):
+        # Blocks until the child's source is running; raises with the
+        # child's error message if it could not start
+        self.process.start()
+        if not self._status.poll(timeout):
+            self.stop()
+            raise RuntimeError("analysis process did not start")
+        status = self._status.recv()
+        if status[0] != 'ok':
+            self.stop()
+            raise RuntimeError(status[1])
+        _, self.sample_rate, self.channels, self.start_time = status
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def stop(self):
+        self._stop.set()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.ring.close()
+
+
+def _run_analysis(config, test_signal, ring_spec, stop, status):
+    # Child process entry point
+    bins, block_frames, audio_channels, slots, name = ring_spec
+    ring = FrameRing(bins, block_frames, audio_channels, slots, name=name)
+    block = [None]  # Raw input of the block being analyzed, for the ring's audio slot
+
+    def keep_block(indata):
+        block[0] = indata
+
+    try:
+        source = None
+        if test_signal:
+            source = SyntheticSource(test_signal, config.mic_sample_rate, input_channels(config), config.hop_size,
+                                     bpm=config.test_bpm)
+        pipeline = MicPipeline(config, source=source, on_block=keep_block)
+        pipeline.frame_bus.subscribe('ring', listener=lambda frame: ring.write(frame, block[0]))
+        pipeline.start()
+    except Exception as e:
+        status.send(('error', str(e)))
+        ring.close()
+        return
+    source = pipeline.source
+    status.send(('ok', source.sample_rate, source.channels, getattr(source, 'start_time', None)))
+    stop.wait()
+    pipeline.stop()
+    ring.close()
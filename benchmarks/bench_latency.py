@@ -0,0 +1,115 @@
+# End-to-end latency with generated test signals, no microphone needed.
+#
+# Live path: a SyntheticSource feeds audio_callback exactly like the
+# microphone would, with every block stamped with its capture time. The
+# visualizer runs for a few seconds and reports sample-to-display latency
+# (newest analyzed sample -> frame presented) and onset-to-beat latency
+# (click or impulse onset -> frame that triggered the beat pulse).
+#
+# Process split: the live runs are repeated with config.analysis_process on,
+# so capture and analysis run in a child process and frames come back over
+# shared memory. Jitter is the standard deviation of the latency.
+#
+# File path: the same click track is rendered to a WAV and played through
+# the normal file playback, and sample-to-display latency is reported against
+# the mixer clock. Values can be negative there, because the analysis window
+# reaches ahead of the play position.
+#
+#   python benchmarks/bench_latency.py [seconds]
+#
+# Runs with the SDL dummy video driver unless SDL_VIDEODRIVER is already set.
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pygame
+import RT_Audio_Visualizer as viz
+from sources import SyntheticSource, write_wav
+
+BPM = 120
+
+
+def quit_after(seconds):
+    def run():
+        time.sleep(seconds)
+        pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_ESCAPE))
+    threading.Thread(target=run, daemon=True).start()
+
+
+def row(path, signal, latency, beats=''):
+    if latency is None:
+        print(f"{path:>5} {signal:>8}  no frames displayed")
+        return
+    print(f"{path:>5} {signal:>8} {latency['frames']:>7} {latency['mean']:>8.1f} {latency['p50']:>8.1f} "
+          f"{latency['p95']:>8.1f} {latency['max']:>8.1f} {latency['jitter']:>8.1f}  {beats}")
+
+
+def source_clock(signal):
+    # The running test signal, for its onsets and sample times. In process
+    # mode the source lives in the child, so a copy is started from its clock.
+    if viz.stream is not None:
+        return viz.stream
+    clock = SyntheticSource(signal, viz.analysis_process.sample_rate, bpm=BPM)
+    clock.start_time = viz.analysis_process.start_time
+    return clock
+
+
+def run_live(signal, seconds, process=False):
+    onsets = []  # (onset time, detection time) for each detected beat
+    clock = []
+
+    def on_frame(frame):
+        if frame.beat_pulse == 1.0 and frame.sample_time is not None and clock:
+            source = clock[0]
+            newest = int(round((frame.sample_time - source.start_time) * source.sample_rate)) - 1
+            onsets.append((source.sample_time(source.onset(newest)), frame.timestamp))
+    subscription = viz.frame_bus.subscribe('bench_latency', listener=on_frame)
+
+    viz.config.test_bpm = BPM
+    viz.config.analysis_process = process
+    if not viz.start_microphone_stream(test_signal=signal):
+        return None, ''
+    clock.append(source_clock(signal))
+    quit_after(seconds)
+    viz.visualize_realtime()
+    subscription.close()
+
+    expected = int(seconds * BPM / 60)
+    beats = ''
+    if onsets:
+        delays = [(detected - onset) * 1000 for onset, detected in onsets]
+        beats = f"{len(onsets):>3}/{expected:<3} onset->beat {np.mean(delays):.1f} ms (max {np.max(delays):.1f})"
+    return viz.latency_meter.summary(), beats
+
+
+def run_file(seconds):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'clicks.wav')
+        write_wav(path, SyntheticSource('clicks', 44100, bpm=BPM), seconds + 2)
+        quit_after(seconds)
+        viz.visualize_track(path)
+    return viz.latency_meter.summary()
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    viz.init_display()
+    viz.config.show_latency = False
+    print(f"{'path':>5} {'signal':>8} {'frames':>7} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} "
+          f"{'jitter':>8}  beats")
+    for path, process in (('live', False), ('proc', True)):
+        for signal in ('clicks', 'impulse'):
+            latency, beats = run_live(signal, seconds, process)
+            row(path, signal, latency, beats)
+    viz.config.analysis_process = False
+    row('file', 'clicks', run_file(seconds))
+
+
+if __name__ == '__main__':
+    main()
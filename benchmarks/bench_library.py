@@ -0,0 +1,83 @@
+# Benchmark for the music library index (library.py).
+#
+# Writes click tracks at known tempos to a temporary folder and indexes them
+# with one worker and with one per CPU, reporting the time per track and the
+# estimated tempo next to the true one. Then fills indexes of 1k to 50k
+# tracks with random features and times "play similar" lookups.
+#
+#   python benchmarks/bench_library.py [tracks]
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from scipy.io import wavfile
+from library import FEATURES, LibraryIndex
+
+RATE = 44100
+SECONDS = 30
+SIZES = [1000, 10000, 50000]
+
+
+def click_track(path, bpm, seed):
+    # Decaying noise bursts on every beat over a quiet tone
+    rng = np.random.default_rng(seed)
+    t = np.arange(RATE * SECONDS) / RATE
+    signal = 0.05 * np.sin(2 * np.pi * (110 + 40 * seed) * t)
+    burst = rng.standard_normal(2000) * np.exp(-np.arange(2000) / 300)
+    for start in (np.arange(0, SECONDS, 60 / bpm) * RATE).astype(int):
+        end = min(len(signal), start + len(burst))
+        signal[start:end] += burst[:end - start]
+    wavfile.write(path, RATE, (signal / np.max(np.abs(signal)) * 32767).astype(np.int16))
+
+
+def bench_indexing(folder, count):
+    tempos = [70 + (i * 97) % 110 for i in range(count)]
+    files = []
+    for i, bpm in enumerate(tempos):
+        files.append(os.path.join(folder, f"clicks_{i:03d}.wav"))
+        click_track(files[-1], bpm, i)
+    print(f"{'workers':>8} {'tracks':>7} {'s/track':>8}")
+    for workers in (1, None):
+        index = LibraryIndex(os.path.join(folder, f"index_{workers}.npz"))
+        start = time.perf_counter()
+        index.update(files, workers=workers)
+        elapsed = time.perf_counter() - start
+        print(f"{workers or os.cpu_count():>8} {len(index):>7} {elapsed / count:>8.3f}")
+    errors = [abs(index.features(f)[0] - bpm) for f, bpm in zip(files, tempos)]
+    print(f"tempo: median error {np.median(errors):.1f} BPM, {np.mean(np.array(errors) < 3):.0%} within 3 BPM")
+
+
+def bench_lookup(folder, size):
+    # Paths of real (empty) files, since lookups skip deleted ones
+    paths = []
+    for i in range(size):
+        paths.append(os.path.join(folder, f"{i:06d}.wav"))
+        open(paths[-1], 'w').close()
+    index = LibraryIndex(os.path.join(folder, 'none.npz'))
+    rng = np.random.default_rng(0)
+    index._set(paths, np.zeros(size), np.zeros(size), rng.random((size, len(FEATURES))))
+    times = []
+    for i in range(200):
+        start = time.perf_counter()
+        index.similar(paths[i], 10)
+        times.append((time.perf_counter() - start) * 1000)
+    return np.median(times), np.max(times)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    with tempfile.TemporaryDirectory() as folder:
+        bench_indexing(folder, count)
+    print(f"{'index':>7} {'lookup ms':>10} {'max ms':>7}")
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as folder:
+            median, worst = bench_lookup(folder, size)
+        print(f"{size:>7} {median:>10.3f} {worst:>7.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# Benchmark for the mood features (mood.py).
+#
+# Times MoodTracker.update() per analysis frame at several display sizes,
+# and mood_palette() per rendered frame. Then runs generated signals through
+# the microphone analysis (pipeline.MicAnalysis) and prints the features they
+# end up with: pure tones should land on their pitch class, noise should be
+# flat and bright, a quiet input low in energy.
+#
+#   python benchmarks/bench_mood.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from analysis import derive_bin_constants
+from config import DEFAULT_PALETTE, Config
+from mood import MoodTracker, mood_palette
+from pipeline import MicAnalysis, create_analyzer
+
+RATE = 44100
+HOP = 1024
+BINS = [512, 2048, 8192]
+NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+
+
+def bench_update(bins, frames=2000):
+    rng = np.random.default_rng(0)
+    spectra = [(rng.random(bins) ** 4).astype(np.float32) for _ in range(64)]
+    tracker = MoodTracker()
+    times = []
+    for i in range(frames):
+        start = time.perf_counter()
+        tracker.update(spectra[i % len(spectra)], 0.1, i * HOP / RATE)
+        times.append((time.perf_counter() - start) * 1e6)
+    return np.median(times), np.percentile(times, 99)
+
+
+def bench_palette(frames=2000):
+    tracker = MoodTracker()
+    times = []
+    for i in range(frames):
+        start = time.perf_counter()
+        mood_palette(DEFAULT_PALETTE, tracker.mood)
+        times.append((time.perf_counter() - start) * 1e6)
+    return np.median(times)
+
+
+def analyze(signal):
+    # Final mood after running signal through the microphone analysis
+    config = Config()
+    analysis = MicAnalysis(create_analyzer(config, RATE, 1), derive_bin_constants(config.display_bins)[2])
+    tracker = MoodTracker()
+    for start in range(0, len(signal) - HOP, HOP):
+        block = signal[start:start + HOP]
+        spectrum, _, _ = analysis.process(block[:, None])
+        tracker.update(np.asarray(spectrum, dtype=np.float32), float(np.sqrt(np.mean(block ** 2))), start / RATE)
+    return tracker.mood
+
+
+def tone(midi, seconds=2, harmonics=1):
+    # A note with harmonics falling off as 1/h
+    t = np.arange(RATE * seconds) / RATE
+    frequency = 440 * 2 ** ((midi - 69) / 12)
+    return 0.5 * sum(np.sin(2 * np.pi * h * frequency * t) / h for h in range(1, harmonics + 1))
+
+
+def main():
+    print(f"{'bins':>6} {'update us':>10} {'p99 us':>7}")
+    for bins in BINS:
+        median, p99 = bench_update(bins)
+        print(f"{bins:>6} {median:>10.1f} {p99:>7.1f}")
+    print(f"mood_palette: {bench_palette():.1f} us")
+
+    notes = range(55, 96)
+    misses = [n for n in notes if int(np.argmax(analyze(tone(n)).chroma)) != n % 12]
+    print(f"pure tones G3-B6: {len(notes) - len(misses)}/{len(notes)} on the right pitch class")
+
+    rng = np.random.default_rng(0)
+    chord = 0.2 * sum(tone(n, 5, harmonics=6) for n in (57, 61, 64, 69))
+    signals = [('A major chord', chord), ('chord + noise', chord + rng.standard_normal(len(chord)) * 0.03),
+               ('white noise', rng.standard_normal(len(chord)) * 0.3), ('quiet noise', rng.standard_normal(len(chord)) * 0.003)]
+    print(f"{'signal':>14} {'centroid':>9} {'flatness':>9} {'level':>6} {'energy':>7} {'bright':>7} {'tonality':>9}  top pitch classes")
+    for name, signal in signals:
+        mood = analyze(signal)
+        top = ' '.join(NAMES[i] for i in np.argsort(mood.chroma)[::-1][:3])
+        print(f"{name:>14} {mood.centroid:>9.0f} {mood.flatness:>9.2f} {mood.level:>6.1f} {mood.energy:>7.2f} "
+              f"{mood.brightness:>7.2f} {mood.tonality:>9.2f}  {top}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# Frame-time benchmark for the particle layer.
+#
+# Keeps the system at a steady particle count (bursts top it up as particles
+# expire) and times update() and splat() separately on a 1280x720 surface,
+# which is the per-frame cost the render loop pays on top of the shape.
+#
+#   python benchmarks/bench_particles.py [frames]
+#
+# Runs with the SDL dummy video driver unless SDL_VIDEODRIVER is already set.
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pygame
+from config import DEFAULT_PALETTE
+from particles import ParticleSystem
+
+SIZE = (1280, 720)
+COUNTS = [10000, 20000, 50000, 100000]
+DT = 1 / 60
+
+
+def bench(count, frames):
+    surface = pygame.Surface(SIZE)
+    system = ParticleSystem(capacity=count)
+    system.gravity = 0.0
+    update_ms, splat_ms, alive = [], [], []
+    for _ in range(frames):
+        system.burst(SIZE[0] / 2, SIZE[1] / 2, count - system.count, 300, DEFAULT_PALETTE, life=(2.0, 4.0))
+        surface.fill((0, 0, 0))
+        start = time.perf_counter()
+        system.update(DT, *SIZE)
+        middle = time.perf_counter()
+        pixels = pygame.surfarray.pixels3d(surface)
+        system.splat(pixels, 2)
+        del pixels
+        end = time.perf_counter()
+        update_ms.append((middle - start) * 1000)
+        splat_ms.append((end - middle) * 1000)
+        alive.append(system.count)
+    total = np.array(update_ms) + np.array(splat_ms)
+    return np.mean(alive), np.mean(update_ms), np.mean(splat_ms), np.percentile(total, 95)
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    pygame.display.init()
+    print(f"{'capacity':>9} {'alive':>8} {'update ms':>10} {'splat ms':>9} {'p95 ms':>7}  60 fps budget")
+    for count in COUNTS:
+        alive, update, splat, p95 = bench(count, frames)
+        budget = 'ok' if p95 < 1000 / 60 else 'over'
+        print(f"{count:>9} {alive:>8.0f} {update:>10.2f} {splat:>9.2f} {p95:>7.2f}  {budget}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# Frame-time benchmark for the render_scale setting.
+#
+# Renders the same synthetic spectrum at several window sizes and render
+# scales and reports the mean draw time (background, fade, flash, lines on the
+# render surface) and present time (the single upscale blit + flip), for both
+# the smooth (bilinear) and nearest-neighbour upscale filters.
+#
+#   python benchmarks/bench_render_scale.py [frames]
+#
+# Runs with the SDL dummy video driver unless SDL_VIDEODRIVER is already set.
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pygame
+import RT_Audio_Visualizer as viz
+
+viz.init_display()
+
+WINDOW_SIZES = [(1280, 720), (1920, 1080), (3840, 2160)]
+SCALES = [1.0, 0.75, 0.5, 0.25]
+
+
+def synthetic_spectrum(frame, bins):
+    # Decaying spectrum with a moving peak, the same for every run
+    x = np.arange(bins) / bins
+    peak = 0.5 + 0.4 * np.sin(frame * 0.1)
+    return 0.3 * np.exp(-x * 3) * (1 + np.exp(-((x - peak) * 20) ** 2))
+
+
+def bench(window_size, scale, smooth, frames):
+    pygame.display.set_mode(window_size, pygame.RESIZABLE)
+    viz.display.resize(*window_size)
+    viz.display.set_render_scale(scale, smooth)
+    viz.update_geometry()
+
+    draw_time = present_time = 0.0
+    beat_pulse = 0.0
+    for frame in range(frames):
+        spectrum = synthetic_spectrum(frame, len(viz.fft_values))
+        beat_pulse = 1.0 if frame % 30 == 0 else beat_pulse * 0.92
+        shape_mode = (frame // 10) % viz.SHAPE_COUNT
+
+        start = time.perf_counter()
+        viz.draw_frame(viz.screen, viz.render_assets, spectrum, beat_pulse, shape_mode)
+        middle = time.perf_counter()
+        viz.display.present()
+        end = time.perf_counter()
+
+        draw_time += middle - start
+        present_time += end - middle
+    return draw_time / frames * 1000, present_time / frames * 1000
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    print(f"{'window':>11} {'scale':>6} {'filter':>7} {'render':>11} {'draw ms':>8} {'present ms':>10} {'total ms':>9} {'saving':>7}")
+    for window_size in WINDOW_SIZES:
+        baseline = None
+        for scale in SCALES:
+            for smooth in ((True,) if scale == 1.0 else (True, False)):
+                draw_ms, present_ms = bench(window_size, scale, smooth, frames)
+                total = draw_ms + present_ms
+                baseline = baseline or total
+                render = '{}x{}'.format(*viz.display.size)
+                window = '{}x{}'.format(*window_size)
+                filter_name = 'smooth' if smooth else 'nearest'
+                print(f"{window:>11} {scale:>6.2f} {filter_name:>7} {render:>11} {draw_ms:>8.2f} {present_ms:>10.2f} {total:>9.2f} {1 - total / baseline:>7.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# Micro-benchmark for every registered shape (shapes.py and plugins/).
+#
+# Times the shape's place() on its own, which is the vectorized outline
+# math, and the whole draw_frame call (segments, backdrop and the rest) at
+# 1280x720 with the same synthetic input as golden_frames.py. Shapes that
+# draw themselves (waterfall) only have the draw_frame column.
+#
+#   python benchmarks/bench_shapes.py [frames]
+#
+# Runs with the SDL dummy video driver unless SDL_VIDEODRIVER is already set.
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pygame
+import RT_Audio_Visualizer as viz
+from display import RenderAssets
+from golden_frames import BINS, pin_settings, synthetic_input
+
+SIZE = (1280, 720)
+
+
+def bench(shape_mode, frames):
+    surface = pygame.Surface(SIZE).convert()
+    assets = RenderAssets(SIZE[0], SIZE[1], 80, SIZE[1] / 600)
+    inputs = [synthetic_input(frame) for frame in range(frames)]
+    place_ms, draw_ms = [], []
+    for spectrum, channels, beat_pulse in inputs:
+        start = time.perf_counter()
+        viz.draw_frame(surface, assets, spectrum, beat_pulse, shape_mode, channels)
+        draw_ms.append((time.perf_counter() - start) * 1000)
+    shape = viz.shape_for(assets, shape_mode, BINS - viz.FADE_BINS)
+    if shape.draw is None:
+        for spectrum, channels, beat_pulse in inputs:
+            amplitudes = viz.shape_amplitudes(channels if shape.channels else spectrum, beat_pulse)
+            start = time.perf_counter()
+            shape.place(amplitudes)
+            place_ms.append((time.perf_counter() - start) * 1000)
+    return place_ms, draw_ms
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    viz.init_display()
+    pin_settings()
+    viz.logarithmic = False
+    print(f"{'shape':>10} {'place us':>9} {'draw ms':>8} {'p95 ms':>7}")
+    for shape_mode in range(viz.SHAPE_COUNT):
+        place_ms, draw_ms = bench(shape_mode, frames)
+        place = f"{np.mean(place_ms) * 1000:>9.1f}" if place_ms else f"{'-':>9}"
+        print(f"{viz.SHAPE_NAMES[shape_mode]:>10} {place} {np.mean(draw_ms):>8.2f} {np.percentile(draw_ms, 95):>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# Load test for the spectrum streaming server over localhost.
+#
+# Starts a SpectrumServer on its own thread, connects N asyncio clients,
+# publishes synthetic analysis frames at the analysis rate and reports how
+# many frames each client received, how many were skipped by latest-frame-wins
+# backpressure, and the publish-to-receive latency.
+#
+#   python benchmarks/bench_stream_server.py [clients ...]
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from fanout import FrameBus
+from stream_server import SpectrumServer, read_frame
+
+DURATION = 3.0
+FRAME_RATE = 44100 / 1024  # One frame per 1024-sample hop
+BINS = 512
+
+
+def publish(bus, stop):
+    rng = np.random.default_rng(0)
+    spectrum = rng.random(BINS).astype(np.float32) * 0.3
+    frame = 0
+    next_time = time.perf_counter()
+    while not stop.is_set():
+        bus.publish(np.roll(spectrum, frame), 1.0 if frame % 20 == 0 else 0.0)
+        frame += 1
+        next_time += 1 / FRAME_RATE
+        time.sleep(max(0.0, next_time - time.perf_counter()))
+
+
+async def client(port, received, latencies):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        while True:
+            seq, timestamp, beat, beat_level, bands = await read_frame(reader)
+            latencies.append(time.time() - timestamp)  # Header timestamps are Unix time
+            received[0] += 1
+    except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run(client_count):
+    bus = FrameBus()
+    server = SpectrumServer(bus, port=0, band_count=32)
+    server.start_in_thread()
+
+    counts = [[0] for _ in range(client_count)]
+    latencies = []
+    tasks = [asyncio.create_task(client(server.port, counts[i], latencies)) for i in range(client_count)]
+    await asyncio.sleep(0.5)  # Let every client connect
+
+    stop = threading.Event()
+    publisher = threading.Thread(target=publish, args=(bus, stop))
+    publisher.start()
+    await asyncio.sleep(DURATION)
+    stop.set()
+    publisher.join()
+    stats = server.stats()
+    server.stop_thread()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    per_client = np.array([c[0] for c in counts]) / DURATION
+    lat = np.array(latencies) * 1000
+    print(f"{client_count:>7} {server.frames_encoded / DURATION:>10.1f} {per_client.mean():>12.1f} {per_client.min():>10.1f} "
+          f"{stats['frames_skipped']:>8} {np.median(lat):>9.2f} {np.percentile(lat, 99):>8.2f}")
+
+
+def main():
+    client_counts = [int(c) for c in sys.argv[1:]] or [1, 10, 100, 300]
+    print(f"{'clients':>7} {'encoded/s':>10} {'client fps':>12} {'min fps':>10} {'skipped':>8} {'p50 ms':>9} {'p99 ms':>8}")
+    for client_count in client_counts:
+        asyncio.run(run(client_count))
+
+
+if __name__ == '__main__':
+    main()
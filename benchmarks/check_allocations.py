@@ -0,0 +1,127 @@
+# Per-frame allocation check for the analysis paths, amplitudes and mood.
+#
+# Runs the real per-frame code for a few hundred frames under tracemalloc,
+# after a warm-up so cached buffers already exist:
+#   mic        MicAnalysis.process (pipeline.py) on float32 blocks as the
+#              microphone delivers them, mono and stereo, single and
+#              multi-resolution (mic blocks shorter than the FFT shift the history)
+#   file       FileAnalysis.process, the file analysis step, mono and stereo
+#   amplitudes the renderer's amplitude stage
+#   mood       MoodTracker.update on frame bus (float32) spectra
+# A display envelope with attack, release, peak hold and smoothing is on
+# for both analysis paths. No array may be allocated per frame, the FFT
+# included. Each call still builds a few small Python objects (views,
+# iterators, the FFT's wrappers, mood's result), so peak growth has to stay
+# below LIMIT, the size of one float64 spectrum row: any spectrum-sized
+# temporary on top of those objects goes over it. Nothing may be kept.
+#
+#   python benchmarks/check_allocations.py [frames]
+#
+# Exits with status 1 when a stage allocates.
+import os
+import sys
+import tracemalloc
+from dataclasses import replace
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import RT_Audio_Visualizer as viz
+from analysis import ChannelLayout, derive_bin_constants
+from config import Config
+from mood import MoodTracker
+from pipeline import FileAnalysis, MicAnalysis, create_analyzer, create_envelope
+
+RATE = 44100
+WARMUP = 50  # Longer than the peak hold, so every branch of the envelope has run
+CONFIG = replace(Config(), attack_ms=10.0, release_ms=200.0, peak_hold_ms=250.0, smooth_width=3)
+LIMIT = CONFIG.display_bins * 8
+
+
+def analyzer_for(config, rows):
+    return create_analyzer(config, RATE, rows)
+
+
+def mic_case(config, mode):
+    layout = ChannelLayout(mode, 2 if mode != 'mono' else 1)
+    analyzer = analyzer_for(config, layout.rows)
+    frame_seconds = config.hop_size / RATE
+    envelope = create_envelope(config, config.display_bins, layout.rows, frame_seconds)
+    analysis = MicAnalysis(analyzer, derive_bin_constants(config.display_bins)[2], layout, envelope=envelope)
+    rng = np.random.default_rng(0)
+    # Inputs are made up front so generating them is not traced
+    blocks = [(rng.standard_normal((config.hop_size, layout.input_channels)) * 0.1).astype(np.float32)
+              for _ in range(16)]
+    return lambda i: analysis.process(blocks[i % len(blocks)])
+
+
+def file_case(config, mode):
+    layout = ChannelLayout(mode, 2 if mode != 'mono' else 1)
+    analyzer = analyzer_for(config, layout.rows)
+    bins = config.display_bins
+    fade_bins, bass_bin, _ = derive_bin_constants(bins)
+    envelope = create_envelope(config, bins, layout.rows, config.hop_size / RATE)
+    analysis = FileAnalysis(bins, fade_bins, bass_bin, layout, envelope)
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal(((layout.rows,) if layout.rows > 1 else ()) + (RATE * 10,)) * 0.1
+    hop = config.hop_size
+    # Starts at the beginning of the track, where the window is zero-padded
+    return lambda i: analysis.process(analyzer, data, (i * hop) % data.shape[-1])
+
+
+def spectra(frames, dtype=float):
+    rng = np.random.default_rng(0)
+    return [(rng.random(CONFIG.display_bins) * (1 + np.sin(i * 0.2))).astype(dtype) for i in range(frames)]
+
+
+def amplitude_case(frames):
+    inputs = spectra(frames)
+    return lambda i: viz.shape_amplitudes(inputs[i], 0.5)
+
+
+def mood_case(frames):
+    inputs = spectra(frames, np.float32)
+    tracker = MoodTracker()
+    return lambda i: tracker.update(inputs[i], 0.1, i * CONFIG.hop_size / RATE)
+
+
+def measure(step, inputs):
+    # Returns (peak growth, retained growth) in bytes over the traced frames
+    for i in range(WARMUP):
+        step(i)
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for i in range(WARMUP, len(inputs)):
+        step(i)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - base, current - base
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    multi = replace(CONFIG, multi_resolution=True)
+    cases = [
+        ('mic mono', mic_case(CONFIG, 'mono')),
+        ('mic stereo', mic_case(CONFIG, 'stereo')),
+        ('mic multi', mic_case(multi, 'mono')),
+        ('mic multi st', mic_case(multi, 'stereo')),
+        ('file mono', file_case(CONFIG, 'mono')),
+        ('file stereo', file_case(CONFIG, 'stereo')),
+        ('file multi', file_case(multi, 'stereo')),
+        ('amplitudes', amplitude_case(frames + WARMUP)),
+        ('mood', mood_case(frames + WARMUP)),
+    ]
+    failures = 0
+    print(f"{'stage':>12} {'frames':>7} {'peak bytes':>11} {'kept bytes':>11}  result (limit {LIMIT} bytes)")
+    for name, step in cases:
+        peak, kept = measure(step, [None] * (frames + WARMUP))
+        ok = peak < LIMIT and kept < LIMIT
+        failures += not ok
+        print(f"{name:>12} {frames:>7} {peak:>11} {kept:>11}  {'ok' if ok else 'FAIL'}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# Checks the rasterization kernels (kernels.py) against the pygame/NumPy
+# paths they replace, and times both.
+#
+# Each kernel draws the same input as its fallback onto a copy of the same
+# surface and the results are compared: the polyline against draw_segments
+# (the kernel is anti-aliased, so only a loose match is expected), the
+# bloom's add_scaled against its surface scaling (true bilinear rather than
+# smoothscale, also loose), and splat_add against ParticleSystem.splat on
+# particles that do not overlap (exact).
+#
+#   python benchmarks/check_kernels.py
+#
+# Without Numba the kernels run as plain Python, so the check uses a small
+# surface and skips the timings. Exits with status 1 when a check fails.
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pygame
+import kernels
+import RT_Audio_Visualizer as viz
+from bloom import Bloom
+from particles import ParticleSystem
+
+SIZE = (1280, 720) if kernels.available else (160, 120)
+PIXEL_THRESHOLD = 24  # Per-channel difference that counts a pixel as changed
+
+
+def difference(a, b):
+    # (mean absolute difference, fraction of changed pixels) of two surfaces
+    diff = np.abs(pygame.surfarray.array3d(a).astype(np.int16) - pygame.surfarray.array3d(b).astype(np.int16))
+    return float(diff.mean()), float(np.mean(diff.max(axis=2) > PIXEL_THRESHOLD))
+
+
+def timed(function, repeat):
+    # Median milliseconds of function() over repeat calls, after one warm-up call
+    function()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times))
+
+
+def shape_points():
+    # A circle outline with uneven amplitudes, as draw_frame builds it
+    n = 512
+    angle = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    amplitudes = 0.3 + 0.2 * np.sin(angle * 7)
+    radius = SIZE[1] * (0.15 + 0.2 * amplitudes)
+    points = [(SIZE[0] / 2 + r * np.cos(a), SIZE[1] / 2 + r * np.sin(a), (255, 128 + i % 128, 64), amp)
+              for i, (a, r, amp) in enumerate(zip(angle, radius, amplitudes))]
+    return points + points[:1]
+
+
+def check_polyline(repeat):
+    points = shape_points()
+    scale = SIZE[1] / 600
+    viz.config.jit_kernels = False
+    results = []
+    for draw in (viz.draw_segments, viz.draw_segments_jit):
+        surface = pygame.Surface(SIZE)
+        rect = draw(surface, points, scale)
+        ms = timed(lambda: draw(surface, points, scale), repeat) if repeat else None
+        results.append((surface, rect, ms))
+    (reference, reference_rect, reference_ms), (surface, rect, ms) = results
+    mean_diff, changed = difference(reference, surface)
+    ok = mean_diff < 2 and changed < 0.02 and rect.inflate(2, 2).contains(reference_rect)
+    return 'polyline', mean_diff, changed, reference_ms, ms, ok
+
+
+def check_bloom(repeat):
+    points = shape_points()
+    scale = SIZE[1] / 600
+    viz.config.jit_kernels = False
+    results = []
+    for accelerated in (False, True):
+        bloom = Bloom(SIZE)
+        surface = pygame.Surface(SIZE)
+        surface.fill((20, 10, 30))
+        rect = viz.draw_segments(bloom.begin(), points, scale)
+        bloom.finish(surface, rect, 12 * scale, 3, accelerated)
+
+        def run():
+            viz.draw_segments(bloom.begin(), points, scale)
+            bloom.finish(pygame.Surface(SIZE), rect, 12 * scale, 3, accelerated)
+        results.append((surface, timed(run, repeat) if repeat else None))
+    (reference, reference_ms), (surface, ms) = results
+    mean_diff, changed = difference(reference, surface)
+    return 'add_scaled', mean_diff, changed, reference_ms, ms, mean_diff < 2 and changed < 0.01
+
+
+def check_splat(repeat):
+    system = ParticleSystem(capacity=4096)
+    system.gravity = 0.0
+    grid = np.stack(np.meshgrid(np.arange(4, SIZE[0] - 4, 6), np.arange(4, SIZE[1] - 4, 6)), -1).reshape(-1, 2)[:4096]
+    colors = np.random.default_rng(0).uniform(0, 200, (len(grid), 3))
+    system.emit(grid[:, 0], grid[:, 1], np.zeros(len(grid)), np.zeros(len(grid)), np.ones(len(grid)), colors)
+    results = []
+    for accelerated in (False, True):
+        surface = pygame.Surface(SIZE)
+        surface.fill((100, 60, 30))
+
+        def run(target=surface):
+            pixels = pygame.surfarray.pixels3d(target)
+            system.splat(pixels, 2, accelerated)
+            del pixels
+        run()
+        results.append((surface, timed(lambda: run(pygame.Surface(SIZE)), repeat) if repeat else None))
+    (reference, reference_ms), (surface, ms) = results
+    mean_diff, changed = difference(reference, surface)
+    return 'splat_add', mean_diff, changed, reference_ms, ms, changed == 0
+
+
+def main():
+    viz.init_display()
+    repeat = 50 if kernels.available else 0
+    if not kernels.available:
+        print(f"numba is not installed: checking the plain Python kernels at {SIZE[0]}x{SIZE[1]}, no timings")
+    print(f"{'kernel':>10} {'mean diff':>10} {'changed':>8} {'numpy ms':>9} {'kernel ms':>10}  result")
+    failures = 0
+    for check in (check_polyline, check_bloom, check_splat):
+        name, mean_diff, changed, reference_ms, ms, ok = check(repeat)
+        timing = f"{reference_ms:>9.2f} {ms:>10.2f}" if repeat else f"{'-':>9} {'-':>10}"
+        print(f"{name:>10} {mean_diff:>10.3f} {changed:>8.2%} {timing}  {'ok' if ok else 'FAIL'}")
+        failures += not ok
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# Startup check for SpectrumServer.start_in_thread.
+#
+# Binds a port first and starts the server on it: start_in_thread has to
+# raise the bind error in the caller instead of waiting forever for a server
+# that never started. Then starts a server on a free port, connects a client
+# and reads one frame, so a fixed failure path does not break the normal one.
+#
+#   python benchmarks/check_stream_server.py
+#
+# Exits with status 1 when a case fails or hangs.
+import asyncio
+import os
+import socket
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from fanout import FrameBus
+from stream_server import SpectrumServer, read_frame
+
+TIMEOUT = 5.0
+
+
+def in_thread(call):
+    # Returns ('ok', result), ('raised', exception) or ('hung', None) after TIMEOUT
+    outcome = [('hung', None)]
+
+    def run():
+        try:
+            outcome[0] = ('ok', call())
+        except Exception as e:
+            outcome[0] = ('raised', e)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(TIMEOUT)
+    return outcome[0]
+
+
+def port_in_use():
+    taken = socket.socket()
+    taken.bind(('127.0.0.1', 0))
+    taken.listen()
+    try:
+        server = SpectrumServer(FrameBus(), port=taken.getsockname()[1])
+        result, value = in_thread(server.start_in_thread)
+    finally:
+        taken.close()
+    ok = result == 'raised' and isinstance(value, OSError) and server._thread is None
+    return ok, f"{result} {value!r}" if value is not None else result
+
+
+def serves_frames():
+    bus = FrameBus()
+    server = SpectrumServer(bus, port=0, band_count=8)
+    result, value = in_thread(server.start_in_thread)
+    if result != 'ok':
+        return False, f"start {result} {value!r}"
+
+    async def first_frame():
+        reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+        try:
+            while not server.clients:
+                await asyncio.sleep(0.01)
+            bus.publish(np.full(64, 0.5, dtype=np.float32), 1.0)
+            return await asyncio.wait_for(read_frame(reader), TIMEOUT)
+        finally:
+            writer.close()
+
+    try:
+        result, value = in_thread(lambda: asyncio.run(first_frame()))
+    finally:
+        server.stop_thread()
+    ok = result == 'ok' and value[2] and len(value[4]) == 8
+    return ok, f"{result} seq {value[0]} beat {value[2]}" if result == 'ok' else f"{result} {value!r}"
+
+
+def main():
+    failures = 0
+    for name, case in (('port in use', port_in_use), ('serves frames', serves_frames)):
+        ok, detail = case()
+        failures += not ok
+        print(f"{name:>14}  {'ok' if ok else 'FAIL'}  {detail}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
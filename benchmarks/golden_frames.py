@@ -0,0 +1,151 @@
+# Golden-image regression check for the renderer.
+#
+# Feeds a fixed synthetic spectrum and beat_pulse sequence through draw_frame
+# for every shape in linear and logarithmic mode, and compares checkpoint
+# frames against the reference PNGs in benchmarks/golden/. Per-frame draw
+# times are reported next to the image differences, so an optimization can
+# be checked for speed and fidelity in one run.
+#
+#   python benchmarks/golden_frames.py            compare against the references
+#   python benchmarks/golden_frames.py --update   rewrite the references
+#   python benchmarks/golden_frames.py --missing  write references only where none exist
+#
+# Every registered shape is covered, including plugins. A shape without
+# references fails the check until they are written with --missing (look at
+# the new PNGs before committing them).
+#
+# Exits with status 1 when any checkpoint is outside the tolerance or has no
+# reference. Runs with
+# the SDL dummy video driver unless SDL_VIDEODRIVER is already set.
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pygame
+import RT_Audio_Visualizer as viz
+from analysis import derive_bin_constants
+from config import DEFAULT_PALETTE
+from display import RenderAssets
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+SIZE = (320, 240)
+BINS = 512
+FRAMES = 24
+CHECKPOINTS = (7, 23)  # Frames compared; the fade trail makes later frames depend on earlier ones
+PIXEL_THRESHOLD = 24   # Per-channel difference that counts a pixel as changed
+
+
+def synthetic_input(frame):
+    # Spectrum, per-channel spectra and beat pulse for one frame, the same every run
+    x = np.arange(BINS) / BINS
+    peak = 0.5 + 0.4 * np.sin(frame * 0.3)
+    spectrum = 0.3 * np.exp(-x * 3) * (1 + np.exp(-((x - peak) * 20) ** 2))
+    spectrum *= 1 + 0.2 * np.sin(x * 40 + frame)
+    channels = np.stack([spectrum * (1 + 0.3 * np.sin(frame * 0.5)), spectrum * (1 - 0.3 * np.sin(frame * 0.5))])
+    beat_pulse = 0.92 ** (frame % 16)  # A beat every 16 frames
+    return spectrum, channels, beat_pulse
+
+
+def pin_settings():
+    # Rendering state normally taken from data/config.txt, fixed so the
+    # references do not depend on the user's config
+    viz.palette = list(DEFAULT_PALETTE)
+    viz.log_scale = 63
+    viz.background_filepath = ''
+    viz.background_flash = True
+    viz.particles_on = False
+    viz.config.jit_kernels = False  # The references are the pygame/NumPy path; see check_kernels.py
+    viz.config.bloom = True
+    viz.config.bloom_radius = 12
+    viz.config.bloom_strength = 3.0
+    viz.config.mood_colors = False  # Both only act in the render loop, pinned in case that changes
+    viz.config.auto_shape = 0.0
+    viz.FADE_BINS, viz.BASS_BIN, viz.BASS_ENERGY_BINS = derive_bin_constants(BINS)
+
+
+def render_case(shape_mode, logarithmic):
+    # Returns ({checkpoint: pixels}, per-frame draw times in ms)
+    viz.logarithmic = logarithmic
+    surface = pygame.Surface(SIZE).convert()
+    surface.fill((0, 0, 0))
+    assets = RenderAssets(SIZE[0], SIZE[1], 80, SIZE[1] / 600)
+    checkpoints, times = {}, []
+    for frame in range(FRAMES):
+        spectrum, channels, beat_pulse = synthetic_input(frame)
+        start = time.perf_counter()
+        viz.draw_frame(surface, assets, spectrum, beat_pulse, shape_mode, channels)
+        times.append((time.perf_counter() - start) * 1000)
+        if frame in CHECKPOINTS:
+            checkpoints[frame] = surface.copy()
+    return checkpoints, times
+
+
+def reference_path(shape_mode, logarithmic, frame):
+    mode = 'log' if logarithmic else 'linear'
+    return os.path.join(GOLDEN_DIR, f"{viz.SHAPE_NAMES[shape_mode]}_{mode}_{frame:02d}.png")
+
+
+def compare(surface, path):
+    # Returns (mean absolute difference, fraction of changed pixels), or None
+    # when there is no reference
+    if not os.path.exists(path):
+        return None
+    expected = pygame.surfarray.array3d(pygame.image.load(path)).astype(np.int16)
+    actual = pygame.surfarray.array3d(surface).astype(np.int16)
+    if expected.shape != actual.shape:
+        return float('inf'), 1.0
+    diff = np.abs(actual - expected)
+    return float(diff.mean()), float(np.mean(diff.max(axis=2) > PIXEL_THRESHOLD))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare rendered frames against golden references")
+    parser.add_argument('--update', action='store_true', help="write new reference frames")
+    parser.add_argument('--missing', action='store_true', help="write reference frames that do not exist yet")
+    parser.add_argument('--max-mean', type=float, default=0.5, help="allowed mean absolute difference (0-255)")
+    parser.add_argument('--max-changed', type=float, default=0.005, help="allowed fraction of changed pixels")
+    args = parser.parse_args(argv)
+
+    viz.init_display()
+    pin_settings()
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+
+    failures = missing = 0
+    print(f"{'shape':>9} {'mode':>6} {'mean ms':>8} {'p95 ms':>7} {'max ms':>7} {'frame':>6} {'mean diff':>10} {'changed':>8}  result")
+    for shape_mode in range(viz.SHAPE_COUNT):
+        for logarithmic in (False, True):
+            checkpoints, times = render_case(shape_mode, logarithmic)
+            timing = f"{np.mean(times):>8.2f} {np.percentile(times, 95):>7.2f} {np.max(times):>7.2f}"
+            for frame, surface in checkpoints.items():
+                path = reference_path(shape_mode, logarithmic, frame)
+                if args.update or (args.missing and not os.path.exists(path)):
+                    pygame.image.save(surface, path)
+                    result, diff = 'updated', ''
+                else:
+                    scores = compare(surface, path)
+                    if scores is None:
+                        result, diff = 'MISSING', ''
+                        missing += 1
+                    else:
+                        mean_diff, changed = scores
+                        ok = mean_diff <= args.max_mean and changed <= args.max_changed
+                        failures += not ok
+                        result = 'ok' if ok else 'FAIL'
+                        diff = f"{mean_diff:>10.3f} {changed:>8.2%}"
+                mode = 'log' if logarithmic else 'linear'
+                print(f"{viz.SHAPE_NAMES[shape_mode]:>9} {mode:>6} {timing} {frame:>6} {diff:>19}  {result}")
+
+    if failures:
+        print(f"{failures} checkpoint(s) outside tolerance")
+    if missing:
+        print(f"{missing} checkpoint(s) without a reference: write them with --missing")
+    return 1 if failures or missing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import numpy as np
+import pygame
+
+import kernels
+
+
+# === Bloom ===
+# Glow around the shape. The shape is drawn once onto a black layer, which
+# goes onto the render surface as is and also through a blur: downscaled
+# (1/4 at up to 720 rows, more above that), blurred with two separable box
+# passes per axis (close to a Gaussian), and added back upscaled. Only the
+# area the shape was drawn in, plus the glow radius, is processed. Every step
+# works on whole images, so the cost depends on that area, never on the
+# number of points, and all buffers are allocated once per size.
+class Bloom:
+    def __init__(self, size, downscale=4, max_rows=180):
+        self.size = size
+        self.downscale = max(downscale, -(-size[1] // max_rows))  # Keeps the blur at most max_rows tall
+        self.small_size = (max(1, size[0] // self.downscale), max(1, size[1] // self.downscale))
+        self.layer = pygame.Surface(size)
+        self.layer.fill((0, 0, 0))
+        self.small = pygame.Surface(self.small_size)
+        self.double = pygame.Surface((self.small_size[0] * 2, self.small_size[1] * 2))
+        self.glow = pygame.Surface(size)
+        self.work = np.zeros(self.small_size + (3,), dtype=np.float32)
+        self.temp = np.zeros(self.small_size + (3,), dtype=np.float32)
+
+    def begin(self):
+        # Returns the layer to draw the shape on; it is black wherever
+        # finish() has not been told about
+        return self.layer
+
+    def finish(self, surface, rect, radius, strength, accelerated=False):
+        # Puts the layer and its glow onto surface. rect covers everything
+        # drawn on the layer since begin(); radius is in layer pixels and
+        # strength scales the glow (1 = as bright as the blur). accelerated
+        # adds the glow with kernels.add_scaled (Numba) instead of scaling
+        # surfaces.
+        rect = pygame.Rect(rect).clip(self.layer.get_rect())
+        if not rect.w or not rect.h:
+            return
+        surface.blit(self.layer, rect.topleft, rect, special_flags=pygame.BLEND_RGB_MAX)
+        if strength > 0:
+            self._glow(surface, rect, radius, strength, accelerated)
+        self.layer.fill((0, 0, 0), rect)
+
+    def _glow(self, surface, rect, radius, strength, accelerated):
+        # The area around rect, in whole blur pixels
+        ds = self.downscale
+        small_radius = max(1, round(radius / ds))
+        margin = 2 * small_radius * ds
+        left, top = max(0, (rect.left - margin) // ds), max(0, (rect.top - margin) // ds)
+        right = min(self.small_size[0], -(-(rect.right + margin) // ds))
+        bottom = min(self.small_size[1], -(-(rect.bottom + margin) // ds))
+        w, h = right - left, bottom - top
+        if w < 1 or h < 1:
+            return
+        area = pygame.Rect(left * ds, top * ds, w * ds, h * ds).clip(self.layer.get_rect())
+
+        small = self.small.subsurface((0, 0, w, h))
+        pygame.transform.smoothscale(self.layer.subsurface(area), (w, h), small)
+        pixels = pygame.surfarray.pixels3d(small)
+        work, temp = self.work[:w, :h], self.temp[:w, :h]
+        np.copyto(work, pixels)
+        del pixels  # Unlocks the surface
+        for axis in (0, 1, 0, 1):
+            work, temp = self._box(work, temp, axis, small_radius)
+        work *= strength / (2 * small_radius + 1) ** 4  # The box passes sum rather than average
+        np.minimum(work, 255, out=work)
+        if accelerated:
+            pixels = pygame.surfarray.pixels3d(surface)
+            kernels.add_scaled(pixels, area.left, area.top, work, ds)
+            del pixels
+            return
+        pixels = pygame.surfarray.pixels3d(small)
+        np.copyto(pixels, work, casting='unsafe')
+        del pixels
+
+        # Bilinear to twice the blur size, then a plain scale the rest of the
+        # way: the glow is smooth enough that the second step does not show
+        double = self.double.subsurface((0, 0, w * 2, h * 2))
+        pygame.transform.smoothscale(small, (w * 2, h * 2), double)
+        glow = self.glow.subsurface((0, 0, area.w, area.h))
+        pygame.transform.scale(double, (area.w, area.h), glow)
+        surface.blit(glow, area.topleft, special_flags=pygame.BLEND_RGB_ADD)
+
+    @staticmethod
+    def _box(source, total, axis, radius):
+        # Sum over 2 * radius + 1 pixels along axis, from shifted slices;
+        # outside the area counts as black. Returns (result, spare buffer).
+        np.copyto(total, source)
+        for k in range(1, radius + 1):
+            if axis == 0:
+                total[k:] += source[:-k]
+                total[:-k] += source[k:]
+            else:
+                total[:, k:] += source[:, :-k]
+                total[:, :-k] += source[:, k:]
+        return total, source
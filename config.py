@@ -0,0 +1,270 @@
+import os
+import time
+from dataclasses import dataclass, field, fields
+
+
+DEFAULT_PALETTE = [(255, 0, 0), (255, 69, 0), (255, 255, 0), (0, 0, 255), (138, 43, 226)]
+
+
+# === Config Schema ===
+# Every key has a type and a default here; a bad or missing value only falls
+# back for that key, it never throws away the rest of the file.
+@dataclass
+class Config:
+    width: int = 800
+    height: int = 600
+    fullscreen: bool = False
+    resizable: bool = True
+    render_height: int = 0  # Internal render height, 0 = same as the window
+    render_scale: float = 1.0  # Internal render size relative to the window
+    render_smooth: bool = False  # Smooth (bilinear) or nearest-neighbour upscale; smoothscale costs more than a reduced render size saves
+    background_image_path: str = ''
+
+    # Higher increases bass-stretching, lower leaves more room for high frequencies
+    log_scale: int = 63
+    fade_alpha: int = 80
+    background_flash: bool = True
+    bloom: bool = True             # Blurred glow around the shape
+    bloom_radius: int = 12         # Glow radius in window pixels
+    bloom_strength: float = 3.0    # Glow brightness, 0 = none
+    jit_kernels: bool = True       # Numba kernels for lines, glow and particles, when numba is installed
+    mood_colors: bool = False      # Palette follows the music's key, energy and noisiness (mood.py)
+    auto_shape: float = 0.0        # Seconds a shape is kept before switching to the one that suits the mood, 0 = off
+    particles: bool = False        # Beat bursts and sparks (K toggles)
+    particle_capacity: int = 16384
+    particle_burst: int = 800      # Particles per full-strength beat
+    particle_sparks: float = 0.5   # Spark rate off loud points, 0 = none
+    fps: int = 60
+    idle_fps: int = 10         # Frame rate while the input is silent, 0 = always full rate
+    idle_after: float = 3.0    # Seconds of silence before dropping to idle_fps
+    idle_rms: float = 0.001    # Input RMS (full scale = 1) below which the input counts as silent
+
+    # Display envelope, applied to the spectrum after analysis (0 = off)
+    attack_ms: float = 0.0      # Rise time constant
+    release_ms: float = 0.0     # Fall time constant
+    peak_hold_ms: float = 0.0   # Hold each bin's peak this long before it falls
+    peak_falloff: float = 1.0   # Fall rate of held peaks, in spectrum units per second
+    smooth_width: int = 1       # Extra moving average across this many bins
+    show_latency: bool = False  # Sample-to-display latency in the corner
+    show_stats: bool = False    # Analysis thread and queue health in the corner
+    seek_seconds: float = 5.0  # Left/Right arrow jump in file playback
+    library_index: str = 'data/library_index.npz'  # Track features for "play similar" (S in the menu)
+    library_workers: int = 0   # Processes analyzing the library, 0 = one per CPU
+    similar_count: int = 10    # Tracks queued after the selected one
+
+    fft_size: int = 1024
+    hop_size: int = 1024
+    display_bins: int = 512
+    multi_resolution: bool = False
+    channel_mode: str = 'mono'  # mono, stereo (left/right) or midside
+    bass_fft_size: int = 4096
+    crossover_hz: int = 250
+    analysis_rate: int = 44100  # Files above this rate are resampled before analysis, 0 = never
+    mic_sample_rate: int = 44100
+    test_signal: str = 'clicks'  # Menu test input: clicks, impulse, chirp or noise
+    test_bpm: int = 120
+    analysis_process: bool = False  # Live capture and analysis in a child process (shared memory)
+
+    preview_window: bool = False
+    preview_width: int = 480
+    preview_height: int = 270
+    preview_shape: int = 3
+    frame_sink: bool = False
+    frame_sink_width: int = 320
+    frame_sink_height: int = 240
+    frame_sink_shape: int = 0
+    frame_sink_every: int = 30  # Save every Nth analysis frame
+    frame_sink_dir: str = 'snapshots'
+
+    stream_server: bool = False  # Serve analysis frames to network clients
+    stream_host: str = '127.0.0.1'
+    stream_port: int = 7765
+    stream_bands: int = 32
+
+    record_dir: str = 'recordings'
+    record_pool_frames: int = 32  # Frames buffered for the writer before the oldest are dropped
+
+    palette: list = field(default_factory=lambda: list(DEFAULT_PALETTE))
+
+
+def _power_of_two(value):
+    return value > 0 and value & (value - 1) == 0
+
+# key: (check, message shown when the check fails)
+RULES = {
+    'width': (lambda v: 160 <= v <= 7680, 'must be between 160 and 7680'),
+    'height': (lambda v: 120 <= v <= 4320, 'must be between 120 and 4320'),
+    'render_height': (lambda v: v == 0 or 120 <= v <= 4320, 'must be 0 or between 120 and 4320'),
+    'render_scale': (lambda v: 0.1 <= v <= 1.0, 'must be between 0.1 and 1.0'),
+    'log_scale': (lambda v: v >= 2, 'must be at least 2'),
+    'fade_alpha': (lambda v: 0 <= v <= 255, 'must be between 0 and 255'),
+    'fps': (lambda v: 1 <= v <= 480, 'must be between 1 and 480'),
+    'bloom_radius': (lambda v: 1 <= v <= 256, 'must be between 1 and 256'),
+    'bloom_strength': (lambda v: 0 <= v <= 10, 'must be between 0 and 10'),
+    'auto_shape': (lambda v: v >= 0, 'must not be negative'),
+    'particle_capacity': (lambda v: 256 <= v <= 1000000, 'must be between 256 and 1000000'),
+    'particle_burst': (lambda v: 0 <= v <= 100000, 'must be between 0 and 100000'),
+    'particle_sparks': (lambda v: v >= 0, 'must not be negative'),
+    'idle_fps': (lambda v: 0 <= v <= 480, 'must be between 0 and 480'),
+    'idle_after': (lambda v: v >= 0, 'must not be negative'),
+    'idle_rms': (lambda v: 0 <= v <= 1, 'must be between 0 and 1'),
+    'seek_seconds': (lambda v: v > 0, 'must be positive'),
+    'attack_ms': (lambda v: 0 <= v <= 10000, 'must be between 0 and 10000'),
+    'release_ms': (lambda v: 0 <= v <= 10000, 'must be between 0 and 10000'),
+    'peak_hold_ms': (lambda v: 0 <= v <= 10000, 'must be between 0 and 10000'),
+    'peak_falloff': (lambda v: v >= 0, 'must not be negative'),
+    'smooth_width': (lambda v: 1 <= v <= 64, 'must be between 1 and 64'),
+    'fft_size': (lambda v: _power_of_two(v) and 64 <= v <= 65536, 'must be a power of two from 64 to 65536'),
+    'hop_size': (lambda v: v >= 1, 'must be positive'),
+    'display_bins': (lambda v: 16 <= v <= 8192, 'must be between 16 and 8192'),
+    'bass_fft_size': (lambda v: _power_of_two(v) and 64 <= v <= 65536, 'must be a power of two from 64 to 65536'),
+    'crossover_hz': (lambda v: v > 0, 'must be positive'),
+    'analysis_rate': (lambda v: v == 0 or 8000 <= v <= 384000, 'must be 0 or between 8000 and 384000'),
+    'mic_sample_rate': (lambda v: 8000 <= v <= 384000, 'must be between 8000 and 384000'),
+    'test_signal': (lambda v: v in ('clicks', 'impulse', 'chirp', 'noise'), 'must be clicks, impulse, chirp or noise'),
+    'test_bpm': (lambda v: 20 <= v <= 400, 'must be between 20 and 400'),
+    'channel_mode': (lambda v: v in ('mono', 'stereo', 'midside'), 'must be mono, stereo or midside'),
+    'preview_width': (lambda v: 16 <= v <= 7680, 'must be between 16 and 7680'),
+    'preview_height': (lambda v: 16 <= v <= 4320, 'must be between 16 and 4320'),
+    'preview_shape': (lambda v: v >= 0, 'must be a shape number (0 or more)'),
+    'frame_sink_width': (lambda v: 16 <= v <= 7680, 'must be between 16 and 7680'),
+    'frame_sink_height': (lambda v: 16 <= v <= 4320, 'must be between 16 and 4320'),
+    'frame_sink_shape': (lambda v: v >= 0, 'must be a shape number (0 or more)'),
+    'frame_sink_every': (lambda v: v >= 1, 'must be at least 1'),
+    'library_workers': (lambda v: 0 <= v <= 256, 'must be between 0 and 256'),
+    'similar_count': (lambda v: 1 <= v <= 1000, 'must be between 1 and 1000'),
+    'stream_port': (lambda v: 0 <= v <= 65535, 'must be between 0 and 65535'),
+    'stream_bands': (lambda v: 1 <= v <= 1024, 'must be between 1 and 1024'),
+    'record_pool_frames': (lambda v: 2 <= v <= 1024, 'must be between 2 and 1024'),
+}
+
+# Keys that can change while a visualization is running. Everything else is
+# picked up the next time a track or the microphone is started.
+LIVE_KEYS = {'background_image_path', 'log_scale', 'fade_alpha', 'background_flash', 'fps', 'palette',
+             'bloom', 'bloom_radius', 'bloom_strength', 'jit_kernels', 'mood_colors', 'auto_shape',
+             'particles', 'particle_capacity', 'particle_burst', 'particle_sparks',
+             'render_height', 'render_scale', 'render_smooth', 'seek_seconds', 'idle_fps', 'idle_after', 'idle_rms',
+             'show_latency', 'show_stats'}
+
+CONFIG_KEYS = {f.name: f.type for f in fields(Config) if f.name != 'palette'}
+
+
+# === Parsing ===
+def _parse_bool(text):
+    lowered = text.lower()
+    if lowered in ('1', 'true', 'yes', 'on'):
+        return True
+    if lowered in ('0', 'false', 'no', 'off'):
+        return False
+    raise ValueError(f"expected on/off, got '{text}'")
+
+def _parse_color(text):
+    rgb = tuple(int(c) for c in text.strip('( )').split(','))
+    if len(rgb) != 3 or not all(0 <= c <= 255 for c in rgb):
+        raise ValueError(f"expected (r,g,b) with values 0-255, got '{text}'")
+    return rgb
+
+PARSERS = {int: int, float: float, str: str, bool: _parse_bool}
+
+def parse_config(lines):
+    # Returns (config, warnings); warnings name the line and what was wrong
+    values = {}
+    palette = []
+    warnings = []
+
+    for number, raw in enumerate(lines, 1):
+        text = raw.strip()
+        if not text or text.startswith('#'):
+            continue
+        if text.startswith('('):
+            try:
+                palette.append(_parse_color(text))
+            except ValueError as e:
+                warnings.append(f"line {number}: {e}")
+            continue
+
+        key, sep, value = text.partition(':')
+        key, value = key.strip(), value.strip()
+        if not sep:
+            warnings.append(f"line {number}: expected 'key: value', got '{text}'")
+            continue
+        if key == 'line_colors':
+            continue
+        if key not in CONFIG_KEYS:
+            warnings.append(f"line {number}: unknown key '{key}'")
+            continue
+
+        try:
+            parsed = PARSERS[CONFIG_KEYS[key]](value)
+        except ValueError as e:
+            warnings.append(f"line {number}: {key}: {e}")
+            continue
+        check, message = RULES.get(key, (None, None))
+        if check is not None and not check(parsed):
+            warnings.append(f"line {number}: {key} {message}, got {parsed}")
+            continue
+        values[key] = parsed
+
+    if palette:
+        values['palette'] = palette
+    config = Config(**values)
+
+    # Checks that involve more than one key
+    if config.hop_size > config.fft_size:
+        warnings.append(f"hop_size {config.hop_size} is larger than fft_size, using {config.fft_size}")
+        config.hop_size = config.fft_size
+    if config.multi_resolution and config.bass_fft_size <= config.fft_size:
+        warnings.append("bass_fft_size must be larger than fft_size, multi_resolution disabled")
+        config.multi_resolution = False
+
+    return config, warnings
+
+def load_config(path):
+    try:
+        with open(path) as conf:
+            return parse_config(conf.readlines())
+    except OSError as e:
+        return Config(), [f"could not read {path}: {e}"]
+
+def changed_keys(old, new):
+    return {f.name for f in fields(Config) if getattr(old, f.name) != getattr(new, f.name)}
+
+
+# === Hot Reload ===
+# Polls the file's mtime at most once per interval so it is cheap to call
+# every frame. poll() returns the set of keys whose values changed.
+class ConfigWatcher:
+    def __init__(self, path, interval=0.5):
+        self.path = path
+        self.interval = interval
+        self._mtime = self._stat()
+        self._last_check = time.monotonic()
+        self.config, warnings = load_config(path)
+        self._report(warnings)
+
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _report(self, warnings):
+        for warning in warnings:
+            print(f"Config: {warning}")
+
+    def poll(self):
+        now = time.monotonic()
+        if now - self._last_check < self.interval:
+            return set()
+        self._last_check = now
+
+        mtime = self._stat()
+        if mtime == self._mtime:
+            return set()
+        self._mtime = mtime
+
+        new, warnings = load_config(self.path)
+        self._report(warnings)
+        changed = changed_keys(self.config, new)
+        self.config = new
+        return changed
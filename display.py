@@ -0,0 +1,152 @@
+import pygame
+from collections import OrderedDict
+
+
+# === Per-Resolution Assets ===
+# Everything whose size or coordinates depend on the render resolution.
+# Built once per size and kept in a small cache, so dragging a window edge
+# back and forth or toggling fullscreen does not rebuild them every frame.
+class RenderAssets:
+    def __init__(self, width, height, fade_alpha, scale=1.0):
+        self.width = width
+        self.height = height
+        self.center = (width // 2, height // 2)
+        self.scale = scale  # Render pixels per window pixel
+
+        self.fade_surface = pygame.Surface((width, height))
+        self.fade_surface.set_alpha(fade_alpha)  # Higher = faster fade
+        self.fade_surface.fill((5, 5, 10))  # Darker fade to prevent ghosting
+        self.flash_surface = pygame.Surface((width, height), pygame.SRCALPHA)
+
+        cx, cy = self.center
+        self.triangle = [(cx, cy + 100 * scale), (cx - 100 * scale, cy - 80 * scale), (cx + 100 * scale, cy - 80 * scale)]
+        self.shapes = {}  # Shape instances by mode number, with the (points, warping) they were built for
+        self.bloom = None  # Glow layer and blur buffers, created on first use
+        self.waterfall = None  # Spectrogram history, created by the waterfall mode on first use
+        self.particles = None  # Particle system and its (time, beat pulse) at the last draw
+        self.particle_clock = None
+
+        self._background_path = ''
+        self._background = None
+
+    def background(self, path):
+        # Background image scaled to this resolution, reloaded only when path changes
+        if path != self._background_path:
+            self._background_path = path
+            self._background = load_background(path, (self.width, self.height))
+        return self._background
+
+
+def load_background(path, size):
+    if not path:
+        return None
+    try:
+        return pygame.transform.scale(pygame.image.load(path).convert(), size)
+    except (pygame.error, FileNotFoundError) as e:
+        print(f"Failed to load background: {e}")
+        return None
+
+
+# === Display ===
+# Owns the window and the surface everything is drawn on. When render_scale is
+# below 1 or render_height is set (e.g. 720), drawing, trails and flash happen
+# on an offscreen surface of that size, matching the window's aspect ratio,
+# and present() upscales it to the window with a single scale blit.
+class Display:
+    MAX_CACHED_SIZES = 4
+
+    def __init__(self, size, fullscreen=False, resizable=True, render_height=0, render_scale=1.0,
+                 smooth=True, fade_alpha=80):
+        self.windowed_size = size
+        self.fullscreen = fullscreen
+        self.resizable = resizable
+        self.render_height = render_height
+        self.render_scale = render_scale
+        self.smooth = smooth  # smoothscale vs. nearest-neighbour scale
+        self.fade_alpha = fade_alpha
+
+        self._assets = OrderedDict()
+        self.window = None
+        self.surface = None
+        self._set_mode()
+
+    def _set_mode(self):
+        if self.fullscreen:
+            self.window = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        else:
+            flags = pygame.RESIZABLE if self.resizable else 0
+            self.window = pygame.display.set_mode(self.windowed_size, flags)
+        self._update_surface()
+
+    def render_size_for(self, width, height):
+        render_height = height * self.render_scale
+        if self.render_height:
+            render_height = min(render_height, self.render_height)
+        render_height = max(1, int(render_height))
+        return max(1, width * render_height // height), render_height
+
+    def _update_surface(self):
+        width, height = self.window.get_size()
+        render_size = self.render_size_for(width, height)
+        if render_size[1] < height:
+            if self.surface is None or self.surface is self.window or self.surface.get_size() != render_size:
+                self.surface = pygame.Surface(render_size).convert()
+        else:
+            self.surface = self.window
+
+    @property
+    def size(self):
+        return self.surface.get_size()
+
+    @property
+    def scaled(self):
+        return self.surface is not self.window
+
+    def assets(self):
+        key = (self.size, self.window.get_size(), self.fade_alpha)
+        assets = self._assets.get(key)
+        if assets is None:
+            scale = self.size[1] / self.window.get_height()
+            assets = RenderAssets(self.size[0], self.size[1], self.fade_alpha, scale)
+            self._assets[key] = assets
+            if len(self._assets) > self.MAX_CACHED_SIZES:
+                self._assets.popitem(last=False)
+        else:
+            self._assets.move_to_end(key)
+        return assets
+
+    def set_fade_alpha(self, alpha):
+        self.fade_alpha = alpha
+        self._assets.clear()
+
+    def set_render_height(self, render_height):
+        self.render_height = render_height
+        self._update_surface()
+
+    def set_render_scale(self, render_scale, smooth=None):
+        self.render_scale = render_scale
+        if smooth is not None:
+            self.smooth = smooth
+        self._update_surface()
+
+    def resize(self, width, height):
+        if self.fullscreen:
+            return
+        self.windowed_size = (width, height)
+        # pygame 2 resizes the window surface itself, just pick up the new one
+        self.window = pygame.display.get_surface()
+        self._update_surface()
+
+    def toggle_fullscreen(self):
+        self.fullscreen = not self.fullscreen
+        self._set_mode()
+
+    def present(self, overlays=()):
+        # overlays: (surface, position) pairs drawn at window resolution on
+        # top of the upscaled frame, so text stays sharp
+        if self.scaled:
+            scale = pygame.transform.smoothscale if self.smooth else pygame.transform.scale
+            scale(self.surface, self.window.get_size(), self.window)
+        for surface, position in overlays:
+            self.window.blit(surface, position)
+        pygame.display.flip()
@@ -0,0 +1,95 @@
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+
+# === Spectrum Frames ===
+# One analysis result. The spectrum is copied once when it is published and
+# then shared read-only by every subscriber, so renderers never touch the
+# analysis buffers and never need fft_lock. channels holds the per-channel
+# spectra (2, bins) when a stereo or mid/side layout is analyzed. sample_time
+# is the perf_counter() time the newest analyzed sample was captured or
+# played, when the source knows it (see sources.py).
+@dataclass(frozen=True)
+class SpectrumFrame:
+    seq: int
+    timestamp: float
+    spectrum: np.ndarray
+    beat_pulse: float
+    channels: np.ndarray = None
+    sample_time: float = None
+
+
+# === Subscriptions ===
+# Latest-frame-wins: a slow subscriber only ever sees the newest frame, and
+# frames it never looked at are counted as skipped.
+class Subscription:
+    def __init__(self, bus, name):
+        self.bus = bus
+        self.name = name
+        self.frame = None
+        self.last_seq = 0
+        self.skipped = 0
+        self.listener = None  # Optional callable run on the publishing thread
+
+    def poll(self):
+        # Returns the newest frame if it has not been seen yet, else None
+        frame = self.frame
+        if frame is None or frame.seq == self.last_seq:
+            return None
+        if self.last_seq:
+            self.skipped += frame.seq - self.last_seq - 1
+        self.last_seq = frame.seq
+        return frame
+
+    def wait(self, timeout=None):
+        # Blocks until a frame newer than the last one seen arrives
+        with self.bus.condition:
+            self.bus.condition.wait_for(lambda: self.frame is not None and self.frame.seq != self.last_seq, timeout)
+        return self.poll()
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+# === Frame Bus ===
+# The analysis side calls publish() once per analysis frame; any number of
+# renderers, sinks or network clients subscribe and read at their own pace.
+class FrameBus:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.subscriptions = []
+        self.latest = None
+        self._seq = 0
+
+    def subscribe(self, name, listener=None):
+        subscription = Subscription(self, name)
+        subscription.listener = listener
+        with self.condition:
+            self.subscriptions = self.subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.condition:
+            self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+
+    def publish(self, spectrum, beat_pulse, timestamp=None, channels=None, sample_time=None):
+        with self.condition:
+            self._seq += 1
+            if channels is not None:
+                channels = np.array(channels, dtype=np.float32)
+                channels.flags.writeable = False
+            frame = SpectrumFrame(self._seq, time.perf_counter() if timestamp is None else timestamp,
+                                  np.array(spectrum, dtype=np.float32), float(beat_pulse), channels, sample_time)
+            frame.spectrum.flags.writeable = False
+            self.latest = frame
+            subscriptions = self.subscriptions
+            for subscription in subscriptions:
+                subscription.frame = frame
+            self.condition.notify_all()
+        for subscription in subscriptions:
+            if subscription.listener is not None:
+                subscription.listener(frame)
+        return frame
@@ -0,0 +1,67 @@
+import struct
+import time
+
+import numpy as np
+
+
+# === Wire Format ===
+# Every frame is a 16-byte little-endian header followed by one uint8 per band:
+#
+#   uint32  seq         analysis frame number
+#   float64 timestamp   Unix time (time.time()) the frame was analyzed, so clients
+#                       on other machines can compare it with their own clock
+#   uint8   flags       bit 0 = beat detected on this frame
+#   uint8   beat_level  beat pulse, 0-255
+#   uint16  band_count  number of band bytes that follow
+HEADER = struct.Struct('<IdBBH')
+FLAG_BEAT = 0x01
+BEAT_THRESHOLD = 0.5
+
+
+def decode_frame(data):
+    # Returns (seq, timestamp, beat, beat_level, bands) for one complete frame
+    seq, timestamp, flags, beat_level, band_count = HEADER.unpack_from(data)
+    bands = np.frombuffer(data, dtype=np.uint8, count=band_count, offset=HEADER.size)
+    return seq, timestamp, bool(flags & FLAG_BEAT), beat_level, bands
+
+
+# === Band Quantizer ===
+# Folds the display spectrum into log-spaced bands and quantizes them to
+# uint8 against a slowly decaying peak, so quiet and loud sources both use
+# the full 0-255 range. Band edges and buffers are built once per input size.
+class BandQuantizer:
+    def __init__(self, band_count, skip_bins=0, peak_decay=0.995):
+        self.band_count = band_count
+        self.skip_bins = skip_bins
+        self.peak_decay = peak_decay
+        self.peak = 1e-3
+        self._bins = None
+
+    def _build(self, bins):
+        usable = bins - self.skip_bins
+        edges = np.unique(np.geomspace(1, usable + 1, self.band_count + 1).astype(np.intp) - 1)
+        self._starts = edges[:-1] + self.skip_bins
+        self._widths = np.diff(edges).astype(np.float32)
+        self._bands = np.zeros(len(self._starts), dtype=np.float32)
+        self._out = np.zeros(self.band_count, dtype=np.uint8)
+        self._bins = bins
+
+    def quantize(self, spectrum):
+        if self._bins != len(spectrum):
+            self._build(len(spectrum))
+        np.add.reduceat(spectrum, self._starts, out=self._bands)
+        self._bands /= self._widths
+        self.peak = max(float(self._bands.max()), self.peak * self.peak_decay, 1e-3)
+        scaled = self._bands * (255.0 / self.peak)
+        # Low resolutions can merge bands; the unused tail stays at zero
+        self._out[:len(scaled)] = np.clip(scaled, 0, 255)
+        return self._out
+
+
+def encode_frame(frame, quantizer):
+    bands = quantizer.quantize(frame.spectrum)
+    beat = frame.beat_pulse >= BEAT_THRESHOLD
+    wall_time = time.time() - (time.perf_counter() - frame.timestamp)  # Frame times are perf_counter()
+    header = HEADER.pack(frame.seq & 0xFFFFFFFF, wall_time, FLAG_BEAT if beat else 0,
+                         int(min(1.0, frame.beat_pulse) * 255), len(bands))
+    return header + bands.tobytes()
@@ -0,0 +1,151 @@
+# Headless analysis daemon: microphone capture and spectrum/beat analysis
+# with no display. Frames go to stdout, a file or a Unix socket.
+#
+#   python headless.py                          binary frames to stdout
+#   python headless.py --output frames.bin      binary frames to a file
+#   python headless.py --output unix:/tmp/rtav.sock --bands 64
+#   python headless.py --format jsonl           one JSON object per line
+#   python headless.py --source clicks --bpm 90 a test signal instead of the microphone
+#
+# Binary frames use the same format as the network server (see frame_codec.py).
+import argparse
+import json
+import os
+import socket
+import sys
+
+from config import load_config
+from analysis import derive_bin_constants
+from fanout import FrameBus
+from frame_codec import BandQuantizer, decode_frame, encode_frame
+from pipeline import MicPipeline, input_channels
+from sources import SIGNALS, FileSource, SyntheticSource
+
+
+# === Outputs ===
+class StreamOutput:
+    # stdout or a regular file
+    def __init__(self, path):
+        self.file = sys.stdout.buffer if path == '-' else open(path, 'ab')
+
+    def write(self, payload):
+        self.file.write(payload)
+        self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout.buffer:
+            self.file.close()
+
+class UnixSocketOutput:
+    # Listens on a Unix socket; every connected client gets every frame it can
+    # take. A client whose socket buffer is full misses whole frames rather
+    # than stalling the daemon: when only part of a frame fits, the rest is
+    # kept for that client and sent before anything newer, so its stream
+    # never loses its framing.
+    def __init__(self, path):
+        if os.path.exists(path):
+            os.unlink(path)
+        self.path = path
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen()
+        self.server.setblocking(False)
+        self.clients = {}  # socket -> unsent rest of a frame (b'' when none)
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self.server.accept()
+            except BlockingIOError:
+                return
+            client.setblocking(False)
+            self.clients[client] = b''
+
+    def write(self, payload):
+        self._accept()
+        for client, pending in list(self.clients.items()):
+            try:
+                if pending:
+                    pending = pending[client.send(pending):]
+                if not pending:  # Frames that arrive while a rest is waiting are skipped
+                    pending = payload[client.send(payload):]
+            except BlockingIOError:
+                pass
+            except OSError:
+                del self.clients[client]
+                client.close()
+                continue
+            self.clients[client] = pending
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+        self.server.close()
+        os.unlink(self.path)
+
+def open_output(target):
+    if target.startswith('unix:'):
+        return UnixSocketOutput(target[len('unix:'):])
+    return StreamOutput(target)
+
+
+def to_json(payload):
+    seq, timestamp, beat, beat_level, bands = decode_frame(payload)
+    return (json.dumps({'seq': seq, 'timestamp': timestamp, 'beat': beat,
+                        'beat_level': beat_level, 'bands': bands.tolist()}) + '\n').encode()
+
+
+# === Daemon ===
+def main(argv=None):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Run audio analysis without a display")
+    parser.add_argument('--config', default=os.path.join(script_dir, 'data', 'config.txt'))
+    parser.add_argument('--output', default='-', help="'-' for stdout, a file path, or unix:/path/to.sock")
+    parser.add_argument('--format', choices=('binary', 'jsonl'), default='binary')
+    parser.add_argument('--bands', type=int, default=None, help="band count (default: stream_bands from config)")
+    parser.add_argument('--device', default=None, help="sounddevice input device")
+    parser.add_argument('--samplerate', type=int, default=None, help="input rate (default: mic_sample_rate from config)")
+    parser.add_argument('--source', default='mic',
+                        help=f"mic, a test signal ({', '.join(SIGNALS)}) or file:path.wav")
+    parser.add_argument('--bpm', type=int, default=None, help="test signal tempo (default: test_bpm from config)")
+    args = parser.parse_args(argv)
+
+    config, warnings = load_config(args.config)
+    for warning in warnings:
+        print(f"Config: {warning}", file=sys.stderr)
+
+    fade_bins, _, _ = derive_bin_constants(config.display_bins)
+    quantizer = BandQuantizer(args.bands or config.stream_bands, skip_bins=fade_bins)
+    frame_bus = FrameBus()
+    subscription = frame_bus.subscribe('headless')
+    try:
+        source = None
+        if args.source in SIGNALS:
+            source = SyntheticSource(args.source, args.samplerate or config.mic_sample_rate, input_channels(config),
+                                     config.hop_size, bpm=args.bpm or config.test_bpm)
+        elif args.source.startswith('file:'):
+            source = FileSource(args.source[len('file:'):], config.hop_size)
+        pipeline = MicPipeline(config, frame_bus, sample_rate=args.samplerate, device=args.device, source=source)
+        pipeline.start()
+    except Exception as e:
+        print(f"Microphone error: {e}", file=sys.stderr)
+        return 1
+
+    output = open_output(args.output)
+    try:
+        while True:
+            frame = subscription.wait(timeout=1.0)
+            if frame is None:
+                continue
+            payload = encode_frame(frame, quantizer)
+            output.write(to_json(payload) if args.format == 'jsonl' else payload)
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+    finally:
+        pipeline.stop()
+        output.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import math
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+# === Rasterization Kernels ===
+# Per-pixel loops for the renderer that NumPy expresses poorly: thick
+# anti-aliased polylines and additive blending, written straight into
+# pygame.surfarray.pixels3d arrays (indexed [x, y, rgb]). They are compiled
+# with Numba when it is installed; cache=True keeps the machine code in
+# __pycache__, so only the very first run pays for compiling.
+#
+# Without Numba, available is False and the callers keep their pygame and
+# NumPy paths. The functions still run as plain Python, far too slowly for a
+# frame but fine for checking them (benchmarks/check_kernels.py).
+available = numba is not None
+
+def jit(function):
+    if numba is None:
+        return function
+    return numba.njit(cache=True, nogil=True)(function)
+
+
+@jit
+def polyline(pixels, x, y, widths, colors):
+    # Segment i runs from point i - 1 to point i, widths[i] pixels thick in
+    # colors[i], as in draw_segments. Each pixel is blended toward the color
+    # by how much of it the segment covers, so edges are anti-aliased.
+    # Returns the area drawn in as (left, top, right, bottom), right and
+    # bottom exclusive; nothing was drawn when left >= right.
+    width, height = pixels.shape[0], pixels.shape[1]
+    left, top, right, bottom = width, height, 0, 0
+    for i in range(1, len(x)):
+        x1, y1, x2, y2 = x[i - 1], y[i - 1], x[i], y[i]
+        radius = widths[i] * 0.5
+        reach = radius + 1.0
+        x0 = max(0, int(math.floor(min(x1, x2) - reach)))
+        x3 = min(width, int(math.ceil(max(x1, x2) + reach)))
+        y0 = max(0, int(math.floor(min(y1, y2) - reach)))
+        y3 = min(height, int(math.ceil(max(y1, y2) + reach)))
+        if x0 >= x3 or y0 >= y3:
+            continue
+        dx, dy = x2 - x1, y2 - y1
+        length2 = dx * dx + dy * dy
+        for px in range(x0, x3):
+            for py in range(y0, y3):
+                # Distance from the pixel center to the segment
+                cx, cy = px + 0.5 - x1, py + 0.5 - y1
+                t = 0.0
+                if length2 > 0:
+                    t = min(1.0, max(0.0, (cx * dx + cy * dy) / length2))
+                ex, ey = cx - t * dx, cy - t * dy
+                coverage = radius + 0.5 - math.sqrt(ex * ex + ey * ey)
+                if coverage <= 0:
+                    continue
+                coverage = min(coverage, 1.0)
+                for c in range(3):
+                    value = float(pixels[px, py, c])
+                    pixels[px, py, c] = int(value + (colors[i, c] - value) * coverage + 0.5)
+        left, top = min(left, x0), min(top, y0)
+        right, bottom = max(right, x3), max(bottom, y3)
+    return left, top, right, bottom
+
+
+@jit
+def add_scaled(pixels, left, top, glow, scale):
+    # Adds glow (a (w, h, 3) float array), enlarged scale times with bilinear
+    # filtering, to pixels with its top left corner at (left, top).
+    # Saturates at 255.
+    glow_w, glow_h = glow.shape[0], glow.shape[1]
+    width, height = pixels.shape[0], pixels.shape[1]
+    right, bottom = min(width, left + glow_w * scale), min(height, top + glow_h * scale)
+    step = 1.0 / scale
+    for px in range(max(0, left), right):
+        fx = (px - left + 0.5) * step - 0.5
+        ix = int(math.floor(fx))
+        tx = fx - ix
+        ix0, ix1 = min(max(ix, 0), glow_w - 1), min(max(ix + 1, 0), glow_w - 1)
+        for py in range(max(0, top), bottom):
+            fy = (py - top + 0.5) * step - 0.5
+            iy = int(math.floor(fy))
+            ty = fy - iy
+            iy0, iy1 = min(max(iy, 0), glow_h - 1), min(max(iy + 1, 0), glow_h - 1)
+            for c in range(3):
+                upper = glow[ix0, iy0, c] * (1 - tx) + glow[ix1, iy0, c] * tx
+                lower = glow[ix0, iy1, c] * (1 - tx) + glow[ix1, iy1, c] * tx
+                value = pixels[px, py, c] + upper * (1 - ty) + lower * ty
+                pixels[px, py, c] = 255 if value >= 255 else int(value)
+
+
+@jit
+def splat_add(pixels, x, y, colors, size):
+    # Adds colors[i] to a size x size square at (x[i], y[i]) for every i,
+    # saturating at 255. Unlike a NumPy scatter, overlapping squares add up.
+    width, height = pixels.shape[0], pixels.shape[1]
+    for i in range(len(x)):
+        x0, y0 = int(x[i]), int(y[i])
+        for px in range(max(0, x0), min(width, x0 + size)):
+            for py in range(max(0, y0), min(height, y0 + size)):
+                for c in range(3):
+                    value = pixels[px, py, c] + colors[i, c]
+                    pixels[px, py, c] = 255 if value >= 255 else int(value)
+
+
+def warm_up(pixels):
+    # Compiles (or loads from the cache) every kernel for the argument types
+    # the renderer uses, before the first frame. pixels is a pixels3d array
+    # of a small scratch surface; it is drawn over.
+    points = np.array([1.0, 3.0])
+    polyline(pixels, points, points, points, np.ones((2, 3)))
+    glow = np.ones((2, 2, 3), dtype=np.float32)
+    add_scaled(pixels, 0, 0, glow[:1, :1], 2)
+    particles = np.ones(1, dtype=np.float32)
+    splat_add(pixels, particles, particles, np.ones((1, 3), dtype=np.float32), 1)
@@ -0,0 +1,222 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from scipy.io import wavfile
+
+from analysis import resample
+
+
+# === Track Features ===
+# A compact description of a whole track, for finding similar ones:
+# tempo, spectral centroid and rolloff (mean and spread), loudness (mean
+# and spread) and the share of energy in each of BAND_EDGES' bands. Tracks
+# are analyzed in mono at FEATURE_RATE with a plain STFT, a chunk of frames
+# at a time so long files do not need the whole spectrogram in memory.
+FEATURE_RATE = 22050
+FEATURE_FFT = 2048
+FEATURE_HOP = 512
+CHUNK_FRAMES = 1024
+BAND_EDGES = [40, 120, 250, 500, 1000, 2000, 4000, 8000, FEATURE_RATE / 2]  # Hz
+SILENCE_DB = -60  # Frames quieter than this are left out of the centroid and rolloff
+FEATURES = ['tempo', 'centroid', 'centroid_std', 'rolloff', 'rolloff_std', 'loudness', 'loudness_std'] + \
+           [f'band_{lo:.0f}' for lo in BAND_EDGES[:-1]]
+
+# Distance weights: each group counts the same in total, however many
+# values it has
+GROUPS = {'tempo': ['tempo'], 'timbre': ['centroid', 'centroid_std', 'rolloff', 'rolloff_std'],
+          'loudness': ['loudness', 'loudness_std'], 'bands': [f for f in FEATURES if f.startswith('band_')]}
+WEIGHTS = np.array([1 / len(group) for name in FEATURES for group in GROUPS.values() if name in group])
+
+def track_features(filename):
+    # Feature vector (float32, in FEATURES order) of a .wav file
+    file_rate, data = wavfile.read(filename)
+    if data.ndim > 1:
+        data = data.mean(axis=1)
+    data = data.astype(np.float64)
+    data, rate = resample(data, file_rate, FEATURE_RATE)
+    peak = np.max(np.abs(data)) if len(data) else 0
+    if peak > 0:
+        data = data / peak
+    if len(data) < FEATURE_FFT:
+        data = np.pad(data, (0, FEATURE_FFT - len(data)))
+
+    freqs = np.fft.rfftfreq(FEATURE_FFT, 1 / rate)
+    window = np.hanning(FEATURE_FFT)
+    band_starts = np.searchsorted(freqs, BAND_EDGES[:-1])
+    frames = np.lib.stride_tricks.sliding_window_view(data, FEATURE_FFT)[::FEATURE_HOP]
+    centroid, rolloff, loudness, flux = [], [], [], []
+    bands = np.zeros(len(band_starts))
+    previous = None
+    for start in range(0, len(frames), CHUNK_FRAMES):
+        chunk = frames[start:start + CHUNK_FRAMES]
+        magnitude = np.abs(np.fft.rfft(chunk * window, axis=1))
+        power = magnitude ** 2
+        total = power.sum(axis=1)
+        rms = np.sqrt(np.mean(chunk ** 2, axis=1))
+        loudness.append(20 * np.log10(rms + 1e-9))
+        audible = loudness[-1] > SILENCE_DB
+        centroid.append((magnitude @ freqs / np.maximum(magnitude.sum(axis=1), 1e-12))[audible])
+        cumulative = np.cumsum(power, axis=1)
+        rolloff.append(freqs[np.argmax(cumulative >= 0.85 * total[:, None], axis=1)][audible])
+        bands += np.add.reduceat(power, band_starts, axis=1).sum(axis=0)
+        # Onset strength: rise in log magnitude summed over bins
+        log_magnitude = np.log1p(magnitude)
+        if previous is not None:
+            log_magnitude = np.vstack([previous, log_magnitude])
+        flux.append(np.maximum(np.diff(log_magnitude, axis=0), 0).sum(axis=1))
+        previous = log_magnitude[-1:]
+
+    centroid, rolloff, loudness = np.concatenate(centroid), np.concatenate(rolloff), np.concatenate(loudness)
+    if len(centroid) == 0:  # Silent track
+        centroid = rolloff = np.zeros(1)
+    bands = bands / max(bands.sum(), 1e-12)
+    return np.array([estimate_tempo(np.concatenate(flux), rate / FEATURE_HOP),
+                     centroid.mean(), centroid.std(), rolloff.mean(), rolloff.std(),
+                     loudness.mean(), loudness.std(), *bands], dtype=np.float32)
+
+def estimate_tempo(onsets, frame_rate, low=60, high=180):
+    # Beats per minute from the autocorrelation of the onset strength, with a
+    # mild preference for tempos near 120 to avoid halving and doubling
+    if len(onsets) < 4:
+        return 0.0
+    onsets = onsets - onsets.mean()
+    n = 1 << (2 * len(onsets) - 1).bit_length()
+    spectrum = np.fft.rfft(onsets, n)
+    correlation = np.fft.irfft(spectrum * np.conj(spectrum), n)[:len(onsets)]
+    lags = np.arange(max(1, int(60 * frame_rate / high)), min(len(onsets), int(60 * frame_rate / low) + 1))
+    if len(lags) == 0 or correlation[0] <= 0:
+        return 0.0
+    bpm = 60 * frame_rate / lags
+    score = correlation[lags] * np.exp(-0.5 * (np.log2(bpm / 120) / 1.0) ** 2)
+    return float(bpm[np.argmax(score)])
+
+
+# === Library Index ===
+# Feature vectors for every track in the library, kept on disk (.npz) with
+# each file's size and modification time, so a rescan only analyzes new and
+# changed files. Analysis runs in a process pool ('spawn', like the analysis
+# process) across all cores. Lookups compare a track with every other one in
+# a single array operation over standardized features; for a library of
+# thousands of tracks that takes well under a millisecond.
+INDEX_VERSION = 1
+
+class LibraryIndex:
+    def __init__(self, path):
+        self.path = path
+        self.scanned = 0  # Files analyzed by the running or last update()
+        self.pending = 0  # Files the running update() has left to analyze
+        self._set([], [], [], np.zeros((0, len(FEATURES)), dtype=np.float32))
+        self.load()
+
+    def _set(self, paths, mtimes, sizes, features):
+        # Replaced as one value, so a lookup on another thread never sees a
+        # half-updated index
+        features = np.asarray(features, dtype=np.float32)
+        self._data = (list(paths), np.asarray(mtimes, dtype=np.float64), np.asarray(sizes, dtype=np.int64), features)
+        scaled = scale_features(features)
+        self._lookup = (list(paths), {path: i for i, path in enumerate(paths)}, scaled, np.sum(scaled ** 2, axis=1), features)
+
+    def __len__(self):
+        return len(self._data[0])
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as index:
+                if int(index['version']) != INDEX_VERSION or list(index['feature_names']) != FEATURES:
+                    return  # Older layout: everything is analyzed again
+                self._set(index['paths'].tolist(), index['mtimes'], index['sizes'], index['features'])
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Failed to load library index: {e}")
+
+    def save(self):
+        paths, mtimes, sizes, features = self._data
+        temporary = self.path + '.tmp.npz'
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        np.savez(temporary, version=INDEX_VERSION, feature_names=np.array(FEATURES), paths=np.array(paths, dtype=str),
+                 mtimes=mtimes, sizes=sizes, features=features)
+        os.replace(temporary, self.path)
+
+    def update(self, filenames, workers=None, cancel=None):
+        # Brings the index in line with filenames: analyzes new and changed
+        # files in parallel and drops files no longer listed. Saves the index
+        # when anything changed. cancel (a threading.Event) stops it early,
+        # keeping what was analyzed so far. Returns the number analyzed.
+        paths, mtimes, sizes, features = self._data
+        known = {path: i for i, path in enumerate(paths)}
+        keep, todo = {}, []
+        for filename in (os.path.abspath(f) for f in filenames):
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            i = known.get(filename)
+            if i is not None and mtimes[i] == stat.st_mtime and sizes[i] == stat.st_size:
+                keep[filename] = (stat.st_mtime, stat.st_size, features[i])
+            else:
+                todo.append((filename, stat.st_mtime, stat.st_size))
+        changed = len(keep) != len(paths)
+        self.scanned, self.pending = 0, len(todo)
+        if todo:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                jobs = {pool.submit(track_features, filename): (filename, mtime, size) for filename, mtime, size in todo}
+                for job in as_completed(jobs):
+                    filename, mtime, size = jobs[job]
+                    self.pending -= 1
+                    try:
+                        keep[filename] = (mtime, size, job.result())
+                        self.scanned += 1
+                        changed = True
+                    except Exception as e:
+                        print(f"Failed to analyze {os.path.basename(filename)}: {e}")
+                    if cancel is not None and cancel.is_set():
+                        pool.shutdown(wait=True, cancel_futures=True)
+                        break
+        if changed:
+            entries = sorted(keep.items())
+            self._set([path for path, _ in entries], [entry[0] for _, entry in entries],
+                      [entry[1] for _, entry in entries],
+                      np.array([entry[2] for _, entry in entries], dtype=np.float32).reshape(-1, len(FEATURES)))
+            self.save()
+        return self.scanned
+
+    def features(self, filename):
+        _, positions, _, _, features = self._lookup
+        i = positions.get(os.path.abspath(filename))
+        return None if i is None else features[i]
+
+    def similar(self, filename, count=10):
+        # Up to count indexed tracks closest to filename, nearest first,
+        # leaving out filename itself and files that have since been
+        # deleted. Returns [] when filename is not indexed.
+        paths, positions, scaled, norms, _ = self._lookup
+        query = positions.get(os.path.abspath(filename))
+        if query is None:
+            return []
+        distance = norms - 2 * (scaled @ scaled[query])  # Squared distance, less the query's own norm
+        distance[query] = np.inf
+        # The nearest few first; all of them only if too many were deleted
+        for candidates in (2 * count, len(paths) - 1):
+            candidates = min(candidates, len(paths) - 1)
+            if candidates <= 0:
+                return []
+            nearest = np.argpartition(distance, candidates - 1)[:candidates]
+            found = [paths[i] for i in nearest[np.argsort(distance[nearest])] if os.path.exists(paths[i])]
+            if len(found) >= count or candidates == len(paths) - 1:
+                return found[:count]
+
+
+def scale_features(features):
+    # Standardized so every feature is in units of its spread over the
+    # library (tempo on a log scale), then weighted per group, so plain
+    # Euclidean distance compares tracks
+    values = features.astype(np.float64)
+    if len(values) == 0:
+        return values
+    values[:, 0] = np.log2(np.maximum(values[:, 0], 1))
+    spread = values.std(axis=0)
+    return (values - values.mean(axis=0)) / np.where(spread > 0, spread, 1) * np.sqrt(WEIGHTS)
@@ -0,0 +1,209 @@
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from analysis import DISPLAY_MAX_HZ
+
+
+# === Mood Features ===
+# Timbre and harmony of the music, updated once per analysis frame from the
+# display spectrum that was already computed for the renderer, so no extra
+# FFT and no added latency:
+#   centroid   spectral centroid in Hz
+#   flatness   geometric over arithmetic mean of the power spectrum, 0 (tonal) to 1 (noise)
+#   level      block RMS of the input in dB (full scale = 0). The display
+#              spectrum is normalized per frame, so loudness comes from the
+#              block RMS the analysis measures anyway (see note_level)
+#   chroma     energy per pitch class, C to B, summing to 1
+# and, derived from those for the renderer, each 0 to 1:
+#   energy     level against the recent peak level
+#   brightness centroid on a log scale from BRIGHTNESS_HZ[0] to [1]
+#   key        position of the chroma on the circle of fifths (C = 0, G = 1/12, ...)
+#   tonality   how strongly the chroma points at that key
+@dataclass(frozen=True)
+class Mood:
+    centroid: float = 1000.0
+    flatness: float = 0.5
+    level: float = -100.0
+    chroma: tuple = (1 / 12,) * 12
+    energy: float = 0.0
+    brightness: float = 0.5
+    key: float = 0.0
+    tonality: float = 0.0
+
+
+CHROMA_HZ = (200, 5000)      # Bins below are too coarse for pitch classes, above is mostly overtones and noise
+BRIGHTNESS_HZ = (500, 8000)
+LEVEL_RANGE_DB = 30          # Energy is 0 this far below the peak level
+PEAK_RELEASE_DB = 1.0        # dB per second the peak level falls back after loud passages
+QUIET_DB = -60               # The peak level never falls below QUIET_DB + LEVEL_RANGE_DB
+ENERGY_SECONDS = 0.3         # Smoothing time constants
+TIMBRE_SECONDS = 1.0
+KEY_SECONDS = 4.0
+FIFTHS = np.exp(2j * np.pi * ((np.arange(12) * 7) % 12) / 12)  # Pitch class -> point on the circle of fifths
+
+
+# === Mood Tracker ===
+# Subscribed to the frame bus as a listener, so update() runs on whichever
+# thread publishes frames. Each step is a few whole-array operations over
+# the bins, into buffers allocated once per bin count (only the arrays for
+# the spectral peaks are new each frame). The result is replaced as one Mood
+# value, so the renderer can read mood at any time without a lock.
+class MoodTracker:
+    def __init__(self):
+        self.mood = Mood()
+        self.level = 0.0  # Latest block RMS, set by the analysis before each frame is published
+        self.bins = 0
+        self._time = None
+        self._peak = QUIET_DB + LEVEL_RANGE_DB
+        self._chroma = np.full(12, 1 / 12)
+
+    def _setup(self, bins):
+        self.bins = bins
+        self.bin_hz = DISPLAY_MAX_HZ / bins
+        self.freqs = (np.arange(bins) * self.bin_hz).astype(np.float32)  # Display bin i holds FFT bin i at the reference size
+        # Bins searched for peaks, with one neighbour on each side
+        self.chroma_lo = min(bins - 2, max(1, int(CHROMA_HZ[0] / self.bin_hz)))
+        self.chroma_hi = max(self.chroma_lo + 1, min(bins - 1, int(math.ceil(CHROMA_HZ[1] / self.bin_hz))))
+        band = np.arange(self.chroma_lo, self.chroma_hi)
+        self.chroma_bins = band.astype(np.float32)
+        self._power = np.empty(bins, dtype=np.float32)
+        self._work = np.empty(bins, dtype=np.float32)
+        self._peak_mask = np.empty(len(band), dtype=bool)
+        self._other_mask = np.empty(len(band), dtype=bool)
+        self._pitch = np.empty(len(band), dtype=np.float32)
+        self._weight = np.empty(len(band), dtype=np.float32)
+        self._pitch_class = np.empty(len(band), dtype=np.intp)
+
+    def reset(self):
+        self.mood = Mood()
+        self._time = None
+        self._peak = QUIET_DB + LEVEL_RANGE_DB
+        self._chroma[:] = 1 / 12
+
+    def on_frame(self, frame):
+        # FrameBus listener
+        self.update(frame.spectrum, self.level, frame.timestamp)
+
+    def update(self, spectrum, level, timestamp):
+        # spectrum: one display spectrum (mono); level: block RMS of the input
+        # (full scale = 1); timestamp: seconds, for the smoothing
+        if len(spectrum) != self.bins:
+            self._setup(len(spectrum))
+        dt = 1e9 if self._time is None else min(1.0, max(0.0, timestamp - self._time))
+        self._time = timestamp
+        mood = self.mood
+
+        # Loudness: against a peak that falls back slowly, so the energy
+        # follows the music whatever the input gain
+        level_db = 20 * math.log10(max(level, 1e-5))
+        self._peak = max(level_db, self._peak - PEAK_RELEASE_DB * min(dt, 1.0), QUIET_DB + LEVEL_RANGE_DB)
+        energy = min(1.0, max(0.0, 1 + (level_db - self._peak) / LEVEL_RANGE_DB))
+        energy = smooth(mood.energy, energy, dt, ENERGY_SECONDS)
+
+        # Timbre, from the squared spectrum: the display spectrum is log
+        # compressed, which lifts the noise floor of the many high bins
+        # enough to swamp both measures
+        power = np.multiply(spectrum, spectrum, out=self._power)
+        total = float(np.sum(power))
+        if total <= 1e-12:  # Silence: the timbre and key stay where they were
+            self.mood = Mood(mood.centroid, mood.flatness, level_db, mood.chroma, energy, mood.brightness,
+                             mood.key, mood.tonality)
+            return self.mood
+        centroid = float(np.dot(power, self.freqs)) / total
+        np.add(power, 1e-9, out=self._work)
+        np.log(self._work, out=self._work)
+        flatness = min(1.0, math.exp(float(np.mean(self._work))) / (total / len(spectrum) + 1e-9))
+        centroid = smooth(mood.centroid, centroid, dt, TIMBRE_SECONDS)
+        flatness = smooth(mood.flatness, flatness, dt, TIMBRE_SECONDS)
+        low, high = BRIGHTNESS_HZ
+        brightness = min(1.0, max(0.0, math.log2(max(centroid, 1) / low) / math.log2(high / low)))
+
+        # Harmony: power per pitch class, smoothed over KEY_SECONDS. Bins are
+        # tens of Hz wide, several semitones at the bottom of the range, so
+        # only spectral peaks count, each at the frequency a parabola through
+        # it and its neighbours puts it
+        lo, hi = self.chroma_lo, self.chroma_hi
+        left, middle, right = spectrum[lo - 1:hi - 1], spectrum[lo:hi], spectrum[lo + 1:hi + 1]
+        peak, other, pitch, weight = self._peak_mask, self._other_mask, self._pitch, self._weight
+        np.greater(middle, left, out=peak)
+        np.greater_equal(middle, right, out=other)
+        peak &= other
+        np.add(left, right, out=pitch)          # Curvature, negative at a peak
+        pitch -= middle
+        pitch -= middle
+        np.minimum(pitch, -1e-9, out=pitch)
+        np.subtract(left, right, out=weight)
+        weight *= 0.5
+        np.divide(weight, pitch, out=pitch)     # Peak offset from the bin, -0.5 to 0.5 at peaks
+        np.minimum(pitch, 0.5, out=pitch)
+        np.maximum(pitch, -0.5, out=pitch)
+        pitch += self.chroma_bins
+        pitch *= self.bin_hz / 440
+        np.log2(pitch, out=pitch)
+        pitch *= 12
+        pitch += 69                             # MIDI note, C = 0 in pitch classes
+        np.rint(pitch, out=pitch)
+        np.remainder(pitch, 12, out=pitch)
+        np.copyto(self._pitch_class, pitch, casting='unsafe')
+        np.multiply(middle, middle, out=weight)
+        weight *= peak
+        frame_chroma = np.bincount(self._pitch_class, weights=weight, minlength=12)
+        frame_total = float(np.sum(frame_chroma))
+        if frame_total > 0:
+            frame_chroma /= frame_total
+            frame_chroma -= self._chroma
+            frame_chroma *= 1 - math.exp(-dt / KEY_SECONDS)
+            self._chroma += frame_chroma
+        fifths = complex(np.dot(self._chroma, FIFTHS))
+        key = (math.atan2(fifths.imag, fifths.real) / (2 * math.pi)) % 1.0
+
+        self.mood = Mood(centroid, flatness, level_db, tuple(self._chroma.tolist()), energy, brightness,
+                         key, min(1.0, abs(fifths)))
+        return self.mood
+
+
+def smooth(previous, value, dt, seconds):
+    # One step of an exponential moving average with time constant seconds
+    return previous + (1 - math.exp(-dt / seconds)) * (value - previous)
+
+
+# === Mood Palette ===
+# The configured palette moved along with the music: rotated to the key (one
+# palette step per move on the circle of fifths, spread over the palette),
+# dimmed when the music is quiet and washed out toward grey when it is noisy.
+# Amounts are rounded to STEPS so the per-point color caches are only rebuilt
+# when the palette visibly changes, not on every frame.
+STEPS = 32
+
+def mood_palette(palette, mood):
+    colors = np.array(palette, dtype=float)
+    n = len(colors)
+    position = np.arange(n) + round(mood.key * STEPS) / STEPS * n
+    index = np.floor(position).astype(int)
+    t = (position - index)[:, None]
+    colors = colors[index % n] * (1 - t) + colors[(index + 1) % n] * t
+    value = 0.55 + 0.45 * round(mood.energy * STEPS) / STEPS
+    wash = 0.6 * round(min(1.0, max(0.0, (mood.flatness - 0.3) / 0.5)) * STEPS) / STEPS
+    grey = colors.mean(axis=1, keepdims=True)
+    colors = (colors + (grey - colors) * wash) * value
+    return [tuple(int(c) for c in color) for color in colors]
+
+
+# === Mood Shapes ===
+# Shapes that set mood = (energy, brightness) can be chosen automatically:
+# the one closest to the music's mood wins, once it is closer than the
+# current shape by more than margin, so the choice does not flicker between
+# two shapes the mood sits between. Returns the new mode number, or current.
+def mood_shape(shapes, mood, current, margin=0.1):
+    def distance(i):
+        target = shapes[i].mood
+        if target is None:
+            return math.inf
+        return math.hypot(target[0] - mood.energy, target[1] - mood.brightness)
+
+    best = min(range(len(shapes)), key=distance)
+    if distance(best) == math.inf or distance(best) + margin >= distance(current):
+        return current
+    return best
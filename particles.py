@@ -0,0 +1,116 @@
+import numpy as np
+
+import kernels
+
+
+# === Particle System ===
+# Beat bursts and sparks thrown off loud points of the shape. State is kept
+# as structure-of-arrays with a fixed capacity: one NumPy array per field,
+# indexed by particle slot. Dead slots go back on a free list (a stack of
+# slot indices), so emitting never grows an array and never scans for room.
+# update() and splat() work on whole arrays at once; nothing loops per
+# particle in Python.
+class ParticleSystem:
+    def __init__(self, capacity=16384, seed=0):
+        self.capacity = capacity
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.float32)      # Seconds left
+        self.max_life = np.ones(capacity, dtype=np.float32)
+        self.color = np.zeros((capacity, 3), dtype=np.float32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self._free = np.arange(capacity - 1, -1, -1, dtype=np.int32)  # Free slots; the top is at _free_count - 1
+        self._free_count = capacity
+        self.rng = np.random.default_rng(seed)
+        self.drag = 1.5      # Velocity lost per second, as a fraction
+        self.gravity = 60.0  # Pixels per second squared, before scale
+
+    @property
+    def count(self):
+        return self.capacity - self._free_count
+
+    def emit(self, x, y, vx, vy, life, color):
+        # Arrays of equal length (color is (n, 3)); particles beyond the free
+        # capacity are dropped. Returns the number emitted.
+        n = min(len(x), self._free_count)
+        if n == 0:
+            return 0
+        slots = self._free[self._free_count - n:self._free_count]
+        self._free_count -= n
+        self.x[slots] = x[:n]
+        self.y[slots] = y[:n]
+        self.vx[slots] = vx[:n]
+        self.vy[slots] = vy[:n]
+        self.life[slots] = life[:n]
+        self.max_life[slots] = life[:n]
+        self.color[slots] = color[:n]
+        self.alive[slots] = True
+        return n
+
+    def burst(self, cx, cy, n, speed, palette_colors, life=(0.6, 1.6)):
+        # n particles from one point in random directions, colored from palette_colors
+        angle = self.rng.uniform(0, 2 * np.pi, n)
+        v = self.rng.uniform(0.3, 1.0, n) * speed
+        colors = np.asarray(palette_colors, dtype=np.float32)[self.rng.integers(0, len(palette_colors), n)]
+        return self.emit(np.full(n, cx), np.full(n, cy), np.cos(angle) * v, np.sin(angle) * v,
+                         self.rng.uniform(*life, n), colors)
+
+    def sparks(self, x, y, amplitude, colors, cx, cy, rate, threshold, speed, life=(0.3, 0.9)):
+        # Points louder than threshold throw off particles away from (cx, cy),
+        # each with a chance of rate * (amplitude - threshold) this frame
+        chance = (amplitude - threshold) * rate
+        picked = np.flatnonzero(self.rng.random(len(amplitude)) < chance)
+        if len(picked) == 0:
+            return 0
+        dx, dy = x[picked] - cx, y[picked] - cy
+        norm = np.maximum(np.hypot(dx, dy), 1e-3)
+        v = speed * (0.5 + amplitude[picked])
+        return self.emit(x[picked], y[picked], dx / norm * v, dy / norm * v,
+                         self.rng.uniform(*life, len(picked)), colors[picked])
+
+    def update(self, dt, width, height, scale=1.0):
+        # Moves every live particle and frees the ones that expired or left
+        # the (width, height) area
+        alive = self.alive
+        self.life -= dt
+        self.vx *= max(0.0, 1 - self.drag * dt)
+        self.vy *= max(0.0, 1 - self.drag * dt)
+        self.vy += self.gravity * scale * dt
+        self.x += self.vx * dt
+        self.y += self.vy * dt
+        dead = alive & ((self.life <= 0) | (self.x < 0) | (self.x >= width) | (self.y < 0) | (self.y >= height))
+        freed = np.flatnonzero(dead)
+        if len(freed):
+            alive[freed] = False
+            self._free[self._free_count:self._free_count + len(freed)] = freed
+            self._free_count += len(freed)
+
+    def splat(self, pixels, size=1, accelerated=False):
+        # Adds every live particle to pixels (a surfarray.pixels3d array,
+        # indexed [x, y, rgb]) as a size x size square, fading with age and
+        # saturating at white. Overlapping particles in one batch take the
+        # last write rather than adding up, except with accelerated, which
+        # uses kernels.splat_add (Numba).
+        slots = np.flatnonzero(self.alive)
+        if len(slots) == 0:
+            return
+        width, height = pixels.shape[:2]
+        fade = (self.life[slots] / self.max_life[slots])[:, None]
+        color = self.color[slots] * fade
+        if accelerated:
+            kernels.splat_add(pixels, self.x[slots], self.y[slots], color, size)
+            return
+        px = self.x[slots].astype(np.intp)
+        py = self.y[slots].astype(np.intp)
+        for ox in range(size):
+            for oy in range(size):
+                sx = np.minimum(px + ox, width - 1)
+                sy = np.minimum(py + oy, height - 1)
+                pixels[sx, sy] = np.minimum(pixels[sx, sy] + color, 255)
+
+    def clear(self):
+        self.alive[:] = False
+        self._free[:] = np.arange(self.capacity - 1, -1, -1, dtype=np.int32)
+        self._free_count = self.capacity
@@ -0,0 +1,168 @@
+import numpy as np
+
+from analysis import ChannelLayout, SmoothingStage, SpectrumAnalyzer, derive_bin_constants, envelope_coefficient
+from fanout import FrameBus
+from sources import MicSource
+
+
+# Capture and analysis without pygame. Importing this module has no side
+# effects; sounddevice is only imported when a microphone is opened.
+
+MIC_BEAT_THRESHOLD = 0.65  # Mean low-bin energy that counts as a beat
+
+
+def create_analyzer(config, sample_rate, rows=1):
+    # Each analyzer owns its FFT plans (window, scratch buffers, filterbank),
+    # so build one per stream and reuse it for every frame
+    return SpectrumAnalyzer(
+        sample_rate,
+        fft_size=config.fft_size,
+        display_bins=config.display_bins,
+        bass_fft_size=config.bass_fft_size if config.multi_resolution else None,
+        crossover_hz=config.crossover_hz,
+        rows=rows,
+    )
+
+def create_envelope(config, bins, rows, frame_seconds):
+    # Display envelope from the config (attack/release, peak hold, extra
+    # spatial smoothing), or None when every part of it is off
+    if not (config.attack_ms or config.release_ms or config.peak_hold_ms or config.smooth_width > 1):
+        return None
+    hold_frames = int(round(config.peak_hold_ms / 1000 / frame_seconds))
+    return SmoothingStage(bins, rows, width=config.smooth_width,
+                          attack=envelope_coefficient(config.attack_ms, frame_seconds),
+                          release=envelope_coefficient(config.release_ms, frame_seconds),
+                          hold_frames=hold_frames,
+                          falloff=config.peak_falloff * frame_seconds if config.peak_hold_ms else 0.0)
+
+def input_channels(config):
+    # Channels to open on the input device for the configured layout
+    return 1 if config.channel_mode == 'mono' else 2
+
+
+# === Mic Analysis ===
+# Per-block processing for live input: compress, normalize, smooth across
+# bins and over time. All rows of the channel layout are processed together
+# and normalized against one peak, so left/right balance is kept. Beats are
+# detected before the optional display envelope, so peak hold or a slow
+# release never delays them.
+# process() returns (mono spectrum, per-channel spectra or None, bass energy).
+class MicAnalysis:
+    def __init__(self, analyzer, bass_energy_bins, layout=None, alpha=0.9, envelope=None):
+        self.analyzer = analyzer
+        self.layout = layout if layout is not None else ChannelLayout('mono', 1)
+        self.bass_energy_bins = bass_energy_bins
+        self.alpha = alpha  # Higher = smoother & slower
+        lead = (self.layout.rows,) if self.layout.rows > 1 else ()
+        self._work = np.zeros(lead + (analyzer.display_bins,))
+        self.smoothing = SmoothingStage(analyzer.display_bins, self.layout.rows, width=3,
+                                        attack=1 - alpha, release=1 - alpha)
+        self.envelope = envelope
+        self._samples = self._mixed = None
+
+    def process(self, indata):
+        if self._samples is None or self._samples.shape != indata.shape:  # Sized by the block, set by the source
+            self._samples = np.zeros(indata.shape)
+            self._mixed = np.zeros((self.layout.rows, len(indata)))
+        np.copyto(self._samples, indata)                # float32 input would be cast in a temporary by the mix
+        rows = self.layout.mix(self._samples, out=self._mixed)  # (frames, channels) -> analysis rows
+        if self.layout.rows == 1:
+            rows = rows[0]
+        fft_result = self.analyzer.push(rows)           # Keeps the last fft_size samples
+        np.log1p(fft_result, out=self._work)            # Compress peaks
+        self._work[..., 0] = 0                          # Suppress DC/low freq
+        self._work /= np.max(self._work) + 1e-6
+
+        smoothed = self.smoothing.process(self._work)
+        layout = self.layout
+        bass_energy = np.mean((smoothed[layout.mono_row] if layout.rows > 1 else smoothed)[:self.bass_energy_bins])
+        if self.envelope is not None:
+            smoothed = self.envelope.process(smoothed)
+
+        if layout.rows == 1:
+            return smoothed, None, bass_energy
+        return smoothed[layout.mono_row], smoothed[layout.channel_slice], bass_energy
+
+
+# === File Analysis ===
+# Per-frame processing for a decoded track at any sample position: fade in
+# the lowest bins, compress, normalize all rows against one peak, smooth.
+# Kept across tracks while the layout and bins match; reset() starts the
+# smoothing over. The analyzer belongs to the track and is passed per frame.
+# process() returns (mono spectrum, per-channel spectra or None, bass energy),
+# the bass energy taken before the display envelope like in MicAnalysis.
+class FileAnalysis:
+    def __init__(self, display_bins, fade_bins, bass_bin, layout, envelope=None):
+        self.layout = layout
+        self.bass_bin = bass_bin
+        lead = (layout.rows,) if layout.rows > 1 else ()
+        fade = np.power(np.linspace(0.0, 1.0, fade_bins), 3)  # Lowest bins scaled from 0 to 1
+        self.fade = np.broadcast_to(fade, lead + (fade_bins,)).copy()  # One per row, so the multiply does not broadcast
+        self._work = np.zeros(lead + (display_bins,))
+        self.smoothing = SmoothingStage(display_bins, layout.rows, width=2)
+        self.envelope = envelope
+
+    def reset(self):
+        for stage in (self.smoothing, self.envelope):
+            if stage is not None:
+                stage.reset()
+
+    def process(self, analyzer, data, end):
+        spectrum = analyzer.analyze_at(data, end)
+        spectrum[..., :self.fade.shape[-1]] *= self.fade
+        np.log1p(spectrum, out=self._work)               # Compress dynamic range
+        self._work /= np.max(self._work) + 1e-6          # One peak for all rows keeps the balance
+        self._work *= 0.3
+
+        smoothed = self.smoothing.process(self._work)
+        shaped = self.envelope.process(smoothed) if self.envelope is not None else smoothed  # What is drawn
+        layout = self.layout
+        if layout.rows == 1:
+            return shaped, None, float(smoothed[self.bass_bin])
+        return shaped[layout.mono_row], shaped[layout.channel_slice], float(smoothed[layout.mono_row, self.bass_bin])
+
+
+# === Mic Pipeline ===
+# Analyzes a live source (the microphone unless another source from
+# sources.py is given) and publishes one frame per block to a FrameBus.
+# The beat pulse decays per block at the same rate the visualizer decays it
+# per frame at 60 fps, so headless consumers see the same envelope.
+class MicPipeline:
+    def __init__(self, config, frame_bus=None, sample_rate=None, device=None, source=None, on_block=None):
+        self.config = config
+        self.frame_bus = frame_bus if frame_bus is not None else FrameBus()
+        self.sample_rate = source.sample_rate if source is not None else sample_rate or config.mic_sample_rate
+        self.device = device
+        self.analysis = None
+        self.beat_pulse = 0.0
+        self.beat_decay = 0.92 ** (60 * config.hop_size / self.sample_rate)
+        self.source = source
+        self.on_block = on_block  # Called with each raw input block, e.g. to record it
+
+    def callback(self, indata, frames, time_info, status):
+        if status:
+            print(status)
+        if self.on_block is not None:
+            self.on_block(indata)
+        spectrum, channels, bass_energy = self.analysis.process(indata)
+
+        self.beat_pulse *= self.beat_decay
+        if bass_energy > MIC_BEAT_THRESHOLD and self.beat_pulse < 0.2:
+            self.beat_pulse = 1.0
+        self.frame_bus.publish(spectrum, self.beat_pulse, channels=channels,
+                               sample_time=time_info.inputBufferAdcTime + frames / self.sample_rate)
+
+    def start(self):
+        if self.source is None:
+            self.source = MicSource(self.sample_rate, input_channels(self.config), self.config.hop_size, self.device)
+        _, _, bass_energy_bins = derive_bin_constants(self.config.display_bins)
+        layout = ChannelLayout(self.config.channel_mode, self.source.channels)
+        envelope = create_envelope(self.config, self.config.display_bins, layout.rows, self.config.hop_size / self.sample_rate)
+        self.analysis = MicAnalysis(create_analyzer(self.config, self.sample_rate, layout.rows), bass_energy_bins,
+                                    layout, envelope=envelope)
+        self.source.start(self.callback)
+
+    def stop(self):
+        if self.source is not None and self.source.callback is not None:
+            self.source.stop()
+            self.source = None
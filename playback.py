@@ -0,0 +1,189 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pygame
+from scipy.io import wavfile
+
+from analysis import ChannelLayout, resample
+from pipeline import create_analyzer
+
+
+# === Transport ===
+# File playback position, taken from the mixer clock rather than counted by
+# the analysis thread. pygame.mixer.music.get_pos() returns milliseconds since
+# the last play() call, so the position is the offset play() started from
+# plus get_pos(). Seeking restarts the music at the new offset; analysis
+# then computes the single frame at that position (see frame_end).
+class Transport:
+    def __init__(self, sample_rate, total_samples):
+        self.sample_rate = sample_rate
+        self.total_samples = total_samples
+        self.duration = total_samples / sample_rate
+        self.offset = 0.0
+        self.paused = False
+        self.scrub_position = None  # Set while the scrub bar is being dragged
+
+    def play(self, seconds=0.0):
+        self.offset = min(max(0.0, seconds), self.duration)
+        pygame.mixer.music.play(start=self.offset)
+        if self.paused:
+            pygame.mixer.music.pause()
+
+    def position(self):
+        # Seconds into the track
+        if self.scrub_position is not None:
+            return self.scrub_position
+        if self.paused:
+            return self.offset
+        return min(self.duration, self.offset + max(0, pygame.mixer.music.get_pos()) / 1000)
+
+    def seek(self, seconds):
+        if self.paused:
+            # Restarted on resume; the visuals follow position() straight away
+            self.offset = min(max(0.0, seconds), self.duration)
+        else:
+            self.play(seconds)
+
+    def skip(self, seconds):
+        self.seek(self.position() + seconds)
+
+    def toggle_pause(self):
+        if self.paused:
+            self.paused = False
+            self.play(self.offset)
+        else:
+            self.offset = self.position()
+            self.paused = True
+            pygame.mixer.music.pause()
+
+    def scrub(self, fraction):
+        # Dragging moves the visuals only; release() seeks the audio once
+        self.scrub_position = min(max(0.0, fraction), 1.0) * self.duration
+
+    def release(self):
+        if self.scrub_position is not None:
+            seconds, self.scrub_position = self.scrub_position, None
+            self.seek(seconds)
+
+    def finished(self):
+        # get_busy() is also False while paused
+        return not self.paused and self.scrub_position is None and not pygame.mixer.music.get_busy()
+
+    def frame_end(self, hop_size, fft_size):
+        # Frame index for the current position and the sample its FFT window
+        # ends at; the analysis grid is every hop_size samples from the start
+        index = int(self.position() * self.sample_rate) // hop_size
+        return index, min(self.total_samples, index * hop_size + fft_size)
+
+
+# === Tracks ===
+# A decoded file, mixed into analysis rows and normalized, with its own
+# analyzer. Building one is the slow part of starting a track, so the
+# playlist does it for the next track while the current one plays.
+class Track:
+    def __init__(self, filename, file_rate, sample_rate, data, layout, analyzer):
+        self.filename = filename
+        self.name = os.path.splitext(os.path.basename(filename))[0]
+        self.file_rate = file_rate
+        self.sample_rate = sample_rate  # Rate of data, after resampling
+        self.data = data  # (rows, samples), or 1-D for the mono layout
+        self.layout = layout
+        self.analyzer = analyzer
+        self.total_samples = data.shape[-1]
+
+def load_track(filename, config):
+    file_rate, data = wavfile.read(filename)
+    layout = ChannelLayout(config.channel_mode, data.shape[1] if data.ndim > 1 else 1)
+    data = layout.mix(data)
+    data, sample_rate = resample(data, file_rate, config.analysis_rate)
+    data = data / np.max(np.abs(data))
+    analyzer = create_analyzer(config, sample_rate, layout.rows)
+    analyzer.analyze_at(data, config.fft_size)  # First frame, so the plans are warm
+    return Track(filename, file_rate, sample_rate, data, layout, analyzer)
+
+
+# === Playlist ===
+# Plays tracks back to back. While one track plays, the next is loaded on a
+# worker thread and handed to pygame.mixer.music.queue(), so SDL_mixer starts
+# it the moment the current one ends. The mixer is initialised once: music
+# is resampled to the output rate, so tracks at other sample rates are queued
+# the same way. MUSIC_END is posted on every track change and at the end.
+MUSIC_END = pygame.USEREVENT + 1
+
+class Playlist:
+    def __init__(self, filenames, load):
+        self.filenames = filenames
+        self.load = load
+        self.index = -1
+        self.current = None  # (track, transport), replaced as one value on track change
+        self.queued = None   # (index, track) once the next track is loaded and queued in the mixer
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._next = None    # (index, future) being prefetched
+
+    def start(self):
+        # Returns False when no track could be loaded
+        pygame.mixer.music.set_endevent(MUSIC_END)
+        return self._play_from(0)
+
+    def _play_from(self, index):
+        while index < len(self.filenames):
+            try:
+                track = self._take(index)
+            except Exception as e:
+                print(f"Failed to load audio: {e}")
+                index += 1
+                continue
+            if not pygame.mixer.get_init():
+                pygame.mixer.init(frequency=track.file_rate)
+            pygame.mixer.music.load(track.filename)
+            transport = Transport(track.sample_rate, track.total_samples)
+            transport.play()
+            self._set_current(index, track, transport)
+            return True
+        return False
+
+    def _take(self, index):
+        # The prefetched track if it is the one wanted, else load it now
+        if self._next is not None and self._next[0] == index:
+            future, self._next = self._next[1], None
+            return future.result()
+        return self.load(self.filenames[index])
+
+    def _set_current(self, index, track, transport):
+        self.index = index
+        self.current = (track, transport)
+        self.queued = None
+        if index + 1 < len(self.filenames):
+            self._next = (index + 1, self._executor.submit(self.load, self.filenames[index + 1]))
+
+    def update(self):
+        # Called once per rendered frame: queues the next track once it is ready
+        if self.queued is not None or self._next is None or not self._next[1].done():
+            return
+        try:
+            track = self._next[1].result()
+        except Exception as e:
+            print(f"Failed to load audio: {e}")
+            index = self._next[0] + 1  # Skip it and prefetch the one after
+            self._next = (index, self._executor.submit(self.load, self.filenames[index])) if index < len(self.filenames) else None
+            return
+        pygame.mixer.music.queue(track.filename)
+        self.queued = (self._next[0], track)
+
+    def on_music_end(self):
+        # The mixer has either started the queued track or run out of music
+        if self.queued is not None:
+            (index, track), self._next = self.queued, None
+            self._set_current(index, track, Transport(track.sample_rate, track.total_samples))
+        elif not pygame.mixer.music.get_busy() and self._next is not None:
+            self._play_from(self._next[0])  # Next track was not ready in time
+
+    def stop(self):
+        pygame.mixer.music.set_endevent()
+        pygame.mixer.music.stop()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def format_time(seconds):
+    return f"{int(seconds) // 60}:{int(seconds) % 60:02d}"
@@ -0,0 +1,31 @@
+# Example shape plugin. Every .py file in this folder is loaded at startup
+# and its @register classes become new modes after the built-in ones (Space
+# cycles through them). A shape precomputes its outline in setup() and maps
+# the amplitudes to x/y arrays in place(); see shapes.py.
+import numpy as np
+
+from shapes import Shape, register
+
+
+@register
+class Spiral(Shape):
+    # Two turns outward from the center, bass inside and treble outside;
+    # loud points are pushed away from the center
+    name = 'spiral'
+    closed = False
+    mood = (0.2, 0.5)  # Quiet passages
+
+    def setup(self, assets):
+        angle = 2 * self.angle - np.pi / 2
+        self.cos, self.sin = np.cos(angle), np.sin(angle)
+        self.radius = np.empty(len(self.bands))
+        self.base = (20 + 160 * self.bands) * self.scale
+
+    def place(self, amplitudes):
+        np.multiply(amplitudes, 120 * self.scale, out=self.radius)
+        self.radius += self.base
+        np.multiply(self.radius, self.cos, out=self.x)
+        np.multiply(self.radius, self.sin, out=self.y)
+        self.x += self.center[0]
+        self.y += self.center[1]
+        return self.x, self.y
@@ -0,0 +1,210 @@
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+import wave
+from collections import deque
+
+import numpy as np
+import pygame
+
+
+# === Frame Pool ===
+# A fixed set of frame buffers allocated when recording starts. The render
+# loop only ever copies pixels into one of these; it never allocates and never
+# waits on the writer. If every buffer is still queued for writing, the oldest
+# queued frame is dropped and its buffer reused for the new one.
+class FramePool:
+    def __init__(self, size, count):
+        width, height = size
+        self.size = size
+        # Stored row-major (height, width, 3) so a buffer can be written to
+        # disk as-is; pygame is given the transposed (width, height, 3) view
+        self.buffers = [np.zeros((height, width, 3), dtype=np.uint8) for _ in range(count)]
+        self.free = deque(range(count))
+        self.pending = deque()  # (buffer index, timestamp) in capture order
+        self.dropped = 0
+        self.lock = threading.Condition()
+
+    def capture(self, surface, timestamp):
+        with self.lock:
+            if self.free:
+                index = self.free.popleft()
+            else:
+                index, _ = self.pending.popleft()
+                self.dropped += 1
+        pygame.pixelcopy.surface_to_array(self.buffers[index].transpose(1, 0, 2), surface)
+        with self.lock:
+            self.pending.append((index, timestamp))
+            self.lock.notify()
+
+    def take(self, timeout):
+        # Writer side: returns (index, timestamp) or None after timeout
+        with self.lock:
+            if not self.pending:
+                self.lock.wait(timeout)
+            if not self.pending:
+                return None
+            return self.pending.popleft()
+
+    def release(self, index):
+        with self.lock:
+            self.free.append(index)
+
+
+# === Recorder ===
+# Captures rendered frames (and mic audio, when given) to disk on a writer
+# thread. Video goes through ffmpeg when it is installed, otherwise frames are
+# dumped as raw RGB24 next to a JSON sidecar describing them. If a write
+# fails (ffmpeg exited, disk full) the recording stops there: error holds the
+# reason, and later frames and audio are ignored.
+class Recorder:
+    def __init__(self, directory, size, fps, pool_frames=32, sample_rate=44100):
+        os.makedirs(directory, exist_ok=True)
+        self.base_path = os.path.join(directory, time.strftime('recording_%Y%m%d_%H%M%S'))
+        self.size = size
+        self.fps = fps
+        self.sample_rate = sample_rate
+
+        self.pool = FramePool(size, pool_frames)
+        self.audio_blocks = deque()
+        self.timestamps = []
+        self.frames_captured = 0
+        self.frames_written = 0
+        self.bytes_written = 0
+        self.audio_frames_written = 0
+        self.started = time.perf_counter()
+        self.write_time = 0.0
+        self.error = None
+
+        self._scaled = None  # Reused when the render surface no longer matches size
+        self._stop = threading.Event()
+        self._video, self.video_path = self._open_video()
+        self._audio = None
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _open_video(self):
+        width, height = self.size
+        if shutil.which('ffmpeg'):
+            path = self.base_path + '.mp4'
+            command = ['ffmpeg', '-loglevel', 'error', '-y',
+                       '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}', '-r', str(self.fps),
+                       '-i', '-', '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', path]
+            process = subprocess.Popen(command, stdin=subprocess.PIPE)
+            return process, path
+        path = self.base_path + '.rgb'
+        return open(path, 'wb'), path
+
+    # Render thread
+    def capture(self, surface):
+        if self.error is not None:
+            return
+        if surface.get_size() != self.size:
+            if self._scaled is None:
+                self._scaled = pygame.Surface(self.size)
+            pygame.transform.scale(surface, self.size, self._scaled)
+            surface = self._scaled
+        self.frames_captured += 1
+        self.pool.capture(surface, time.perf_counter() - self.started)
+
+    # Audio thread
+    def add_audio(self, block):
+        if self.error is None:
+            self.audio_blocks.append(np.array(block, dtype=np.float32))
+
+    # === Writer Thread ===
+    def _write_loop(self):
+        try:
+            while not (self._stop.is_set() and not self.pool.pending):
+                self._write_audio()
+                item = self.pool.take(timeout=0.05)
+                if item is None:
+                    continue
+                index, timestamp = item
+                start = time.perf_counter()
+                data = self.pool.buffers[index].data
+                try:
+                    if isinstance(self._video, subprocess.Popen):
+                        self._video.stdin.write(data)
+                    else:
+                        self._video.write(data)
+                finally:
+                    self.pool.release(index)
+                self.write_time += time.perf_counter() - start
+                self.timestamps.append(timestamp)
+                self.frames_written += 1
+                self.bytes_written += data.nbytes
+            self._write_audio()
+        except OSError as e:  # BrokenPipeError when ffmpeg has exited
+            self._fail(f"write failed: {e}")
+
+    def _fail(self, reason):
+        if self.error is None:
+            self.error = reason
+            self.audio_blocks.clear()
+            print(f"Recording failed: {reason}")
+
+    def _write_audio(self):
+        while self.audio_blocks:
+            block = self.audio_blocks.popleft()
+            if self._audio is None:
+                self._audio = wave.open(self.base_path + '.wav', 'wb')
+                self._audio.setnchannels(block.shape[1] if block.ndim > 1 else 1)
+                self._audio.setsampwidth(2)
+                self._audio.setframerate(self.sample_rate)
+            pcm = (np.clip(block, -1.0, 1.0) * 32767).astype('<i2')
+            self._audio.writeframes(pcm.tobytes())
+            self.audio_frames_written += len(block)
+
+    # === Stats ===
+    def stats(self):
+        elapsed = max(1e-6, time.perf_counter() - self.started)
+        return {
+            'frames_captured': self.frames_captured,
+            'frames_written': self.frames_written,
+            'frames_dropped': self.pool.dropped,
+            'queued': len(self.pool.pending),
+            'writer_fps': self.frames_written / elapsed,
+            'writer_mb_per_s': self.bytes_written / elapsed / 1e6,
+            'write_busy': self.write_time / elapsed,  # Fraction of time spent writing
+            'error': self.error,  # None while the recording is fine
+        }
+
+    def stop(self):
+        # Safe to call after a failure, with ffmpeg already gone
+        self._stop.set()
+        self._writer.join()
+        try:
+            if isinstance(self._video, subprocess.Popen):
+                self._video.stdin.close()
+            else:
+                self._video.close()
+        except OSError as e:
+            self._fail(f"closing the video failed: {e}")
+        if isinstance(self._video, subprocess.Popen) and self._video.wait() != 0:
+            self._fail(f"ffmpeg exited with status {self._video.returncode}")
+        if self._audio is not None:
+            try:
+                self._audio.close()
+            except OSError as e:
+                self._fail(f"closing the audio failed: {e}")
+
+        stats = self.stats()
+        width, height = self.size
+        with open(self.base_path + '.json', 'w') as sidecar:
+            json.dump({
+                'video': os.path.basename(self.video_path),
+                'audio': os.path.basename(self.base_path + '.wav') if self._audio is not None else None,
+                'width': width,
+                'height': height,
+                'pixel_format': 'rgb24',
+                'fps': self.fps,
+                'sample_rate': self.sample_rate,
+                'audio_frames': self.audio_frames_written,
+                'frame_timestamps': self.timestamps,
+                **stats,
+            }, sidecar, indent=1)
+        return stats
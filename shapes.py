@@ -0,0 +1,220 @@
+import importlib.util
+import os
+
+import numpy as np
+
+
+# === Shape Registry ===
+# Every display mode is a Shape class in SHAPES; the mode number is its
+# position there. The built-in outlines below come first, then the mode the
+# visualizer registers (waterfall), then plugins, so the numbers of existing
+# modes never change when a plugin is added.
+#
+# An outline shape is built once per point count and render size (see
+# Shape.__init__) and precomputes whatever does not depend on the audio.
+# place() then maps the per-point amplitudes to x/y arrays with whole-array
+# operations. A mode that draws itself instead sets draw (see Shape.draw).
+SHAPES = []
+
+def register(cls):
+    # Class decorator: adds a shape as the next mode number
+    if not cls.name:
+        raise ValueError(f"{cls.__name__} has no name")
+    if any(shape.name == cls.name for shape in SHAPES):
+        raise ValueError(f"shape '{cls.name}' is already registered")
+    SHAPES.append(cls)
+    return cls
+
+def shape_names():
+    return [shape.name for shape in SHAPES]
+
+def load_plugins(directory):
+    # Imports every .py file in directory, in file name order; each one
+    # registers its shapes with @register. A plugin that fails to import is
+    # reported and skipped. Returns the names of the files loaded.
+    loaded = []
+    if not os.path.isdir(directory):
+        return loaded
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.py') or filename.startswith('_'):
+            continue
+        module_name = 'shape_plugin_' + os.path.splitext(filename)[0]
+        try:
+            spec = importlib.util.spec_from_file_location(module_name, os.path.join(directory, filename))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        except Exception as e:
+            print(f"Failed to load shape plugin {filename}: {e}")
+            continue
+        loaded.append(filename)
+    return loaded
+
+
+class Shape:
+    name = None
+    closed = True    # Join the last point back to the first
+    backdrop = True  # Background, trail and beat flash are drawn before the shape
+    bloom = True     # Drawn on the bloom layer (bloom.py) and given a glow
+    draw = None      # draw(surface, assets, spectrum, channels, beat_pulse) -> points or None, for modes that draw themselves
+    mood = None      # (energy, brightness) the shape suits, 0 to 1 each, for automatic shape changes (mood.py); None = never chosen
+    channels = False # place() gets (2, n) amplitudes, one row per channel, and returns (2, n) x/y; each row is its own outline
+
+    def __init__(self, bands, assets):
+        # bands: position of each point along the outline, 0 to 1 (warped in
+        # log mode); assets: the RenderAssets of the surface drawn on
+        self.bands = np.asarray(bands, dtype=float)
+        self.angle = 2 * np.pi * self.bands
+        self.width, self.height = assets.width, assets.height
+        self.center = assets.center
+        self.scale = assets.scale
+        n = len(self.bands)
+        self.x = np.empty(n)
+        self.y = np.empty(n)
+        self.setup(assets)
+
+    def setup(self, assets):
+        # Precomputes the base outline
+        pass
+
+    def place(self, amplitudes):
+        # Returns (x, y) for the amplitudes; the arrays belong to the shape and
+        # are overwritten by the next call
+        raise NotImplementedError
+
+
+# === Built-in Shapes ===
+# Sizes are in window pixels at a 600 px tall window, times the render scale.
+@register
+class Circle(Shape):
+    name = 'circle'
+    mood = (0.5, 0.5)
+
+    def setup(self, assets):
+        self.cos, self.sin = np.cos(self.angle), np.sin(self.angle)
+        self.radius = np.empty(len(self.bands))
+
+    def place(self, amplitudes):
+        np.multiply(amplitudes, 300 * self.scale, out=self.radius)
+        self.radius += 100 * self.scale
+        np.multiply(self.radius, self.cos, out=self.x)
+        np.multiply(self.radius, self.sin, out=self.y)
+        self.x += self.center[0]
+        self.y += self.center[1]
+        return self.x, self.y
+
+
+@register
+class Heart(Shape):
+    name = 'heart'
+    mood = (0.3, 0.25)
+
+    def setup(self, assets):
+        a = self.angle
+        self.heart_x = 16 * np.sin(a) ** 3
+        self.heart_y = -(13 * np.cos(a) - 5 * np.cos(2 * a) - 2 * np.cos(3 * a) - np.cos(4 * a))  # Screen y points down
+        self.size = np.empty(len(self.bands))
+
+    def place(self, amplitudes):
+        # Size and amplitude response
+        np.multiply(amplitudes, 2, out=self.size)
+        self.size += 1
+        self.size *= 10 * self.scale
+        np.multiply(self.heart_x, self.size, out=self.x)
+        np.multiply(self.heart_y, self.size, out=self.y)
+        self.x += self.center[0]
+        self.y += self.center[1]
+        return self.x, self.y
+
+
+@register
+class Triangle(Shape):
+    name = 'triangle'
+    mood = (0.85, 0.75)
+
+    def setup(self, assets):
+        # Points along the three edges, as offsets from the center
+        corners = np.array(assets.triangle + [assets.triangle[0]], dtype=float)
+        edge = np.minimum((self.bands * 3).astype(int), 2)
+        t = (self.bands - edge / 3) * 3
+        start, end = corners[edge], corners[edge + 1]
+        self.dx = start[:, 0] + (end[:, 0] - start[:, 0]) * t - self.center[0]
+        self.dy = start[:, 1] + (end[:, 1] - start[:, 1]) * t - self.center[1]
+        self.size = np.empty(len(self.bands))
+
+    def place(self, amplitudes):
+        np.multiply(amplitudes, 2, out=self.size)
+        self.size += 1
+        np.multiply(self.dx, self.size, out=self.x)
+        np.multiply(self.dy, self.size, out=self.y)
+        self.x += self.center[0]
+        self.y += self.center[1]
+        return self.x, self.y
+
+
+@register
+class Line(Shape):
+    name = 'line'
+    mood = (0.8, 0.3)
+
+    def setup(self, assets):
+        self.x[:] = self.bands * self.center[0] * 2
+        # The first and last points are moved far off screen so the segment
+        # that closes the outline is never visible
+        self.x[0], self.x[-1] = -10000, 10000
+
+    def place(self, amplitudes):
+        np.multiply(amplitudes, -self.center[1], out=self.y)
+        self.y += self.center[1]
+        self.y[0], self.y[-1] = self.height, -10000
+        return self.x, self.y
+
+
+@register
+class Donut(Shape):
+    name = 'donut'
+    mood = (0.35, 0.7)
+
+    def setup(self, assets):
+        # Two loops at twice the angle; the second half of the points adds
+        # its loop on top of the first
+        double = 2 * self.angle
+        upper = (self.angle > np.pi).astype(float)
+        self.cos = np.cos(double) * (upper + 1) / 2
+        self.sin = np.sin(double) * (upper + 1) / 2
+        self.radius = np.empty(len(self.bands))
+
+    def place(self, amplitudes):
+        np.multiply(amplitudes, 300 * self.scale, out=self.radius)
+        self.radius += 100 * self.scale
+        np.multiply(self.radius, self.cos, out=self.x)
+        np.multiply(self.radius, self.sin, out=self.y)
+        self.x += self.center[0]
+        self.y += self.center[1]
+        return self.x, self.y
+
+
+@register
+class Stereo(Shape):
+    # Two half circles meeting at the top (bass) and bottom (treble): the
+    # first channel (left or mid) on the left, the second (right or side)
+    # mirrored on the right. Without channel data both halves show the mono
+    # spectrum.
+    name = 'stereo'
+    closed = False
+    channels = True
+
+    def setup(self, assets):
+        direction = np.array([[-1.0], [1.0]])
+        angle = -np.pi / 2 + direction * np.pi * self.bands
+        self.cos, self.sin = np.cos(angle), np.sin(angle)
+        self.radius = np.empty(angle.shape)
+        self.x, self.y = np.empty(angle.shape), np.empty(angle.shape)
+
+    def place(self, amplitudes):
+        np.multiply(amplitudes, 300 * self.scale, out=self.radius)
+        self.radius += 100 * self.scale
+        np.multiply(self.radius, self.cos, out=self.x)
+        np.multiply(self.radius, self.sin, out=self.y)
+        self.x += self.center[0]
+        self.y += self.center[1]
+        return self.x, self.y
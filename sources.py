@@ -0,0 +1,208 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+
+# Audio inputs for the live (callback) path. Every source delivers float32
+# blocks of shape (frames, channels) to a callback with the sounddevice
+# signature callback(indata, frames, time_info, status), and every source
+# stamps time_info.inputBufferAdcTime with the time.perf_counter() time the
+# first sample of the block was captured. Latency can then be measured from
+# sample to displayed frame the same way for a microphone, a file or a
+# generated test signal.
+
+BlockTime = namedtuple('BlockTime', 'inputBufferAdcTime currentTime')
+
+
+# === Microphone ===
+class MicSource:
+    def __init__(self, sample_rate, channels=1, blocksize=1024, device=None):
+        import sounddevice as sd  # Imported here so other sources work without PortAudio
+
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.callback = None
+        try:
+            self.stream = sd.InputStream(samplerate=sample_rate, channels=channels, device=device,
+                                         callback=self._on_block, blocksize=blocksize)
+        except sd.PortAudioError:
+            if channels == 1:
+                raise
+            print("Microphone: stereo input not available, using mono")
+            channels = 1
+            self.stream = sd.InputStream(samplerate=sample_rate, channels=channels, device=device,
+                                         callback=self._on_block, blocksize=blocksize)
+        self.channels = channels
+
+    def _on_block(self, indata, frames, time_info, status):
+        # PortAudio times are on the stream's own clock; move them onto
+        # perf_counter. Some host APIs report 0 for the ADC time.
+        now = time.perf_counter()
+        if time_info.inputBufferAdcTime > 0:
+            captured = now - (time_info.currentTime - time_info.inputBufferAdcTime)
+        else:
+            captured = now - frames / self.sample_rate
+        self.callback(indata, frames, BlockTime(captured, now), status)
+
+    def start(self, callback):
+        self.callback = callback
+        self.stream.start()
+
+    def stop(self):
+        self.stream.stop()
+        self.stream.close()
+
+
+# === Clocked Sources ===
+# Blocks are produced on a thread and delivered when their last sample would
+# have been captured by a real device, so a generated or file-backed input
+# behaves like a microphone with a perfectly known clock.
+class ClockedSource:
+    def __init__(self, sample_rate, channels=1, blocksize=1024):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.callback = None
+        self.start_time = None  # perf_counter() time of sample 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def read(self, start, frames):
+        # Returns (frames, channels) float32 samples starting at sample index start
+        raise NotImplementedError
+
+    def sample_time(self, index):
+        return self.start_time + index / self.sample_rate
+
+    def start(self, callback):
+        self.callback = callback
+        self._stop.clear()
+        self.start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        position = 0
+        while not self._stop.is_set():
+            block = self.read(position, self.blocksize)
+            delay = self.sample_time(position + self.blocksize) - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+            self.callback(block, self.blocksize, BlockTime(self.sample_time(position), time.perf_counter()), None)
+            position += self.blocksize
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+# === Test Signals ===
+# Deterministic signals defined by sample index, so the same run produces the
+# same samples whatever the block size:
+#   clicks   a kick every beat: seeded noise below 800 Hz with a 150 ms decay,
+#            broad and long enough to drive the bass-energy beat detector
+#   impulse  a single full-scale sample every beat
+#   chirp    a logarithmic 20 Hz - 20 kHz sweep every four beats
+#   noise    seeded white noise, for load testing
+SIGNALS = ('clicks', 'impulse', 'chirp', 'noise')
+
+class SyntheticSource(ClockedSource):
+    def __init__(self, signal='clicks', sample_rate=44100, channels=1, blocksize=1024, bpm=120, seed=0):
+        if signal not in SIGNALS:
+            raise ValueError(f"unknown test signal '{signal}'")
+        super().__init__(sample_rate, channels, blocksize)
+        self.signal = signal
+        self.bpm = bpm
+        self.seed = seed
+        self.beat_samples = int(round(sample_rate * 60 / bpm))
+        if signal == 'clicks':
+            self.kick = self._kick()
+
+    def _kick(self):
+        # One beat of kick, the same for every beat and every run
+        noise = np.fft.rfft(np.random.default_rng(self.seed).standard_normal(self.beat_samples))
+        noise[np.fft.rfftfreq(self.beat_samples, 1 / self.sample_rate) > 800] = 0
+        kick = np.fft.irfft(noise, self.beat_samples)
+        kick *= np.exp(-np.arange(self.beat_samples) / self.sample_rate / 0.15) / np.max(np.abs(kick))
+        return kick
+
+    def onset(self, index):
+        # Sample index of the latest beat at or before sample index
+        return index - index % self.beat_samples
+
+    def read(self, start, frames):
+        n = np.arange(start, start + frames)
+        phase = n % self.beat_samples  # Samples since the last beat
+        if self.signal == 'clicks':
+            mono = self.kick[phase]
+        elif self.signal == 'impulse':
+            mono = (phase == 0).astype(float)
+        elif self.signal == 'chirp':
+            period = 4 * self.beat_samples / self.sample_rate
+            t = (n % (4 * self.beat_samples)) / self.sample_rate
+            k = np.log(1000.0)  # 20 Hz to 20 kHz
+            mono = 0.5 * np.sin(2 * np.pi * 20 * period / k * (np.exp(k * t / period) - 1))
+        else:
+            mono = np.random.default_rng((self.seed, start)).standard_normal(frames) * 0.25
+        return np.repeat(mono.astype(np.float32)[:, None], self.channels, axis=1)
+
+
+# === Files ===
+# Streams a WAV file through the callback path in real time, as if it were
+# played into a microphone.
+class FileSource(ClockedSource):
+    def __init__(self, path, blocksize=1024, loop=True):
+        from scipy.io import wavfile  # Slow to import, and only file sources need it
+        sample_rate, data = wavfile.read(path)
+        if data.ndim == 1:
+            data = data[:, None]
+        data = data.astype(np.float32)
+        data /= max(1e-9, np.max(np.abs(data)))
+        super().__init__(sample_rate, data.shape[1], blocksize)
+        self.data = data
+        self.loop = loop
+
+    def read(self, start, frames):
+        total = len(self.data)
+        if self.loop:
+            return self.data[np.arange(start, start + frames) % total]
+        block = np.zeros((frames, self.channels), dtype=np.float32)
+        available = self.data[start:start + frames]
+        block[:len(available)] = available
+        return block
+
+
+def write_wav(path, source, seconds):
+    # Renders a clocked source to a 16-bit WAV, e.g. a click track for the file path
+    from scipy.io import wavfile
+    samples = source.read(0, int(seconds * source.sample_rate))
+    wavfile.write(path, source.sample_rate, (np.clip(samples, -1, 1) * 32767).astype(np.int16))
+
+
+# === Latency ===
+# Sample-to-display latency: the time from the newest sample in a frame to
+# the moment that frame was presented. Only frames stamped with a sample
+# time count, and each frame is counted once.
+class LatencyMeter:
+    def __init__(self, window=600):
+        self.values = deque(maxlen=window)
+        self.last_seq = 0
+
+    def observe(self, frame, shown_at):
+        if frame is None or frame.sample_time is None or frame.seq == self.last_seq:
+            return
+        self.last_seq = frame.seq
+        self.values.append(shown_at - frame.sample_time)
+
+    def summary(self):
+        # Milliseconds over the last window of frames, or None before the first
+        # frame; jitter is the standard deviation
+        if not self.values:
+            return None
+        ms = np.array(self.values) * 1000
+        return {'frames': len(ms), 'mean': float(ms.mean()), 'p50': float(np.percentile(ms, 50)),
+                'p95': float(np.percentile(ms, 95)), 'max': float(ms.max()), 'jitter': float(ms.std())}
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+
+from frame_codec import HEADER, BandQuantizer, decode_frame, encode_frame
+
+
+# === Client Helper ===
+async def read_frame(reader):
+    header = await reader.readexactly(HEADER.size)
+    band_count = HEADER.unpack(header)[-1]
+    return decode_frame(header + await reader.readexactly(band_count))
+
+
+# === Clients ===
+# Each client has a one-frame slot. Publishing overwrites the slot, so a slow
+# client skips to the newest frame instead of queueing stale ones.
+class StreamClient:
+    def __init__(self, writer):
+        self.writer = writer
+        self.task = asyncio.current_task()
+        self.pending = None
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.skipped = 0
+
+    def offer(self, payload):
+        if self.pending is not None:
+            self.skipped += 1
+        self.pending = payload
+        self.ready.set()
+
+    async def run(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            payload, self.pending = self.pending, None
+            self.writer.write(payload)
+            await self.writer.drain()
+            self.sent += 1
+
+
+# === Server ===
+# Subscribes to a FrameBus and serves encoded frames over TCP. Frames are
+# encoded once on the event loop and the same bytes go to every client.
+class SpectrumServer:
+    def __init__(self, frame_bus, host='127.0.0.1', port=7765, band_count=32, skip_bins=0):
+        self.frame_bus = frame_bus
+        self.host = host
+        self.port = port
+        self.quantizer = BandQuantizer(band_count, skip_bins)
+        self.clients = set()
+        self.frames_encoded = 0
+        self.loop = None
+        self.server = None
+        self._subscription = None
+        self._thread = None
+        self._started = threading.Event()
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]  # Resolves port 0
+        self._subscription = self.frame_bus.subscribe('stream_server', listener=self._on_frame)
+
+    async def stop(self):
+        if self._subscription is not None:
+            self._subscription.close()
+        self.server.close()
+        tasks = [client.task for client in self.clients]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def _on_frame(self, frame):
+        # Runs on the analysis thread; hand the frame to the event loop
+        self.loop.call_soon_threadsafe(self.broadcast, frame)
+
+    def broadcast(self, frame):
+        if frame is not self._subscription.frame:
+            return  # A newer frame is already waiting in the loop's queue
+        payload = encode_frame(frame, self.quantizer)
+        self.frames_encoded += 1
+        for client in self.clients:
+            client.offer(payload)
+
+    async def _handle_client(self, reader, writer):
+        client = StreamClient(writer)
+        self.clients.add(client)
+        try:
+            await client.run()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+
+    def stats(self):
+        return {
+            'clients': len(self.clients),
+            'frames_encoded': self.frames_encoded,
+            'frames_sent': sum(c.sent for c in self.clients),
+            'frames_skipped': sum(c.skipped for c in self.clients),
+        }
+
+    # === Background Thread ===
+    # For use next to the pygame loop: runs the server on its own event loop.
+    # Raises what start() raised (port in use, bad host) in the caller
+    def start_in_thread(self):
+        error = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(self.start())
+            except Exception as e:
+                error.append(e)
+                loop.close()
+                return
+            finally:
+                self._started.set()
+            loop.run_forever()
+            loop.run_until_complete(self.stop())
+            loop.close()
+        self._started.clear()
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if error:
+            self._thread.join()
+            self._thread = None
+            raise error[0]
+
+    def stop_thread(self):
+        if self._thread is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self._thread = None
@@ -0,0 +1,122 @@
+import queue
+import threading
+import time
+
+
+# === Cancel Tokens ===
+# Handed to each job. cancel() ends the job after its current step, and
+# wait() doubles as the job's sleep, so a cancelled job wakes up at once.
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def wait(self, seconds):
+        # Returns True if cancelled while waiting
+        return self._event.wait(seconds)
+
+
+# === Analysis Worker ===
+# One long-lived thread that runs one analysis job at a time. A job is a
+# step function called repeatedly; it returns the seconds to wait before the
+# next step, or None when it is finished. submit() cancels the running job
+# and waits for its step to return before the new one starts, so two jobs
+# never write the shared spectrum at the same time, and switching tracks
+# never starts another thread.
+class AnalysisWorker:
+    def __init__(self, name='analysis'):
+        self.name = name
+        self._jobs = queue.Queue()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._token = None
+        self._thread = None
+        self._lock = threading.Lock()  # Serializes submit/cancel/stop
+        self.jobs_started = 0
+        self.jobs_cancelled = 0
+        self.errors = 0
+        self.steps = 0
+        self.last_step_ms = 0.0
+        self.max_step_ms = 0.0
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def submit(self, step):
+        # Runs step in place of the current job; returns the job's token
+        with self._lock:
+            self._cancel()
+            self.start()
+            token = CancelToken()
+            self._token = token
+            self._idle.clear()
+            self._jobs.put((token, step))
+            return token
+
+    def cancel(self, timeout=None):
+        # Cancels the running job and waits until its step has returned.
+        # Returns False if it was still running after timeout.
+        with self._lock:
+            return self._cancel(timeout)
+
+    def _cancel(self, timeout=None):
+        if self._token is not None:
+            self._token.cancel()
+            self._token = None
+        return self._idle.wait(timeout)
+
+    def stop(self):
+        # Ends the thread; a later submit() starts a new one
+        with self._lock:
+            self._cancel()
+            if self._thread is not None:
+                self._jobs.put(None)
+                self._thread.join()
+                self._thread = None
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            token, step = job
+            self.jobs_started += 1
+            try:
+                while not token.cancelled:
+                    start = time.perf_counter()
+                    delay = step()
+                    self.last_step_ms = (time.perf_counter() - start) * 1000
+                    self.max_step_ms = max(self.max_step_ms, self.last_step_ms)
+                    self.steps += 1
+                    if delay is None:
+                        break
+                    token.wait(delay)
+            except Exception as e:
+                self.errors += 1
+                print(f"{self.name} worker: {e!r}")
+            if token.cancelled:
+                self.jobs_cancelled += 1
+            if self._jobs.empty():
+                self._idle.set()
+
+    # === Stats ===
+    def stats(self):
+        return {
+            'alive': self._thread is not None and self._thread.is_alive(),
+            'busy': not self._idle.is_set(),
+            'queued': self._jobs.qsize(),
+            'jobs_started': self.jobs_started,
+            'jobs_cancelled': self.jobs_cancelled,
+            'errors': self.errors,
+            'steps': self.steps,
+            'last_step_ms': self.last_step_ms,
+            'max_step_ms': self.max_step_ms,
+        }